@@ -0,0 +1,277 @@
+"""
+Benchmarks for startup and the download, decode, slice and encode stages.
+
+Synthetic sources are generated locally with ffmpeg, so no network access
+is needed. Downloads are served by a local HTTP stand-in.
+
+Usage:
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --quick --compare results.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+
+from pydub import AudioSegment
+
+from src.audio_processor import AudioProcessor
+from src.download_cache import DownloadCache
+from src.file_saver import FileSaver
+from src.playback import RecordingBackend
+from src.scratch import ScratchSpace
+from src.streaming import StreamingAudioProcessor
+from src.youtube_downloader import YoutubeDownloader
+
+# (duration in seconds, sample rate, channels, container)
+SOURCES = [
+    (60, 44100, 2, 'mp4'),
+    (600, 44100, 2, 'mp4'),
+    (600, 48000, 1, 'm4a'),
+    (600, 48000, 2, 'webm'),
+    (600, 22050, 1, 'wav'),
+    (3600, 44100, 2, 'mp4'),
+]
+QUICK_SOURCES = [
+    (30, 44100, 2, 'mp4'),
+    (30, 48000, 1, 'webm'),
+]
+CLIP_SECONDS = 20
+OUTPUT_FORMATS = ['mp3', 'wav', 'ogg', 'm4a']
+
+
+def generate_source(directory: str, duration: int, sample_rate: int, channels: int, container: str) -> str:
+    """Generate a synthetic source file with ffmpeg."""
+    path = os.path.join(directory, f"source_{duration}s_{sample_rate}hz_{channels}ch.{container}")
+    command = [
+        AudioSegment.converter, '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f"sine=frequency=440:sample_rate={sample_rate}:duration={duration}",
+    ]
+    if container == 'mp4':
+        # Progressive mp4 like the ones downloaded from YouTube: small video track plus AAC
+        command += ['-f', 'lavfi', '-i', f"color=size=160x90:rate=5:duration={duration}",
+                    '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac']
+    elif container == 'm4a':
+        command += ['-c:a', 'aac']
+    elif container == 'webm':
+        command += ['-c:a', 'libopus']
+    command += ['-ac', str(channels), '-shortest', path]
+    subprocess.run(command, check=True)
+    return path
+
+
+def measure(function, repeat: int) -> dict:
+    """
+    Run a function several times, recording wall time and peak Python heap
+    allocation of each run.
+    """
+    timings = []
+    peaks = []
+    for _ in range(repeat):
+        tracemalloc.start()
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {
+        'seconds_min': min(timings),
+        'seconds_median': statistics.median(timings),
+        'peak_bytes': max(peaks),
+    }
+
+
+class Benchmark:
+    def __init__(self, work_dir: str, repeat: int):
+        self.work_dir = work_dir
+        self.repeat = repeat
+        self.results = []
+
+    def record(self, stage: str, case: str, function):
+        try:
+            result = measure(function, self.repeat)
+            result.update(stage=stage, case=case)
+        except Exception as e:
+            result = {'stage': stage, 'case': case, 'error': str(e)}
+        self.results.append(result)
+        if 'error' in result:
+            print(f"{stage:<28} {case:<36} error: {result['error']}")
+        else:
+            print(f"{stage:<28} {case:<36} {result['seconds_median'] * 1000:10.1f} ms "
+                  f"{result['peak_bytes'] / 1024 ** 2:10.1f} MiB")
+
+    def run_startup(self):
+        """Benchmark interpreter startup plus importing the entry points, as a fresh process."""
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        for case, command in [
+            ('python', [sys.executable, '-c', 'pass']),
+            ('import_cli', [sys.executable, '-c', 'import src.cli']),
+            ('cli_help', [sys.executable, 'main.py', '--help']),
+        ]:
+            self.record('startup', case, partial(subprocess.run, command, cwd=root, check=True,
+                                                 stdout=subprocess.DEVNULL))
+
+    def run_source(self, source: str, duration: int):
+        case = os.path.basename(source)
+        start = duration / 2
+        end = start + min(CLIP_SECONDS, duration / 4)
+
+        self.record('processor_init', case, lambda: AudioProcessor(source, playback=RecordingBackend()))
+        self.record('processor_init_lazy', case,
+                    lambda: AudioProcessor(source, lazy=True, playback=RecordingBackend()))
+
+        processor = AudioProcessor(source, playback=RecordingBackend())
+        lazy_processor = AudioProcessor(source, lazy=True, playback=RecordingBackend())
+
+        def select_range(target):
+            target.set_time_range(start, end)
+            target.get_audio_segment()
+
+        self.record('get_audio_segment', case, partial(select_range, processor))
+        self.record('get_audio_segment_lazy', case, partial(select_range, lazy_processor))
+
+        def adjust_volume():
+            processor.adjust_volume(3)
+            processor.adjust_volume(-3)
+        self.record('adjust_volume', case, adjust_volume)
+
+        self.record('play_preview', case, lambda: processor.play_preview(blocking=True))
+
+        segment = processor.get_audio_segment()
+        saver = FileSaver()
+        for file_format in OUTPUT_FORMATS:
+            output_path = os.path.join(self.work_dir, f"clip.{file_format}")
+            self.record(f'save_audio_{file_format}', case, partial(saver.save_audio, segment, output_path))
+            self.record(f'save_clip_{file_format}', case, partial(saver.save_clip, lazy_processor, output_path))
+
+        streaming_processor = StreamingAudioProcessor(source, playback=RecordingBackend())
+        streaming_processor.set_time_range(0, duration)
+        output_path = os.path.join(self.work_dir, "full.mp3")
+        self.record('save_clip_streaming_full', case, partial(saver.save_clip, streaming_processor, output_path))
+
+        for target in (processor, lazy_processor, streaming_processor):
+            target.cleanup()
+
+    def run_download(self, source: str):
+        """Benchmark YoutubeDownloader against a local HTTP server serving the source file."""
+        handler = partial(QuietHandler, directory=os.path.dirname(source))
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        stream_url = f"http://127.0.0.1:{server.server_address[1]}/{os.path.basename(source)}"
+        case = os.path.basename(source)
+
+        def resolve(url):
+            stream = Mock(itag=18, subtype='mp4', default_filename="video.mp4", url=stream_url, bitrate=128000)
+            yt = Mock()
+            yt.streams.filter.return_value.first.return_value = stream
+            return yt
+
+        try:
+            with patch('src.youtube_downloader.YouTube', side_effect=resolve):
+                url = "https://www.youtube.com/watch?v=benchmark00"
+                scratch = ScratchSpace(os.path.join(self.work_dir, 'scratch'))
+
+                def download_uncached():
+                    # A new scratch directory per run; reusing one would return
+                    # the file downloaded by the previous run
+                    downloader = YoutubeDownloader(scratch=scratch)
+                    try:
+                        downloader.download_video(url)
+                    finally:
+                        downloader.cleanup()
+                self.record('download_video', case, download_uncached)
+
+                cache = DownloadCache(os.path.join(self.work_dir, 'cache'))
+                cached_downloader = YoutubeDownloader(cache=cache)
+                cached_downloader.download_video(url)
+                self.record('download_video_cached', case, partial(cached_downloader.download_video, url))
+                cached_downloader.cleanup()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def ffmpeg_version() -> str:
+    try:
+        result = subprocess.run([AudioSegment.converter, '-version'], capture_output=True, text=True)
+        return result.stdout.splitlines()[0]
+    except (OSError, IndexError):
+        return 'unknown'
+
+
+def compare(results: list[dict], baseline_path: str):
+    """Print the change in median time and peak memory against an earlier run."""
+    with open(baseline_path) as f:
+        baseline = {(r['stage'], r['case']): r for r in json.load(f)['results'] if 'error' not in r}
+
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        previous = baseline.get((result['stage'], result['case']))
+        if 'error' in result or previous is None:
+            continue
+        time_change = result['seconds_median'] / previous['seconds_median'] - 1 if previous['seconds_median'] else 0
+        memory_change = result['peak_bytes'] / previous['peak_bytes'] - 1 if previous['peak_bytes'] else 0
+        print(f"{result['stage']:<28} {result['case']:<36} time {time_change:+7.1%}  memory {memory_change:+7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vid2audioclip pipeline stages")
+    parser.add_argument('--output', default='benchmark_results.json', help="Where to write the JSON results")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement")
+    parser.add_argument('--quick', action='store_true', help="Use a few short sources only")
+    parser.add_argument('--compare', metavar='RESULTS', help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    if shutil.which(AudioSegment.converter) is None:
+        sys.exit("ffmpeg is required to generate the benchmark sources")
+
+    work_dir = tempfile.mkdtemp(prefix='vid2audioclip_bench_')
+    try:
+        benchmark = Benchmark(work_dir, args.repeat)
+        benchmark.run_startup()
+        for duration, sample_rate, channels, container in (QUICK_SOURCES if args.quick else SOURCES):
+            source = generate_source(work_dir, duration, sample_rate, channels, container)
+            benchmark.run_source(source, duration)
+            benchmark.run_download(source)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = {
+        'meta': {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': sys.version,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'ffmpeg': ffmpeg_version(),
+            'repeat': args.repeat,
+        },
+        'results': benchmark.results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(benchmark.results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,3 @@
-import os
-
 if __name__ == "__main__":
-    # Ensure temp directory exists
-    os.makedirs(os.path.join(os.getcwd(), 'temp'), exist_ok=True)
     from src.cli import main
     main()
@@ -7,7 +7,15 @@ setup(
     install_requires=[
         "pytube==15.0.0",
         "pydub==0.25.1",
+        "numpy==2.4.6",
+        "playsound==1.2.2",
         "pytest==7.4.3",
         "pytest-mock==3.12.0"
-    ]
+    ],
+    extras_require={
+        # Streaming preview playback that can be stopped and seeked; without
+        # either, previews fall back to playsound
+        "pyaudio": ["pyaudio"],
+        "simpleaudio": ["simpleaudio"]
+    }
 ) 
\ No newline at end of file
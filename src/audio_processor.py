@@ -1,157 +1,359 @@
-import os
-import uuid
 from pathlib import Path
+import numpy as np
 from pydub import AudioSegment
-from playsound import playsound
-import time
+from .instrumentation import get_instrumentation
+from .pcm_decoder import decode_range
+from .pcm_sidecar import PCMSidecar
+from .playback import PlaybackBackend, default_backend
+from .probe import MediaInfo, probe_media
+from .scratch import ScratchSpace, get_scratch_space
 from .utils.time_converter import TimeConverter
 
 class AudioProcessor:
-    def __init__(self, video_path: str):
+    # Extra audio decoded on each side of the selection in lazy mode, so small
+    # range adjustments can be served without decoding again
+    LAZY_MARGIN_SECONDS = 5.0
+    # Boundary snapping measures energy in frames of this length and treats
+    # frames quieter than SILENCE_THRESHOLD_DB (dBFS) as silence
+    SNAP_FRAME_SECONDS = 0.01
+    SILENCE_THRESHOLD_DB = -40.0
+    # Without silence, frames this close to the quietest level count as quiet
+    SNAP_LEVEL_SLACK_DB = 3.0
+
+    def __init__(self, video_path: str, lazy: bool = False, playback: PlaybackBackend | None = None,
+                 pcm_cache: bool = False, scratch: ScratchSpace | None = None):
         """
         Initialize the audio processor with a video file.
         
         Args:
             video_path (str): Path to the video file
+            lazy (bool): Only probe the file up front and decode just the
+                selected range (plus a small margin) when it is needed, so
+                time ranges can be validated without decoding anything
+            playback (PlaybackBackend): Backend used for previews, defaults to
+                the best one available on this system
+            pcm_cache (bool): Decode the file once into a raw PCM sidecar next
+                to it and memory-map that on this and later opens, so any
+                range can be cut without decoding again. Takes precedence
+                over lazy
+            scratch (ScratchSpace): Where the preview directory is created,
+                defaults to the pipeline's scratch space
         """
-        self.audio = AudioSegment.from_file(video_path)
+        self.video_path = video_path
+        self.lazy = lazy
+        self.gain_db = 0.0
+        self.fade_in = 0.0
+        self.fade_out = 0.0
+        self.snap_tolerance = 0.0
+
+        # Decoded window used in lazy mode and its start position in milliseconds
+        self._window = None
+        self._window_start_ms = 0
+        self._window_end_ms = 0
+        # Mapped decode-once sidecar when pcm_cache is enabled
+        self._pcm = None
+
+        instrumentation = get_instrumentation()
+        if pcm_cache:
+            self.audio = None
+            with instrumentation.stage('pcm_sidecar', path=video_path):
+                self._pcm = PCMSidecar.for_file(video_path)
+            self.duration = self._pcm.duration
+        elif lazy:
+            self.audio = None
+            with instrumentation.stage('probe', path=video_path):
+                self.duration = probe_media(video_path).duration
+        else:
+            with instrumentation.stage('decode', path=video_path):
+                self.audio = AudioSegment.from_file(video_path)
+            instrumentation.count('decoded_samples', int(self.audio.frame_count()) * self.audio.channels)
+            self.duration = self.audio.duration_seconds
+
         self.start_time = 0
-        self.end_time = self.audio.duration_seconds
+        self.end_time = self.duration
         
-        # Create temporary directory with unique name in current directory
-        unique_id = str(uuid.uuid4())[:8]
-        self.temp_dir = os.path.join(os.getcwd(), 'temp', f'audio_preview_{unique_id}')
-        os.makedirs(self.temp_dir, exist_ok=True)
+        # Private directory for preview files
+        self._scratch_dir = (scratch or get_scratch_space()).job('preview')
+        self.temp_dir = self._scratch_dir.path
+
+        self.playback = playback or default_backend(self.temp_dir)
 
-    def set_time_range(self, start: str | float, end: str | float):
+    def set_time_range(self, start: str | float, end: str | float, snap: bool = True):
         """
         Set the time range for audio processing.
+
+        With snapping enabled (see set_snap()), each boundary is moved to the
+        nearest silence within the tolerance.
         
         Args:
             start: Start time in format "MM:SS.ms" or "HH:MM:SS.ms", or seconds as float
             end: End time in format "MM:SS.ms" or "HH:MM:SS.ms", or seconds as float
+            snap (bool): Whether to snap the boundaries, False to use them as given
             
         Raises:
             ValueError: If time range is invalid
         """
         try:
-            # Convert numeric inputs to strings
-            if isinstance(start, (int, float)):
-                start = str(start)
-            if isinstance(end, (int, float)):
-                end = str(end)
-            
+            # Numbers are used as they are, without a round trip through strings
             start_seconds = TimeConverter.time_to_seconds(start)
             end_seconds = TimeConverter.time_to_seconds(end)
             
-            if start_seconds < 0 or end_seconds > self.audio.duration_seconds or start_seconds >= end_seconds:
+            if start_seconds < 0 or end_seconds > self.duration or start_seconds >= end_seconds:
                 raise ValueError("Invalid time range")
                 
-            self.start_time = start_seconds
-            self.end_time = end_seconds
-            
         except ValueError as e:
             raise ValueError(f"Invalid time format: {str(e)}")
 
+        if snap and self.snap_tolerance:
+            snapped_start = self._snap_boundary(start_seconds)
+            snapped_end = self._snap_boundary(end_seconds)
+            # Keep the requested range if snapping would collapse it
+            if snapped_start < snapped_end:
+                start_seconds, end_seconds = snapped_start, snapped_end
+
+        self.start_time = start_seconds
+        self.end_time = end_seconds
+
     def adjust_time_range(self, start_offset: str | float, end_offset: str | float):
         """
         Adjust the current time range by the given offsets.
-        
+
+        The offsets are added to the current range in seconds, so repeated
+        adjustments keep full precision. The result is not snapped, as a
+        nudge smaller than the snap tolerance would snap straight back.
+
         Args:
             start_offset: Offset to add to start time (e.g., "0:05" or "-0:05"), or seconds as float
             end_offset: Offset to add to end time (e.g., "0:05" or "-0:05"), or seconds as float
         """
         try:
-            # Convert numeric inputs to strings
-            if isinstance(start_offset, (int, float)):
-                start_offset = str(start_offset)
-            if isinstance(end_offset, (int, float)):
-                end_offset = str(end_offset)
-            
             start_offset_seconds = TimeConverter.time_to_seconds(start_offset, allow_negative=True)
             end_offset_seconds = TimeConverter.time_to_seconds(end_offset, allow_negative=True)
-            
-            new_start = self.start_time + start_offset_seconds
-            new_end = self.end_time + end_offset_seconds
-            
-            # Convert back to time strings for set_time_range
-            self.set_time_range(
-                TimeConverter.seconds_to_time(new_start),
-                TimeConverter.seconds_to_time(new_end)
-            )
-            
+
+            self.set_time_range(self.start_time + start_offset_seconds, self.end_time + end_offset_seconds,
+                                snap=False)
+
         except ValueError as e:
             raise ValueError(f"Invalid time format: {str(e)}")
 
-    def play_preview(self):
-        """Play the selected portion of the audio."""
+    def play_preview(self, blocking: bool = False):
+        """
+        Play the selected portion of the audio.
+
+        Playback runs in the background, replacing any preview already
+        playing. With a backend that cannot stop (the playsound fallback),
+        this waits until the preview has finished instead, so previews never
+        overlap.
+
+        Args:
+            blocking (bool): Wait until the preview has finished playing
+        """
         try:
-            start_ms = int(self.start_time * 1000)
-            end_ms = int(self.end_time * 1000)
-            audio_slice = self.audio[start_ms:end_ms]
-            
-            # Ensure temp directory exists
-            os.makedirs(self.temp_dir, exist_ok=True)
-            
-            # Create a new preview file with timestamp
-            timestamp = int(time.time() * 1000)
-            preview_path = os.path.join(self.temp_dir, f'preview_{timestamp}.wav')
-            
-            # Remove old preview files
-            self._cleanup_old_previews()
-            
-            # Export and verify file was created
-            audio_slice.export(preview_path, format='wav')
-            if not os.path.exists(preview_path):
-                raise ValueError("Failed to create preview file")
-            
-            # Play the audio
-            playsound(preview_path)
-            
+            with get_instrumentation().stage('preview'):
+                self.playback.play(self._get_selection())
+            if blocking or not self.playback.can_stop:
+                self.playback.wait()
         except Exception as e:
             raise ValueError(f"Failed to play preview: {str(e)}")
 
-    def _cleanup_old_previews(self):
-        """Clean up old preview files."""
-        try:
-            for file in os.listdir(self.temp_dir):
-                if file.startswith('preview_') and file.endswith('.wav'):
-                    file_path = os.path.join(self.temp_dir, file)
-                    try:
-                        os.remove(file_path)
-                    except:
-                        pass
-        except:
-            pass
+    def stop_preview(self):
+        """Stop the preview if one is playing."""
+        self.playback.stop()
+
+    def seek_preview(self, seconds: float):
+        """
+        Jump to a position within the playing preview.
+
+        Args:
+            seconds (float): Position relative to the start of the selection
+        """
+        self.playback.seek(seconds)
 
     def adjust_volume(self, db_change: float):
         """
         Adjust the volume of the audio.
+
+        The change is only recorded here; the total gain is applied once to
+        the selected range when it is previewed or exported.
         
         Args:
             db_change (float): Decibel change (positive or negative)
         """
-        self.audio = self.audio + db_change
+        self.gain_db += db_change
+
+    def set_fades(self, fade_in: float, fade_out: float):
+        """
+        Set fade in and fade out durations applied to the selection.
+
+        Args:
+            fade_in (float): Fade in duration in seconds
+            fade_out (float): Fade out duration in seconds
+
+        Raises:
+            ValueError: If a duration is negative
+        """
+        if fade_in < 0 or fade_out < 0:
+            raise ValueError("Fade duration cannot be negative")
+        self.fade_in = float(fade_in)
+        self.fade_out = float(fade_out)
+
+    def set_snap(self, tolerance: float):
+        """
+        Snap selection boundaries to the nearest silence or quietest point.
+
+        Only the audio within the tolerance of each boundary is analysed, so
+        the cost per boundary does not depend on the clip or source length.
+
+        Args:
+            tolerance (float): Largest distance in seconds a boundary may move, 0 to disable
+
+        Raises:
+            ValueError: If the tolerance is negative
+        """
+        if tolerance < 0:
+            raise ValueError("Snap tolerance cannot be negative")
+        self.snap_tolerance = float(tolerance)
+
+    def media_info(self) -> MediaInfo:
+        """
+        Get the source's duration and stream metadata, probed once per file.
+
+        Raises:
+            ValueError: If the file cannot be probed
+        """
+        return probe_media(self.video_path)
+
+    @property
+    def has_effects(self) -> bool:
+        """Whether the selection needs processing beyond cutting (gain or fades)."""
+        return bool(self.gain_db or self.fade_in or self.fade_out)
 
     def get_audio_segment(self) -> AudioSegment:
         """
         Get the currently selected audio segment.
+
+        With pcm_cache, the segment reads the mapped sidecar directly and is
+        only valid until cleanup(); use its detach() to keep it longer.
         
         Returns:
             AudioSegment: The selected portion of audio
         """
+        return self._get_selection()
+
+    def preload(self, start: float, end: float):
+        """
+        In lazy mode, decode the given range now so that selections inside it
+        can be cut without decoding again. Does nothing in eager mode.
+
+        Args:
+            start (float): Start of the range in seconds
+            end (float): End of the range in seconds
+        """
+        if self.lazy and self._pcm is None:
+            self._load_window(int(start * 1000), int(end * 1000))
+
+    def _get_selection(self) -> AudioSegment:
+        """Slice the selected time range out of the decoded audio and apply the gain."""
         start_ms = int(self.start_time * 1000)
         end_ms = int(self.end_time * 1000)
-        return self.audio[start_ms:end_ms]
+        if self._pcm is not None:
+            selection = self._pcm.segment(start_ms, end_ms)
+        elif self.lazy:
+            self._load_window(start_ms, end_ms)
+            selection = self._window[start_ms - self._window_start_ms:end_ms - self._window_start_ms]
+        else:
+            selection = self.audio[start_ms:end_ms]
+
+        if self.gain_db:
+            selection = selection.apply_gain(self.gain_db)
+        if self.fade_in:
+            selection = selection.fade_in(int(self.fade_in * 1000))
+        if self.fade_out:
+            selection = selection.fade_out(int(self.fade_out * 1000))
+        return selection
+
+    def _snap_boundary(self, seconds: float) -> float:
+        """
+        Find the quietest point near a boundary.
+
+        Returns:
+            float: The centre of the silent frame closest to the boundary, or of
+            the closest near-quietest frame if nothing within the tolerance is silent
+        """
+        start_ms = max(0, round((seconds - self.snap_tolerance) * 1000))
+        end_ms = min(int(self.duration * 1000), round((seconds + self.snap_tolerance) * 1000))
+        if end_ms <= start_ms:
+            return seconds
+
+        neighbourhood = self._decode_range(start_ms, end_ms)
+        frame_length = max(1, int(self.SNAP_FRAME_SECONDS * neighbourhood.frame_rate))
+        # Read the raw data directly: it may be a view into a mapped sidecar
+        samples = np.frombuffer(neighbourhood.raw_data, dtype=f'<i{neighbourhood.sample_width}').astype(np.float64)
+        frame_count = len(samples) // (frame_length * neighbourhood.channels)
+        if frame_count == 0:
+            return seconds
+
+        frames = samples[:frame_count * frame_length * neighbourhood.channels].reshape(frame_count, -1)
+        full_scale = float(1 << (8 * neighbourhood.sample_width - 1))
+        rms = np.sqrt(np.square(frames).mean(axis=1)) / full_scale
+        with np.errstate(divide='ignore'):
+            levels = 20 * np.log10(rms)
+
+        centres = start_ms / 1000 + (np.arange(frame_count) + 0.5) * frame_length / neighbourhood.frame_rate
+        distances = np.abs(centres - seconds)
+        quiet = levels <= self.SILENCE_THRESHOLD_DB
+        if not quiet.any():
+            # No silence nearby: settle for frames close to the quietest one
+            quiet = levels <= levels.min() + self.SNAP_LEVEL_SLACK_DB
+        best = np.flatnonzero(quiet)[np.argmin(distances[quiet])]
+        return float(min(max(centres[best], 0.0), self.duration))
+
+    def _decode_range(self, start_ms: int, end_ms: int) -> AudioSegment:
+        """Get a range of the source without replacing the lazy window."""
+        if self._pcm is not None:
+            return self._pcm.segment(start_ms, end_ms)
+        if not self.lazy:
+            return self.audio[start_ms:end_ms]
+        if self._window is not None and self._window_start_ms <= start_ms and end_ms <= self._window_end_ms:
+            return self._window[start_ms - self._window_start_ms:end_ms - self._window_start_ms]
+
+        with get_instrumentation().stage('decode_snap', path=self.video_path):
+            return decode_range(self.video_path, start_ms / 1000, (end_ms - start_ms) / 1000)
+
+    def _load_window(self, start_ms: int, end_ms: int):
+        """
+        Make sure the decoded window covers the given range, decoding only
+        that range (plus a margin) from the source if it does not.
+        """
+        if (self._window is not None
+                and self._window_start_ms <= start_ms
+                and end_ms <= self._window_end_ms):
+            return
+
+        margin_ms = int(self.LAZY_MARGIN_SECONDS * 1000)
+        window_start_ms = max(0, start_ms - margin_ms)
+        window_end_ms = min(int(self.duration * 1000), end_ms + margin_ms)
+
+        with get_instrumentation().stage('decode_window', path=self.video_path):
+            window = decode_range(self.video_path, window_start_ms / 1000,
+                                  (window_end_ms - window_start_ms) / 1000)
+
+        self._window = window
+        self._window_start_ms = window_start_ms
+        self._window_end_ms = window_end_ms
 
     def cleanup(self):
-        """Remove the temporary directory and all its contents."""
-        if hasattr(self, 'temp_dir') and os.path.exists(self.temp_dir):
+        """Stop playback, unmap the PCM sidecar and remove the temporary directory and all its contents."""
+        if hasattr(self, 'playback'):
             try:
-                import shutil
-                shutil.rmtree(self.temp_dir)
+                self.playback.stop()
             except:
                 pass
+        if getattr(self, '_pcm', None) is not None:
+            self._pcm.close()
+            self._pcm = None
+        if hasattr(self, '_scratch_dir'):
+            self._scratch_dir.cleanup()
 
     def __del__(self):
         """Ensure cleanup is called when the object is destroyed."""
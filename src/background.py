@@ -0,0 +1,163 @@
+import queue
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+class JobCancelled(Exception):
+    """Raised inside a job's work function when the job has been cancelled."""
+
+
+class Job:
+    """Handle for a piece of work running on a BackgroundRunner."""
+
+    def __init__(self, runner: 'BackgroundRunner', on_progress=None):
+        self._runner = runner
+        self._on_progress = on_progress
+        self._cancelled = threading.Event()
+        self.future = None
+
+    def cancel(self):
+        """
+        Cancel the job. A queued job will not run; a running job stops at its
+        next check_cancelled() or report_progress() call, and its result is
+        discarded either way.
+        """
+        self._cancelled.set()
+        if self.future:
+            self.future.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check_cancelled(self):
+        """
+        Raises:
+            JobCancelled: If the job has been cancelled
+        """
+        if self.cancelled:
+            raise JobCancelled()
+
+    def report_progress(self, *args):
+        """
+        Pass progress to the job's on_progress callback on the UI thread.
+        Called from the worker thread.
+
+        Raises:
+            JobCancelled: If the job has been cancelled
+        """
+        self.check_cancelled()
+        if self._on_progress:
+            self._runner._post(self._on_progress, *args)
+
+
+class BackgroundRunner:
+    """
+    Runs work off the Tk main thread and delivers results back on it.
+
+    Workers put callbacks on a queue that the UI thread drains every
+    POLL_MS milliseconds with root.after, since Tk must only be touched from
+    the thread running the main loop.
+    """
+    POLL_MS = 50
+
+    def __init__(self, root, max_workers: int = 2):
+        """
+        Args:
+            root: Tk root (anything with after(ms, callback))
+            max_workers (int): Threads for general jobs; serial jobs get their own single thread
+        """
+        self.root = root
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._serial_executor = ThreadPoolExecutor(max_workers=1)
+        self._callbacks = queue.Queue()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._closed = False
+        self.root.after(self.POLL_MS, self._poll)
+
+    def submit(self, work, on_done=None, on_error=None, on_progress=None, serial: bool = False) -> Job:
+        """
+        Run work(job) in the background.
+
+        Args:
+            work: Callable taking the Job; its return value is passed to on_done
+            on_done: Called on the UI thread with the result
+            on_error: Called on the UI thread with the exception if work raises
+            on_progress: Called on the UI thread with the job's report_progress() arguments
+            serial (bool): Queue the job behind other serial jobs (e.g. saves)
+                instead of running it concurrently
+
+        Returns:
+            Job: Handle to cancel the job
+        """
+        job = Job(self, on_progress)
+
+        def run():
+            try:
+                job.check_cancelled()
+                result = work(job)
+                if not job.cancelled and on_done:
+                    self._post(on_done, result)
+            except JobCancelled:
+                pass
+            except Exception as e:
+                if not job.cancelled and on_error:
+                    self._post(on_error, e)
+            finally:
+                with self._pending_lock:
+                    self._pending -= 1
+
+        with self._pending_lock:
+            self._pending += 1
+        executor = self._serial_executor if serial else self._executor
+        job.future = executor.submit(run)
+        # A job cancelled before it started never runs, so count it as done here
+        job.future.add_done_callback(lambda future: future.cancelled() and self._job_skipped())
+        return job
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs queued or running."""
+        with self._pending_lock:
+            return self._pending
+
+    def shutdown(self):
+        """Cancel queued jobs and stop delivering callbacks."""
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._serial_executor.shutdown(wait=False, cancel_futures=True)
+
+    def _job_skipped(self):
+        with self._pending_lock:
+            self._pending -= 1
+
+    def _post(self, callback, *args):
+        self._callbacks.put((callback, args))
+
+    def _poll(self):
+        """Run queued callbacks on the UI thread."""
+        try:
+            while True:
+                try:
+                    callback, args = self._callbacks.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    callback(*args)
+                except Exception:
+                    # A failing callback must not keep the others from running
+                    self._report_callback_error()
+        finally:
+            # Always re-armed, or no result would ever be delivered again
+            if not self._closed:
+                self.root.after(self.POLL_MS, self._poll)
+
+    def _report_callback_error(self):
+        """Report the exception being handled the way Tk reports callback errors."""
+        report = getattr(self.root, 'report_callback_exception', None)
+        if report:
+            report(*sys.exc_info())
+        else:
+            traceback.print_exc()
@@ -0,0 +1,163 @@
+import asyncio
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from .youtube_downloader import YoutubeDownloader
+from .clip_cache import ClipCache
+from .encoding_profiles import get_profile
+from .multi_clip import MERGE_GAP_SECONDS, ClipRequest, ClipResult, collect_results, submit_clips
+from .utils.time_converter import TimeConverter
+
+
+def read_manifest(manifest_path: str) -> list[ClipRequest]:
+    """
+    Read clip requests from a manifest file.
+
+    Files ending in .jsonl or .json are read as JSON lines, anything else as
+    CSV with a header row. Each record needs "url", "start", "end" and
+    "output", and may have "gain" in dB and an encoding "profile".
+
+    Args:
+        manifest_path (str): Path to the manifest file
+
+    Returns:
+        list[ClipRequest]: The requests in manifest order
+
+    Raises:
+        ValueError: If the manifest cannot be read or a row is malformed
+    """
+    try:
+        with open(manifest_path, newline='', encoding='utf-8') as f:
+            if manifest_path.lower().endswith(('.jsonl', '.json')):
+                rows = [
+                    (line_number, json.loads(line))
+                    for line_number, line in enumerate(f, start=1)
+                    if line.strip()
+                ]
+            else:
+                # Header is line 1, so data rows start at line 2
+                rows = list(enumerate(csv.DictReader(f), start=2))
+    except (OSError, json.JSONDecodeError, csv.Error) as e:
+        raise ValueError(f"Failed to read manifest: {str(e)}")
+
+    requests = []
+    for line_number, row in rows:
+        try:
+            profile = str(row.get('profile') or '').strip()
+            requests.append(ClipRequest(
+                url=str(row['url']).strip(),
+                start=str(row['start']).strip(),
+                end=str(row['end']).strip(),
+                output_path=str(row['output']).strip(),
+                gain=float(row.get('gain') or 0),
+                line=line_number,
+                # Checked here so a typo fails before anything is downloaded
+                profile=get_profile(profile).name if profile else None
+            ))
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise ValueError(f"Invalid manifest row on line {line_number}: {str(e)}")
+
+    # Malformed times also fail before anything is downloaded; whether a
+    # range fits its source is only known once it is probed
+    _, errors = TimeConverter.parse_many([request.start for request in requests])
+    _, end_errors = TimeConverter.parse_many([request.end for request in requests])
+    errors = {**end_errors, **errors}
+    if errors:
+        index = min(errors)
+        raise ValueError(f"Invalid manifest row on line {requests[index].line}: {errors[index]}")
+    return requests
+
+
+class BatchExtractor:
+    def __init__(self, downloader: YoutubeDownloader | None = None, max_workers: int | None = None,
+                 executor_class=ProcessPoolExecutor, max_downloads: int = 4, download_retries: int = 3,
+                 merge_gap: float = MERGE_GAP_SECONDS, clip_cache: ClipCache | None = None,
+                 profile: str | None = None):
+        """
+        Initialize the batch extractor.
+
+        Args:
+            downloader (YoutubeDownloader): Downloader to fetch sources with
+            max_workers (int): Number of encoder processes, defaults to the CPU count
+            executor_class: Executor used for encoding, ProcessPoolExecutor by default
+            max_downloads (int): Number of sources downloaded concurrently
+            download_retries (int): Number of retries for a failed download
+            merge_gap (float): Clips of one source at most this many seconds apart are decoded together
+            clip_cache (ClipCache): Cache to serve repeated clips from
+            profile (str): Encoding profile for rows that do not name one
+
+        Raises:
+            ValueError: If the profile does not exist
+        """
+        self.downloader = downloader or YoutubeDownloader()
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor_class = executor_class
+        self.max_downloads = max_downloads
+        self.download_retries = download_retries
+        self.merge_gap = merge_gap
+        self.clip_cache = clip_cache
+        self.profile = get_profile(profile).name
+
+    def run(self, requests: list[ClipRequest], on_result=None) -> list[ClipResult]:
+        """
+        Extract all requested clips.
+
+        Requests are grouped by video, whatever the URL form, so each source
+        is downloaded once and only the regions covering its clips are
+        decoded, each once, and the clips are encoded in parallel. A failing
+        clip is reported in its result and does not stop the rest of the batch.
+
+        Args:
+            requests (list[ClipRequest]): Clips to extract
+            on_result: Optional callable invoked with each ClipResult as it completes
+
+        Returns:
+            list[ClipResult]: One result per request, in request order
+        """
+        results: dict[int, ClipResult] = {}
+
+        def record(index: int, result: ClipResult):
+            results[index] = result
+            if on_result:
+                on_result(result)
+
+        # Keyed by video ID, so e.g. youtu.be/x and watch?v=x share one
+        # download and their clips share decoded regions
+        groups: dict[str, list[int]] = {}
+        source_urls: dict[str, str] = {}
+        for index, request in enumerate(requests):
+            key = YoutubeDownloader._extract_video_id(request.url) or request.url
+            groups.setdefault(key, []).append(index)
+            source_urls.setdefault(key, request.url)
+
+        # Fetch every source up front, concurrently
+        video_paths = asyncio.run(self.downloader.download_many(
+            list(source_urls.values()),
+            max_concurrency=self.max_downloads,
+            retries=self.download_retries
+        ))
+
+        with self.executor_class(max_workers=self.max_workers) as executor:
+            pending = {}
+            for key, indexes in groups.items():
+                video_path = video_paths[source_urls[key]]
+                try:
+                    if isinstance(video_path, Exception):
+                        raise video_path
+                    pending.update(submit_clips(
+                        video_path,
+                        [(index, requests[index]) for index in indexes],
+                        executor,
+                        record,
+                        self.merge_gap,
+                        self.clip_cache,
+                        self.profile
+                    ))
+                except Exception as e:
+                    for index in indexes:
+                        record(index, ClipResult(requests[index], False, 0.0, str(e)))
+
+            collect_results(pending, requests, record)
+
+        return [results[index] for index in range(len(requests))]
\ No newline at end of file
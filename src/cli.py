@@ -1,16 +1,36 @@
 import argparse
+import os
 import sys
 from typing import Optional
 from .youtube_downloader import YoutubeDownloader
-from .audio_processor import AudioProcessor
+from .download_cache import DownloadCache
+from .clip_cache import ClipCache
+from .encoding_profiles import PROFILES
 from .file_saver import FileSaver
+from .utils.time_converter import TimeConverter
+from .instrumentation import Instrumentation, JsonLogSink, PrometheusTextSink, set_instrumentation
+from .scratch import ScratchSpace, start_scratch_space
 
 class AudioExtractorCLI:
-    def __init__(self):
-        self.downloader = YoutubeDownloader()
-        self.file_saver = FileSaver()
+    def __init__(self, download_cache: DownloadCache | None = None, audio_only: bool = True,
+                 audio_bitrate: str | int = 'smallest', streaming: bool = False, snap: float = 0.0,
+                 clip_cache: ClipCache | None = None, profile: str = 'default', pcm_cache: bool = False,
+                 encode_workers: int = 1):
+        self.downloader = YoutubeDownloader(cache=download_cache, audio_only=audio_only,
+                                            audio_bitrate=audio_bitrate)
+        self.clip_cache = clip_cache
+        self.profile = profile
+        self.file_saver = FileSaver(clip_cache, profile=profile, encode_workers=encode_workers)
+        self.streaming = streaming
+        self.snap = snap
+        self.pcm_cache = pcm_cache
         
     def run(self):
+        # Decoding and playback are only loaded once they are needed, which
+        # keeps startup fast for --help, batch runs and the service
+        from .audio_processor import AudioProcessor
+        from .streaming import StreamingAudioProcessor
+
         try:
             # Get YouTube URL
             url = self._get_input("Enter YouTube URL: ")
@@ -19,7 +39,12 @@ class AudioExtractorCLI:
             
             # Process audio
             print("Processing audio...")
-            processor = AudioProcessor(video_path)
+            if self.streaming:
+                processor = StreamingAudioProcessor(video_path)
+            else:
+                processor = AudioProcessor(video_path, lazy=True, pcm_cache=self.pcm_cache)
+            processor.set_snap(self.snap)
+            print(self._describe_source(processor.media_info()))
             start = None
             end = None
             while True:
@@ -34,12 +59,18 @@ class AudioExtractorCLI:
                         print(f"Error: {e}")
                         continue
                 
+                if self.snap:
+                    print(f"Selected {TimeConverter.seconds_to_time(processor.start_time)} - "
+                          f"{TimeConverter.seconds_to_time(processor.end_time)} (snapped to silence)")
+
                 # Preview
                 print("\nPlaying preview...")
                 processor.play_preview()
                 
-                # Ask if they want to adjust
-                if self._get_input("\nDo you want to adjust the time range? (y/n): ").lower() != 'y':
+                # Ask if they want to adjust while the preview keeps playing
+                answer = self._get_input("\nDo you want to adjust the time range? (y/n): ").lower()
+                processor.stop_preview()
+                if answer != 'y':
                     break
                 # Get adjustments (now using time format)
                 start_adj = self._get_input("Enter start time adjustment (e.g., 0:05 or -0:05): ")
@@ -59,7 +90,7 @@ class AudioExtractorCLI:
             # Save file
             output_path = self._get_input("\nEnter output file path (e.g., output.mp3): ")
             print("Saving audio...")
-            self.file_saver.save_audio(processor.get_audio_segment(), output_path)
+            self.file_saver.save_clip(processor, output_path)
             print(f"\nAudio saved to: {output_path}")
             
         except Exception as e:
@@ -67,13 +98,261 @@ class AudioExtractorCLI:
         finally:
             self.downloader.cleanup()
     
+    def run_batch(self, manifest_path: str, max_workers: int | None = None) -> int:
+        """
+        Extract every clip listed in a manifest file.
+
+        Args:
+            manifest_path (str): Path to a CSV or JSON lines manifest
+            max_workers (int): Number of encoder processes, defaults to the CPU count
+
+        Returns:
+            int: Process exit code, non-zero if any clip failed
+        """
+        from .batch import BatchExtractor, read_manifest
+
+        try:
+            requests = read_manifest(manifest_path)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 1
+
+        def report(result):
+            if result.success:
+                print(f"[ok]     {result.request.output_path} ({result.seconds:.2f}s)")
+            else:
+                print(f"[failed] {result.request.output_path} (line {result.request.line}): {result.error}")
+
+        try:
+            extractor = BatchExtractor(self.downloader, max_workers=max_workers, clip_cache=self.clip_cache,
+                                       profile=self.profile)
+            results = extractor.run(requests, on_result=report)
+        finally:
+            self.downloader.cleanup()
+
+        failed = sum(1 for result in results if not result.success)
+        print(f"\n{len(results) - failed} of {len(results)} clips extracted")
+        return 1 if failed else 0
+
+    def run_split(self, url: str, ranges_path: str, output_dir: str = '.', file_format: str = 'mp3',
+                  max_workers: int | None = None) -> int:
+        """
+        Cut every range listed in a cue sheet or timestamp list out of one
+        video, decoding the source once.
+
+        Args:
+            url (str): YouTube URL of the source
+            ranges_path (str): Path to a .cue file or timestamp list
+            output_dir (str): Directory for the clips, named "NN - title.format"
+            file_format (str): Output format of the clips
+            max_workers (int): Number of encoder processes, defaults to the CPU count
+
+        Returns:
+            int: Process exit code, non-zero if any clip failed
+        """
+        from .multi_clip import ClipRequest, MultiClipExtractor, clip_filename, read_ranges
+        from .probe import probe_media
+
+        try:
+            ranges = read_ranges(ranges_path)
+            video_path = self.downloader.download_video(url)
+            # The last range may run to the end of the source
+            duration = probe_media(video_path).duration if any(
+                end is None for _, end, _ in ranges) else None
+        except ValueError as e:
+            print(f"Error: {e}")
+            self.downloader.cleanup()
+            return 1
+
+        os.makedirs(output_dir, exist_ok=True)
+        requests = [
+            ClipRequest(
+                url=url,
+                start=str(start),
+                end=str(duration if end is None else end),
+                output_path=os.path.join(output_dir, clip_filename(number, title, file_format)),
+                line=number
+            )
+            for number, (start, end, title) in enumerate(ranges, start=1)
+        ]
+
+        def report(result):
+            if result.success:
+                print(f"[ok]     {result.request.output_path} ({result.seconds:.2f}s)")
+            else:
+                print(f"[failed] {result.request.output_path}: {result.error}")
+
+        try:
+            extractor = MultiClipExtractor(max_workers=max_workers, clip_cache=self.clip_cache, profile=self.profile)
+            results = extractor.run(video_path, requests, on_result=report)
+        finally:
+            self.downloader.cleanup()
+
+        failed = sum(1 for result in results if not result.success)
+        print(f"\n{len(results) - failed} of {len(results)} clips extracted")
+        return 1 if failed else 0
+
+    def run_service(self, host: str, port: int, output_dir: str, workers: int = 2,
+                    encoder_workers: int | None = None) -> int:
+        """
+        Run the HTTP/JSON clip service until interrupted.
+
+        Args:
+            host (str): Address to listen on
+            port (int): Port to listen on
+            output_dir (str): Directory the clips are written to
+            workers (int): Number of jobs processed at the same time
+            encoder_workers (int): Number of encoder processes, defaults to the CPU count
+
+        Returns:
+            int: Process exit code
+        """
+        import asyncio
+        from .service import ClipService
+
+        service = ClipService(self.downloader, output_dir, workers=workers, encoder_workers=encoder_workers,
+                              clip_cache=self.clip_cache, profile=self.profile)
+        try:
+            asyncio.run(service.serve_forever(host, port))
+        except KeyboardInterrupt:
+            pass
+        except OSError as e:
+            print(f"Error: {e}")
+            return 1
+        return 0
+
+    @staticmethod
+    def _describe_source(info) -> str:
+        """One line summary of a probed source, shown before asking for a time range."""
+        details = [f"{info.sample_rate} Hz" if info.sample_rate else None,
+                   f"{info.channels} channels" if info.channels else None]
+        details = ', '.join([info.codec or 'unknown codec'] + [d for d in details if d])
+        return f"Length: {TimeConverter.seconds_to_time(info.duration)} ({details})"
+
     def _get_input(self, prompt: str) -> str:
         """Helper method to get input from user."""
         return input(prompt).strip()
 
 def main():
-    cli = AudioExtractorCLI()
-    cli.run()
+    parser = argparse.ArgumentParser(description="Extract audio clips from YouTube videos")
+    parser.add_argument('--gui', action='store_true', help="Start the graphical interface")
+    parser.add_argument('--batch', metavar='MANIFEST',
+                        help="Extract all clips listed in a CSV or JSON lines manifest")
+    parser.add_argument('--split', metavar='RANGES',
+                        help="Cut every range in a cue sheet or timestamp list out of the video given with --url")
+    parser.add_argument('--url', help="Source video for --split")
+    parser.add_argument('--output-dir', default=None,
+                        help="Directory for the clips written by --split (default: .) or --serve (default: service_output)")
+    parser.add_argument('--format', default='mp3', choices=sorted(FileSaver.SUPPORTED_FORMATS),
+                        help="Output format for --split (default: mp3)")
+    parser.add_argument('--serve', action='store_true',
+                        help="Run a local HTTP/JSON service that accepts clip jobs")
+    parser.add_argument('--host', default='127.0.0.1', help="Address the service listens on")
+    parser.add_argument('--port', type=int, default=8765, help="Port the service listens on")
+    parser.add_argument('--service-workers', type=int, default=2,
+                        help="Number of jobs the service processes at the same time")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Number of encoder processes for batch, split and service mode (default: CPU count)")
+    parser.add_argument('--cache-dir', default=None,
+                        help="Directory for cached downloads (default: ~/.cache/vid2audioclip/downloads)")
+    parser.add_argument('--cache-size', type=int, default=DownloadCache.DEFAULT_MAX_BYTES // 1024 ** 2,
+                        metavar='MB', help="Maximum size of the download cache in megabytes")
+    parser.add_argument('--no-cache', action='store_true', help="Do not keep downloads between runs")
+    parser.add_argument('--scratch-dir', default=None,
+                        help="Directory for uncached downloads and preview files, e.g. /dev/shm "
+                             f"(default: ${ScratchSpace.ROOT_ENVIRONMENT_VARIABLE} or the system temp directory)")
+    parser.add_argument('--scratch-quota', type=int, default=None, metavar='MB',
+                        help="Wait before downloading while the scratch directory holds more than this")
+    parser.add_argument('--clip-cache-size', type=int, default=ClipCache.DEFAULT_MAX_BYTES // 1024 ** 2,
+                        metavar='MB', help="Maximum size of the cache of extracted clips in megabytes")
+    parser.add_argument('--clip-cache-memory', type=int, default=0, metavar='MB',
+                        help="Also keep small extracted clips in memory, up to this many megabytes")
+    parser.add_argument('--no-clip-cache', action='store_true',
+                        help="Always extract clips again instead of reusing earlier results")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Encode the clip block by block with constant memory use, for very long clips")
+    parser.add_argument('--pcm-cache', action='store_true',
+                        help="Decode each download once into a raw PCM file next to it and reuse it on later runs")
+    parser.add_argument('--encode-workers', type=int, default=1, metavar='N',
+                        help="Encode long mp3 clips in up to N processes at once (default: 1)")
+    parser.add_argument('--snap', type=float, default=0.0, metavar='SECONDS',
+                        help="Move the start and end to the nearest silence within this many seconds")
+    parser.add_argument('--progressive', action='store_true',
+                        help="Download the progressive video stream instead of an audio-only stream")
+    parser.add_argument('--audio-bitrate', default='smallest',
+                        help="Audio stream to download: smallest, largest, or a bitrate in kbps (default: smallest)")
+    parser.add_argument('--encoding-profile', default='default', choices=list(PROFILES),
+                        help="Encoder settings: " + "; ".join(
+                            f"{name}: {profile.description}" for name, profile in PROFILES.items()))
+    parser.add_argument('--metrics-json', metavar='PATH',
+                        help="Append per-stage timings and counters to a JSON lines file")
+    parser.add_argument('--metrics-prom', metavar='PATH',
+                        help="Write stage totals and counters to a Prometheus text file")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="Profile the run with cProfile and write the stats to PATH")
+    args = parser.parse_args()
+    if args.split and not args.url:
+        parser.error("--split requires --url")
+
+    scratch_quota = args.scratch_quota * 1024 ** 2 if args.scratch_quota is not None else None
+    if args.gui:
+        from .gui import main as gui_main
+        gui_main(scratch_dir=args.scratch_dir, scratch_quota_bytes=scratch_quota)
+        return
+    start_scratch_space(args.scratch_dir, quota_bytes=scratch_quota)
+
+    download_cache = None
+    if not args.no_cache:
+        download_cache = DownloadCache(args.cache_dir, max_bytes=args.cache_size * 1024 ** 2)
+
+    clip_cache = None
+    if not args.no_clip_cache:
+        clip_cache = ClipCache(max_bytes=args.clip_cache_size * 1024 ** 2,
+                               memory_max_bytes=args.clip_cache_memory * 1024 ** 2)
+
+    audio_bitrate = int(args.audio_bitrate) if args.audio_bitrate.isdigit() else args.audio_bitrate
+    try:
+        cli = AudioExtractorCLI(download_cache, audio_only=not args.progressive, audio_bitrate=audio_bitrate,
+                                streaming=args.streaming, snap=args.snap, clip_cache=clip_cache,
+                                profile=args.encoding_profile, pcm_cache=args.pcm_cache,
+                                encode_workers=args.encode_workers)
+    except ValueError as e:
+        parser.error(str(e))
+
+    sinks = []
+    if args.metrics_json:
+        sinks.append(JsonLogSink(args.metrics_json))
+    if args.metrics_prom:
+        sinks.append(PrometheusTextSink(args.metrics_prom))
+    # The service reports stage metrics on /metrics, so always record them there
+    instrumentation = Instrumentation(sinks) if sinks or args.serve else None
+    set_instrumentation(instrumentation)
+
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    exit_code = 0
+    try:
+        if args.batch:
+            exit_code = cli.run_batch(args.batch, args.workers)
+        elif args.split:
+            exit_code = cli.run_split(args.url, args.split, args.output_dir or '.', args.format, args.workers)
+        elif args.serve:
+            exit_code = cli.run_service(args.host, args.port, args.output_dir or 'service_output',
+                                        args.service_workers, args.workers)
+        else:
+            cli.run()
+    finally:
+        if profiler:
+            profiler.disable()
+            # Load with pstats, snakeviz, or flameprof for a flame graph
+            profiler.dump_stats(args.profile)
+        if instrumentation:
+            instrumentation.flush()
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,316 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from .instrumentation import get_instrumentation
+
+class ClipCache:
+    DEFAULT_MAX_BYTES = 1024 ** 3  # 1 GiB
+    # Clips up to this size are also kept in memory when the memory tier is enabled
+    DEFAULT_MEMORY_ITEM_MAX_BYTES = 4 * 1024 ** 2
+    PARTIAL_PREFIX = '.partial-'
+    # Stored beside a source file to avoid rehashing it on every lookup
+    DIGEST_SUFFIX = '.sha256'
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, cache_dir: str | None = None, max_bytes: int = DEFAULT_MAX_BYTES,
+                 memory_max_bytes: int = 0, memory_item_max_bytes: int = DEFAULT_MEMORY_ITEM_MAX_BYTES,
+                 hardlink: bool = True):
+        """
+        Initialize a cache of encoded clips, so a repeated request is served
+        as a copy of an earlier result instead of a new decode and encode.
+
+        Entries are keyed by the source's content hash, the range, the
+        effects, the format and the encoder settings (see key()), stored as
+        "<key>.<format>" and evicted in least recently used order once the
+        cache grows past max_bytes.
+
+        Args:
+            cache_dir (str): Directory holding the cache, defaults to ~/.cache/vid2audioclip/clips
+            max_bytes (int): Maximum total size of the cached files
+            memory_max_bytes (int): Size of the in-memory tier for small clips, 0 to disable it
+            memory_item_max_bytes (int): Largest clip kept in the memory tier
+            hardlink (bool): Serve hits as hardlinks where possible instead of copies.
+                Outputs then share their data with the cache entry, so they
+                must not be modified in place
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'vid2audioclip', 'clips')
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory_max_bytes = memory_max_bytes
+        self.memory_item_max_bytes = memory_item_max_bytes
+        self.hardlink = hardlink
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_bytes = 0
+        self._digests: dict[tuple, str] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, source_path: str, start: float, end: float, file_format: str,
+            gain: float = 0.0, fade_in: float = 0.0, fade_out: float = 0.0,
+            settings: dict | None = None) -> str:
+        """
+        Build the cache key of a clip.
+
+        Args:
+            source_path (str): Source media file, identified by its content
+            start (float): Start of the clip in seconds
+            end (float): End of the clip in seconds
+            file_format (str): Output format
+            gain (float): Gain in dB
+            fade_in (float): Fade in duration in seconds
+            fade_out (float): Fade out duration in seconds
+            settings (dict): Anything else that changes the encoded output
+
+        Returns:
+            str: Hex digest identifying the clip
+
+        Raises:
+            ValueError: If the source cannot be read
+        """
+        fields = [
+            self.source_digest(source_path),
+            # Millisecond precision, as floats so 1 and 1.0 give the same key
+            round(float(start), 3), round(float(end), 3),
+            file_format,
+            round(float(gain), 3), round(float(fade_in), 3), round(float(fade_out), 3),
+            settings or {},
+        ]
+        return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+    def source_digest(self, source_path: str) -> str:
+        """
+        Get the SHA-256 of a source file's content.
+
+        The digest is remembered per path, size and modification time, in
+        memory and in a "<source>.sha256" file beside the source, so each
+        source is hashed once.
+
+        Raises:
+            ValueError: If the source cannot be read
+        """
+        try:
+            stat = os.stat(source_path)
+        except OSError as e:
+            raise ValueError(f"Failed to read source file: {str(e)}")
+        identity = (os.path.abspath(source_path), stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            digest = self._digests.get(identity)
+        if digest:
+            return digest
+
+        digest_path = source_path + self.DIGEST_SUFFIX
+        try:
+            with open(digest_path, encoding='ascii') as f:
+                size, mtime_ns, digest = f.read().split()
+            if (int(size), int(mtime_ns)) != identity[1:]:
+                digest = None
+        except (OSError, ValueError):
+            digest = None
+
+        if digest is None:
+            sha256 = hashlib.sha256()
+            try:
+                with open(source_path, 'rb') as f:
+                    while chunk := f.read(self.HASH_CHUNK_SIZE):
+                        sha256.update(chunk)
+            except OSError as e:
+                raise ValueError(f"Failed to read source file: {str(e)}")
+            digest = sha256.hexdigest()
+            try:
+                with open(digest_path, 'w', encoding='ascii') as f:
+                    f.write(f"{stat.st_size} {stat.st_mtime_ns} {digest}\n")
+            except OSError:
+                # Hashing again next time is fine
+                pass
+
+        with self._lock:
+            self._digests[identity] = digest
+        return digest
+
+    def get(self, key: str, output_path: str) -> bool:
+        """
+        Write a cached clip to output_path.
+
+        Args:
+            key (str): Key from key()
+            output_path (str): Where the clip should be written
+
+        Returns:
+            bool: True on a hit, False if the clip has to be produced
+        """
+        instrumentation = get_instrumentation()
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+
+        if data is not None:
+            try:
+                # Never write through an existing link to a cache entry
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                with open(output_path, 'wb') as f:
+                    f.write(data)
+                self._record_hit(memory=True)
+                return True
+            except OSError:
+                pass
+
+        path = self._entry_path(key, output_path)
+        try:
+            # Mark as recently used for LRU eviction
+            os.utime(path)
+            self._place(path, output_path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            instrumentation.count('clip_cache_misses')
+            return False
+
+        self._record_hit(memory=False)
+        return True
+
+    def put(self, key: str, produced_path: str):
+        """
+        Add a freshly encoded clip to the cache.
+
+        Args:
+            key (str): Key from key()
+            produced_path (str): The encoded clip; it stays where it is
+        """
+        path = self._entry_path(key, produced_path)
+        temp_path = os.path.join(self.cache_dir, f"{self.PARTIAL_PREFIX}{uuid.uuid4().hex}")
+        try:
+            # Copied rather than linked: whoever asked for the clip owns the
+            # produced file and may change it
+            shutil.copyfile(produced_path, temp_path)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        size = os.path.getsize(path)
+        if self.memory_max_bytes and size <= min(self.memory_item_max_bytes, self.memory_max_bytes):
+            try:
+                with open(path, 'rb') as f:
+                    self._remember(key, f.read())
+            except OSError:
+                pass
+        self.evict(keep=path)
+
+    def evict(self, keep: str | None = None):
+        """
+        Remove least recently used entries until the cache fits in max_bytes.
+
+        Args:
+            keep (str): Path that must not be evicted, e.g. the entry just added
+        """
+        entries = []
+        total = 0
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        """Remove all cached clips."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        for path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of lookups served from the cache, 0.0 before the first lookup."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        """
+        Get cache statistics.
+
+        Returns:
+            dict: Hit and miss counters, hit rate, entry count and sizes in bytes
+        """
+        entries = list(self._entries())
+        return {
+            'hits': self.hits,
+            'memory_hits': self.memory_hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'entries': len(entries),
+            'bytes': sum(os.path.getsize(path) for path in entries if os.path.exists(path)),
+            'memory_bytes': self._memory_bytes,
+        }
+
+    def _record_hit(self, memory: bool):
+        with self._lock:
+            self.hits += 1
+            self.memory_hits += memory
+        get_instrumentation().count('clip_cache_hits')
+
+    def _remember(self, key: str, data: bytes):
+        """Add a clip to the memory tier, dropping the least recently used ones to fit."""
+        with self._lock:
+            if key in self._memory:
+                self._memory_bytes -= len(self._memory.pop(key))
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.memory_max_bytes:
+                _, dropped = self._memory.popitem(last=False)
+                self._memory_bytes -= len(dropped)
+
+    def _place(self, source: str, destination: str):
+        """Hardlink source to destination, or copy it where linking is not possible."""
+        if os.path.exists(destination):
+            os.remove(destination)
+        if self.hardlink:
+            try:
+                os.link(source, destination)
+                return
+            except OSError:
+                # Different file systems, or links not supported
+                pass
+        shutil.copyfile(source, destination)
+
+    def _entry_path(self, key: str, output_path: str) -> str:
+        extension = os.path.splitext(output_path)[1].lower()
+        return os.path.join(self.cache_dir, f"{key}{extension}")
+
+    def _entries(self):
+        """Yield the path of every committed cache entry."""
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            if not name.startswith(self.PARTIAL_PREFIX):
+                yield os.path.join(self.cache_dir, name)
@@ -0,0 +1,251 @@
+import glob
+import os
+import time
+import uuid
+
+class DownloadCache:
+    DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GiB
+    PARTIAL_PREFIX = '.partial-'
+    # Partial downloads untouched for this long are considered abandoned
+    PARTIAL_MAX_AGE_SECONDS = 24 * 3600
+    # Sidecar listing the stream selection policies an entry was picked by
+    POLICIES_SUFFIX = '.policies'
+
+    def __init__(self, cache_dir: str | None = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Initialize a persistent on-disk cache of downloaded streams.
+
+        Entries are stored as "<video_id>_<itag>.<extension>" and evicted in
+        least recently used order once the cache grows past max_bytes. Files
+        derived from an entry (e.g. its waveform index) are stored beside it
+        as "<entry>.<suffix>" and removed with it. Each entry also records
+        the stream selection policies (e.g. progressive video, or audio at a
+        bitrate) that picked it, so a lookup without the itag only returns a
+        stream the caller would have selected itself.
+
+        Args:
+            cache_dir (str): Directory holding the cache, defaults to ~/.cache/vid2audioclip/downloads
+            max_bytes (int): Maximum total size of the cached files
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'vid2audioclip', 'downloads')
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get(self, video_id: str, itag: int | None = None, policy: str | None = None) -> str | None:
+        """
+        Look up a cached download.
+
+        Args:
+            video_id (str): YouTube video ID
+            itag (int): Stream itag, or None to accept any cached stream of the video
+            policy (str): Stream selection policy the entry must have been
+                picked by, or None to accept any
+
+        Returns:
+            str | None: Path to the cached file, or None on a miss
+        """
+        matches = [
+            path for entry_id, entry_itag, path in self._entries()
+            if entry_id == video_id and (itag is None or entry_itag == itag)
+            and (policy is None or policy in self._policies(path))
+        ]
+        if not matches:
+            self.misses += 1
+            return None
+
+        path = max(matches, key=self._last_used)
+        try:
+            # Mark as recently used for LRU eviction
+            os.utime(path)
+        except OSError:
+            # Evicted by another process in the meantime
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def temp_path(self, extension: str, name: str | None = None) -> str:
+        """
+        Return a path inside the cache directory to download into before the
+        file is committed with put().
+
+        Args:
+            extension (str): File extension of the download
+            name (str): Stable name for the partial file, so an interrupted
+                download can be resumed; a unique name is used if omitted
+        """
+        return os.path.join(self.cache_dir, f"{self.PARTIAL_PREFIX}{name or uuid.uuid4().hex}.{extension}")
+
+    def entry_path(self, video_id: str, itag: int, extension: str) -> str:
+        """Path a download is stored at once committed, whether or not it exists yet."""
+        return os.path.join(self.cache_dir, f"{video_id}_{itag}.{extension}")
+
+    def put(self, video_id: str, itag: int, downloaded_path: str, policy: str | None = None) -> str:
+        """
+        Atomically move a finished download into the cache.
+
+        Args:
+            video_id (str): YouTube video ID
+            itag (int): Stream itag
+            downloaded_path (str): Completed file, normally from temp_path()
+            policy (str): Stream selection policy that picked the stream
+
+        Returns:
+            str: Path to the cached file
+        """
+        path = self.entry_path(video_id, itag, os.path.splitext(downloaded_path)[1].lstrip('.'))
+        os.replace(downloaded_path, path)
+        if policy:
+            self.add_policy(path, policy)
+        self.evict(keep=path)
+        return path
+
+    def add_policy(self, path: str, policy: str):
+        """
+        Record that a stream selection policy picks a cached entry, e.g. when
+        another policy downloaded the same stream before.
+
+        Args:
+            path (str): Path to the cached file
+            policy (str): Stream selection policy
+        """
+        if policy in self._policies(path):
+            return
+        try:
+            with open(path + self.POLICIES_SUFFIX, 'a') as f:
+                f.write(policy + '\n')
+        except OSError:
+            # Evicted in the meantime; the next lookup is a miss
+            pass
+
+    def evict(self, keep: str | None = None):
+        """
+        Remove least recently used entries until the cache fits in max_bytes.
+        Sidecars such as decoded PCM count towards the size of their entry.
+
+        Args:
+            keep (str): Path that must not be evicted, e.g. the entry just added
+        """
+        entries = []
+        total = 0
+        for _, _, path in self._entries():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            size = stat.st_size + self._sidecar_bytes(path)
+            entries.append((stat.st_mtime, size, path))
+            total += size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                continue
+            self._remove_sidecars(path)
+
+        self._remove_abandoned_partials()
+
+    def _remove_abandoned_partials(self):
+        """Remove partial downloads that have not been written to for a long time."""
+        cutoff = time.time() - self.PARTIAL_MAX_AGE_SECONDS
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+
+        for name in names:
+            if not name.startswith(self.PARTIAL_PREFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """Remove all cached entries."""
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._remove_sidecars(path)
+
+    def stats(self) -> dict:
+        """
+        Get cache statistics.
+
+        Returns:
+            dict: Hit and miss counters, entry count and total size in bytes
+        """
+        entries = list(self._entries())
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(entries),
+            'bytes': sum(os.path.getsize(path) + self._sidecar_bytes(path)
+                         for _, _, path in entries if os.path.exists(path))
+        }
+
+    def _entries(self):
+        """Yield (video_id, itag, path) for every committed cache entry."""
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+
+        for name in names:
+            if name.startswith(self.PARTIAL_PREFIX):
+                continue
+            stem = os.path.splitext(name)[0]
+            video_id, _, itag = stem.rpartition('_')
+            if not video_id or not itag.isdigit():
+                continue
+            yield video_id, int(itag), os.path.join(self.cache_dir, name)
+
+    @staticmethod
+    def _sidecar_bytes(path: str) -> int:
+        """Total size of the files derived from an entry."""
+        total = 0
+        for sidecar in glob.glob(glob.escape(path) + '.*'):
+            try:
+                total += os.path.getsize(sidecar)
+            except OSError:
+                pass
+        return total
+
+    @staticmethod
+    def _remove_sidecars(path: str):
+        """Remove the files derived from an entry."""
+        for sidecar in glob.glob(glob.escape(path) + '.*'):
+            try:
+                os.remove(sidecar)
+            except OSError:
+                pass
+
+    @classmethod
+    def _policies(cls, path: str) -> set[str]:
+        """Stream selection policies recorded for an entry."""
+        try:
+            with open(path + cls.POLICIES_SUFFIX) as f:
+                return {line.strip() for line in f if line.strip()}
+        except OSError:
+            return set()
+
+    @staticmethod
+    def _last_used(path: str) -> float:
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0.0
@@ -0,0 +1,150 @@
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pydub import AudioSegment
+
+
+@dataclass(frozen=True)
+class EncodingProfile:
+    """
+    Named encoder settings.
+
+    Options left as None keep ffmpeg's default (or, for sample rate and
+    channels, the source's). Per-format options are keyed by the output
+    format, since codecs take different quality scales.
+    """
+    name: str
+    description: str
+    # Output format -> ffmpeg encoder, e.g. {'mp3': 'libmp3lame'}
+    codecs: dict = field(default_factory=dict)
+    # Output format -> constant bitrate, e.g. {'m4a': '128k'}
+    bitrates: dict = field(default_factory=dict)
+    # Output format -> variable bitrate quality (ffmpeg -q:a)
+    qualities: dict = field(default_factory=dict)
+    # Output format -> extra ffmpeg output options
+    parameters: dict = field(default_factory=dict)
+    sample_rate: int | None = None
+    channels: int | None = None
+    threads: int | None = None
+    # Whether a clip may be stream copied from the source instead of
+    # encoded, which ignores everything above
+    stream_copy: bool = True
+
+    def prepare(self, segment: 'AudioSegment') -> 'AudioSegment':
+        """
+        Downmix and resample before encoding, so the encoder gets fewer
+        samples to work through.
+        """
+        if self.channels and segment.channels != self.channels:
+            segment = segment.set_channels(self.channels)
+        if self.sample_rate and segment.frame_rate != self.sample_rate:
+            segment = segment.set_frame_rate(self.sample_rate)
+        return segment
+
+    def export_options(self, file_format: str) -> dict:
+        """
+        Keyword arguments for AudioSegment.export for the given format.
+
+        Returns:
+            dict: codec, bitrate and parameters, only those the profile sets
+        """
+        options = {}
+        if file_format in self.codecs:
+            options['codec'] = self.codecs[file_format]
+        if file_format in self.bitrates:
+            options['bitrate'] = self.bitrates[file_format]
+        parameters = list(self.parameters.get(file_format, []))
+        if file_format in self.qualities:
+            parameters += ['-q:a', str(self.qualities[file_format])]
+        if self.threads is not None:
+            parameters += ['-threads', str(self.threads)]
+        if parameters:
+            options['parameters'] = parameters
+        return options
+
+    def ffmpeg_options(self, file_format: str) -> list[str]:
+        """
+        The same settings as ffmpeg output options, for encoders fed by a pipe.
+        Resampling and downmixing are done by ffmpeg here.
+        """
+        options = []
+        if self.sample_rate:
+            options += ['-ar', str(self.sample_rate)]
+        if self.channels:
+            options += ['-ac', str(self.channels)]
+        export_options = self.export_options(file_format)
+        if 'codec' in export_options:
+            options += ['-acodec', export_options['codec']]
+        if 'bitrate' in export_options:
+            options += ['-b:a', export_options['bitrate']]
+        return options + export_options.get('parameters', [])
+
+    def settings(self) -> dict:
+        """Everything that changes the encoded output, e.g. for cache keys."""
+        return {
+            'profile': self.name,
+            'codecs': self.codecs,
+            'bitrates': self.bitrates,
+            'qualities': self.qualities,
+            'parameters': self.parameters,
+            'sample_rate': self.sample_rate,
+            'channels': self.channels,
+        }
+
+
+PROFILES = {
+    profile.name: profile for profile in (
+        EncodingProfile(
+            'default',
+            "ffmpeg's defaults for the output format",
+        ),
+        EncodingProfile(
+            'fast-preview',
+            "Quick, small files for checking a cut: low bitrate, fastest encoder settings",
+            bitrates={'mp3': '96k', 'm4a': '96k'},
+            qualities={'ogg': 2},
+            # LAME's fastest algorithm
+            parameters={'mp3': ['-compression_level', '9']},
+            sample_rate=22050,
+            threads=0,
+        ),
+        EncodingProfile(
+            'archive',
+            "Highest quality: VBR V0 mp3, q8 vorbis, 256k AAC; stream copies where possible",
+            qualities={'mp3': 0, 'ogg': 8},
+            bitrates={'m4a': '256k'},
+            parameters={'mp3': ['-compression_level', '0']},
+        ),
+        EncodingProfile(
+            'voice-mono-16k',
+            "Speech: mono, 16 kHz, low bitrate",
+            bitrates={'mp3': '32k', 'm4a': '32k'},
+            qualities={'ogg': 0},
+            sample_rate=16000,
+            channels=1,
+            stream_copy=False,
+        ),
+    )
+}
+
+
+def get_profile(profile: 'str | EncodingProfile | None') -> EncodingProfile:
+    """
+    Look up an encoding profile.
+
+    Args:
+        profile: Profile name, a profile (returned as is), or None for the default
+
+    Returns:
+        EncodingProfile: The profile
+
+    Raises:
+        ValueError: If there is no profile with that name
+    """
+    if isinstance(profile, EncodingProfile):
+        return profile
+    try:
+        return PROFILES[profile or 'default']
+    except KeyError:
+        raise ValueError(f"Unknown encoding profile. Available profiles: {', '.join(PROFILES)}")
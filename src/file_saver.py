@@ -1,12 +1,55 @@
 import os
-from pydub import AudioSegment
+import subprocess
+import tempfile
+from typing import TYPE_CHECKING
+from .clip_cache import ClipCache
+from .encoding_profiles import EncodingProfile, get_profile
+from .instrumentation import get_instrumentation
+
+# pydub and the processors are imported where they are used, so the CLI can
+# start (and e.g. print --help) without loading them
+if TYPE_CHECKING:
+    from pydub import AudioSegment
+    from .streaming import StreamingAudioProcessor
 
 class FileSaver:
     SUPPORTED_FORMATS = {'mp3', 'wav', 'ogg', 'm4a'}
 
-    def save_audio(self, audio_segment: AudioSegment, output_path: str):
+    # Source audio codecs that each output format can hold as-is, so the clip
+    # can be cut with a stream copy instead of a decode and re-encode
+    STREAM_COPY_CODECS = {
+        'm4a': {'aac', 'alac'},
+        'mp3': {'mp3'},
+        'ogg': {'vorbis', 'opus'},
+        'wav': {'pcm_s16le'},
+    }
+
+    def __init__(self, clip_cache: ClipCache | None = None, profile: str | EncodingProfile | None = None,
+                 encode_workers: int = 1):
+        """
+        Args:
+            clip_cache (ClipCache): Cache that save_clip() serves repeated clips from
+            profile (str | EncodingProfile): Encoding profile name (see
+                encoding_profiles.PROFILES) or profile, "default" if omitted
+            encode_workers (int): Encode long MP3 clips in up to this many
+                processes at once (see SegmentedEncoder); 1 uses a single encoder
+
+        Raises:
+            ValueError: If the profile does not exist
+        """
+        self.clip_cache = clip_cache
+        self.profile = get_profile(profile)
+        self.segmented_encoder = None
+        if encode_workers > 1:
+            from .segmented_encoder import SegmentedEncoder
+            self.segmented_encoder = SegmentedEncoder(encode_workers)
+
+    def save_audio(self, audio_segment: 'AudioSegment', output_path: str):
         """
-        Save an audio segment to a file.
+        Save an audio segment to a file, encoded with the saver's profile.
+
+        With encode_workers above 1, long MP3 clips are encoded in parallel
+        chunks; everything else is encoded by one ffmpeg process.
         
         Args:
             audio_segment (AudioSegment): The audio to save
@@ -15,6 +58,152 @@ class FileSaver:
         Raises:
             ValueError: If the file format is not supported or path is invalid
         """
+        file_format = self._prepare_output(output_path)
+
+        try:
+            with get_instrumentation().stage('encode', format=file_format, profile=self.profile.name):
+                audio_segment = self.profile.prepare(audio_segment)
+                if (self.segmented_encoder
+                        and self.segmented_encoder.supports(audio_segment, file_format, self.profile)):
+                    self.segmented_encoder.encode(audio_segment, output_path,
+                                                  self.profile.ffmpeg_options(file_format))
+                else:
+                    audio_segment.export(output_path, format=file_format,
+                                         **self.profile.export_options(file_format))
+        except Exception as e:
+            raise ValueError(f"Failed to save audio: {str(e)}")
+        self._count_written(output_path)
+
+    def save_clip(self, processor, output_path: str, allow_stream_copy: bool = True):
+        """
+        Save the selected range of an AudioProcessor to a file.
+
+        When no volume change or fade is applied, the profile allows it and
+        the source audio codec fits the output format, the range is cut
+        straight out of the source file with an ffmpeg stream copy. Otherwise
+        the selection is decoded and re-encoded: block by block through
+        ffmpeg pipes for a StreamingAudioProcessor, or with save_audio.
+
+        With a clip cache, a clip saved before (same source content, range,
+        effects, format and settings) is copied from the cache instead.
+
+        Args:
+            processor (AudioProcessor): Processor holding the source and time range
+            output_path (str): Path where to save the audio file
+            allow_stream_copy (bool): Set to False to always re-encode, which
+                cuts on exact samples instead of on codec packet boundaries
+
+        Raises:
+            ValueError: If the file format is not supported or path is invalid
+        """
+        file_format = self._prepare_output(output_path)
+
+        cache_key = None
+        if self.clip_cache:
+            cache_key = self.clip_cache.key(
+                processor.video_path, processor.start_time, processor.end_time, file_format,
+                gain=processor.gain_db, fade_in=processor.fade_in, fade_out=processor.fade_out,
+                settings={'stream_copy': allow_stream_copy, **self.profile.settings()}
+            )
+            if self.clip_cache.get(cache_key, output_path):
+                return
+
+        self._produce_clip(processor, output_path, file_format, allow_stream_copy)
+        if cache_key:
+            self.clip_cache.put(cache_key, output_path)
+
+    def _produce_clip(self, processor, output_path: str, file_format: str, allow_stream_copy: bool):
+        """Cut and, if needed, encode the selection; see save_clip()."""
+        from .probe import probe_media
+        from .streaming import StreamingAudioProcessor
+
+        if allow_stream_copy and self.profile.stream_copy and not processor.has_effects:
+            try:
+                codec = probe_media(processor.video_path).codec
+            except ValueError:
+                codec = None
+            if codec in self.STREAM_COPY_CODECS[file_format]:
+                try:
+                    with get_instrumentation().stage('stream_copy', format=file_format):
+                        self._stream_copy(processor.video_path, processor.start_time, processor.end_time, output_path)
+                    self._count_written(output_path)
+                    return
+                except ValueError:
+                    # Some containers refuse a copied stream; re-encode instead
+                    pass
+
+        if isinstance(processor, StreamingAudioProcessor):
+            with get_instrumentation().stage('encode_stream', format=file_format):
+                self._save_stream(processor, output_path, self.profile.ffmpeg_options(file_format))
+            self._count_written(output_path)
+            return
+
+        self.save_audio(processor.get_audio_segment(), output_path)
+
+    @staticmethod
+    def _save_stream(processor: 'StreamingAudioProcessor', output_path: str, options: list[str] | None = None):
+        """
+        Encode a streaming processor's selection by feeding its PCM blocks to
+        an ffmpeg encoder, so memory use does not depend on clip length.
+
+        Args:
+            options (list[str]): Extra ffmpeg output options, e.g. from the profile
+
+        Raises:
+            ValueError: If encoding fails
+        """
+        from pydub import AudioSegment
+
+        command = [
+            AudioSegment.converter, '-y', '-v', 'error',
+            '-f', 's16le',
+            '-ar', str(processor.frame_rate),
+            '-ac', str(processor.channels),
+            '-i', '-',
+            *(options or []),
+            output_path
+        ]
+        with tempfile.TemporaryFile() as stderr:
+            try:
+                encoder = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=stderr)
+            except OSError as e:
+                raise ValueError(f"Failed to run ffmpeg: {str(e)}")
+
+            try:
+                for block in processor.iter_pcm_blocks():
+                    encoder.stdin.write(block)
+            except (BrokenPipeError, ValueError) as e:
+                # The encoder exited early; its error is reported below
+                if not isinstance(e, BrokenPipeError):
+                    encoder.kill()
+                    encoder.wait()
+                    raise ValueError(f"Failed to save audio: {str(e)}")
+            finally:
+                try:
+                    encoder.stdin.close()
+                except BrokenPipeError:
+                    pass
+
+            if encoder.wait() != 0:
+                stderr.seek(0)
+                message = stderr.read().decode(errors='replace').strip()
+                raise ValueError(f"Failed to save audio: {message}")
+
+    @staticmethod
+    def _count_written(output_path: str):
+        """Add the size of a saved file to the bytes_written counter."""
+        try:
+            get_instrumentation().count('bytes_written', os.path.getsize(output_path))
+        except OSError:
+            pass
+
+    def _prepare_output(self, output_path: str) -> str:
+        """
+        Validate the output format and create the output directory.
+
+        Returns:
+            str: The output file format
+        """
         file_format = output_path.split('.')[-1].lower()
         if file_format not in self.SUPPORTED_FORMATS:
             raise ValueError(f"Unsupported format. Supported formats: {', '.join(self.SUPPORTED_FORMATS)}")
@@ -27,6 +216,41 @@ class FileSaver:
                 raise ValueError("Invalid output directory path")
 
         try:
-            audio_segment.export(output_path, format=file_format)
-        except Exception as e:
-            raise ValueError(f"Failed to save audio: {str(e)}") 
\ No newline at end of file
+            # A file with other links may be a ClipCache entry; replace it
+            # instead of writing through it
+            if os.stat(output_path).st_nlink > 1:
+                os.remove(output_path)
+        except (OSError, ValueError):
+            pass
+
+        return file_format
+
+    @staticmethod
+    def _stream_copy(source_path: str, start: float, end: float, output_path: str):
+        """
+        Copy the first audio stream of a file between start and end (in
+        seconds) into output_path without decoding it.
+
+        Raises:
+            ValueError: If ffmpeg fails
+        """
+        from pydub import AudioSegment
+
+        command = [
+            AudioSegment.converter, '-y', '-v', 'error',
+            '-ss', f"{start:.3f}",
+            '-i', source_path,
+            '-t', f"{end - start:.3f}",
+            '-map', '0:a:0', '-vn',
+            '-c:a', 'copy',
+            output_path
+        ]
+        try:
+            result = subprocess.run(command, capture_output=True)
+        except OSError as e:
+            raise ValueError(f"Failed to run ffmpeg: {str(e)}")
+
+        if result.returncode != 0:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise ValueError(f"Stream copy failed: {result.stderr.decode(errors='replace').strip()}") 
\ No newline at end of file
@@ -1,19 +1,139 @@
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
+from typing import TYPE_CHECKING
 from .youtube_downloader import YoutubeDownloader
-from .audio_processor import AudioProcessor
+from .download_cache import DownloadCache
+from .clip_cache import ClipCache
+from .encoding_profiles import PROFILES
+from .background import BackgroundRunner
 from .file_saver import FileSaver
+from .scratch import start_scratch_space
+from .utils.time_converter import TimeConverter
+
+# Decoding (pydub, NumPy) is imported by the background jobs that need it,
+# so the window opens without waiting for it
+if TYPE_CHECKING:
+    from .audio_processor import AudioProcessor
+    from .waveform import PeakIndex
+
+class WaveformView:
+    """
+    Waveform of the downloaded audio with the selection highlighted. Scroll
+    to zoom around the pointer, drag to select a range.
+    """
+    HEIGHT = 100
+    ZOOM_FACTOR = 1.5
+    MIN_SPAN_SECONDS = 0.01
+
+    def __init__(self, parent, on_select):
+        """
+        Args:
+            parent: Tk container to place the canvas in
+            on_select: Called with (start, end) in seconds when a range is dragged
+        """
+        self.canvas = tk.Canvas(parent, height=self.HEIGHT, background="white", highlightthickness=0)
+        self.canvas.pack(fill="x", expand=True)
+        self.on_select = on_select
+        self.index = None
+        self.duration = 0.0
+        self.view_start = 0.0
+        self.view_end = 0.0
+        self.selection = None
+        self._drag_start = None
+
+        self.canvas.bind("<Configure>", lambda event: self.redraw())
+        self.canvas.bind("<MouseWheel>", lambda event: self._zoom(event.x, event.delta > 0))
+        self.canvas.bind("<Button-4>", lambda event: self._zoom(event.x, True))
+        self.canvas.bind("<Button-5>", lambda event: self._zoom(event.x, False))
+        self.canvas.bind("<ButtonPress-1>", self._start_drag)
+        self.canvas.bind("<B1-Motion>", self._drag)
+        self.canvas.bind("<ButtonRelease-1>", self._end_drag)
+
+    def set_index(self, index: 'PeakIndex | None', duration: float):
+        self.index = index
+        self.duration = duration
+        self.view_start, self.view_end = 0.0, duration
+        self.selection = None
+        self.redraw()
+
+    def set_selection(self, start: float, end: float):
+        self.selection = (start, end)
+        self.redraw()
+
+    def redraw(self):
+        self.canvas.delete("all")
+        width = self.canvas.winfo_width()
+        if self.index is None or width <= 1 or self.view_end <= self.view_start:
+            return
+
+        middle = self.HEIGHT / 2
+        if self.selection:
+            left, right = (self._time_to_x(time) for time in self.selection)
+            self.canvas.create_rectangle(left, 0, right, self.HEIGHT, fill="#dde8f5", outline="")
+
+        # One line per pixel, however long the view is
+        mins, maxs, rms = self.index.render(self.view_start, self.view_end, width)
+        for x in range(width):
+            self.canvas.create_line(x, middle - maxs[x] * middle, x, middle - mins[x] * middle + 1, fill="#7a9cc6")
+            self.canvas.create_line(x, middle - rms[x] * middle, x, middle + rms[x] * middle + 1, fill="#2f5d93")
+
+    def _time_to_x(self, time: float) -> float:
+        width = self.canvas.winfo_width()
+        return (time - self.view_start) * width / (self.view_end - self.view_start)
+
+    def _x_to_time(self, x: float) -> float:
+        width = max(1, self.canvas.winfo_width())
+        time = self.view_start + x * (self.view_end - self.view_start) / width
+        return min(max(time, 0.0), self.duration)
+
+    def _zoom(self, x: float, zoom_in: bool):
+        if self.index is None:
+            return
+        anchor = self._x_to_time(x)
+        factor = 1 / self.ZOOM_FACTOR if zoom_in else self.ZOOM_FACTOR
+        span = min(max((self.view_end - self.view_start) * factor, self.MIN_SPAN_SECONDS), self.duration)
+        # Keep the time under the pointer in place
+        start = anchor - (anchor - self.view_start) * span / (self.view_end - self.view_start)
+        start = min(max(start, 0.0), self.duration - span)
+        self.view_start, self.view_end = start, start + span
+        self.redraw()
+
+    def _start_drag(self, event):
+        if self.index is not None:
+            self._drag_start = self._x_to_time(event.x)
+
+    def _drag(self, event):
+        if self._drag_start is not None:
+            self.set_selection(*sorted((self._drag_start, self._x_to_time(event.x))))
+
+    def _end_drag(self, event):
+        if self._drag_start is None:
+            return
+        start, end = sorted((self._drag_start, self._x_to_time(event.x)))
+        self._drag_start = None
+        if end > start:
+            self.set_selection(start, end)
+            self.on_select(start, end)
+
 
 class AudioExtractorGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("YouTube Audio Extractor")
-        self.downloader = YoutubeDownloader()
-        self.file_saver = FileSaver()
+        self.downloader = YoutubeDownloader(cache=DownloadCache(), audio_only=True)
+        self.clip_cache = ClipCache()
         self.processor = None
+        self.runner = BackgroundRunner(root)
+        self.download_job = None
+        self.preview_job = None
+        self.save_jobs = []
+        # Previews share the processor's decoded window, so run one at a time
+        self.preview_lock = threading.Lock()
         
         # Create GUI elements
         self._create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self._close)
         
     def _create_widgets(self):
         # URL input
@@ -23,7 +143,16 @@ class AudioExtractorGUI:
         self.url_entry = ttk.Entry(url_frame, width=50)
         self.url_entry.pack(side="left", padx=5, expand=True, fill="x")
         
+        ttk.Button(url_frame, text="Cancel", command=self._cancel_download).pack(side="right", padx=5)
         ttk.Button(url_frame, text="Download", command=self._download_video).pack(side="right", padx=5)
+
+        self.download_progress = ttk.Progressbar(self.root, mode="determinate", maximum=100)
+        self.download_progress.pack(fill="x", padx=10)
+
+        waveform_frame = ttk.LabelFrame(self.root, text="Waveform (scroll to zoom, drag to select)", padding="5")
+        waveform_frame.pack(fill="x", padx=5, pady=5)
+        self.waveform = WaveformView(waveform_frame, on_select=self._select_range)
+        self.waveform_job = None
         
         # Time range frame
         time_frame = ttk.LabelFrame(self.root, text="Time Range", padding="5")
@@ -41,6 +170,7 @@ class AudioExtractorGUI:
         
         # Preview button
         ttk.Button(time_frame, text="Preview", command=self._preview_audio).grid(row=0, column=4, padx=5)
+        ttk.Button(time_frame, text="Stop", command=self._stop_preview).grid(row=0, column=5, padx=5)
         
         # Volume adjustment
         volume_frame = ttk.LabelFrame(self.root, text="Volume", padding="5")
@@ -51,22 +181,87 @@ class AudioExtractorGUI:
         self.volume_adj.pack(side="left", padx=5)
         ttk.Button(volume_frame, text="Apply", command=self._adjust_volume).pack(side="right", padx=5)
         
-        # Save button
-        ttk.Button(self.root, text="Save Audio", command=self._save_audio).pack(pady=10)
+        # Save button and queue
+        save_frame = ttk.Frame(self.root, padding="5")
+        save_frame.pack(fill="x", padx=5, pady=5)
+        ttk.Button(save_frame, text="Save Audio", command=self._save_audio).pack(side="left", padx=5)
+        ttk.Button(save_frame, text="Cancel Saves", command=self._cancel_saves).pack(side="left", padx=5)
+        ttk.Label(save_frame, text="Profile:").pack(side="left", padx=(10, 0))
+        self.profile = ttk.Combobox(save_frame, values=list(PROFILES), state="readonly", width=15)
+        self.profile.set('default')
+        self.profile.pack(side="left", padx=5)
+        self.save_progress = ttk.Progressbar(save_frame, mode="indeterminate")
+        self.save_progress.pack(side="left", padx=5, expand=True, fill="x")
+
+        self.status = ttk.Label(self.root, text="Ready")
+        self.status.pack(fill="x", padx=10, pady=(0, 5))
         
     def _download_video(self):
-        try:
-            url = self.url_entry.get().strip()
-            if not url:
-                messagebox.showerror("Error", "Please enter a URL")
-                return
-                
-            video_path = self.downloader.download_video(url)
-            self.processor = AudioProcessor(video_path)
+        url = self.url_entry.get().strip()
+        if not url:
+            messagebox.showerror("Error", "Please enter a URL")
+            return
+        if self.download_job and not self.download_job.future.done():
+            messagebox.showerror("Error", "A download is already running")
+            return
+
+        def download(job):
+            from .audio_processor import AudioProcessor
+
+            video_path = self.downloader.download_video(url, on_progress=job.report_progress)
+            job.check_cancelled()
+            return AudioProcessor(video_path, lazy=True)
+
+        def done(processor):
+            if self.processor:
+                self.processor.cleanup()
+            self.processor = processor
+            self.download_progress['value'] = 100
+            self._set_status("Video downloaded")
+            self._load_waveform(processor)
             messagebox.showinfo("Success", "Video downloaded successfully!")
-            
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+
+        self.download_progress['value'] = 0
+        self._set_status("Downloading...")
+        self.download_job = self.runner.submit(
+            download,
+            on_done=done,
+            on_error=self._show_error,
+            on_progress=self._update_download_progress
+        )
+
+    def _load_waveform(self, processor: 'AudioProcessor'):
+        if self.waveform_job:
+            self.waveform_job.cancel()
+        self.waveform.set_index(None, processor.duration)
+
+        def build(job):
+            from .waveform import PeakIndex
+
+            # Built once per download and cached next to it
+            return PeakIndex.for_file(processor.video_path)
+
+        def done(index):
+            if processor is self.processor:
+                self.waveform.set_index(index, processor.duration)
+
+        self.waveform_job = self.runner.submit(build, on_done=done, on_error=self._show_error)
+
+    def _select_range(self, start: float, end: float):
+        for entry, seconds in ((self.start_time, start), (self.end_time, end)):
+            entry.delete(0, tk.END)
+            entry.insert(0, TimeConverter.seconds_to_time(round(seconds, 3)))
+
+    def _update_download_progress(self, done: int, total: int):
+        if total:
+            self.download_progress['value'] = done * 100 / total
+            self._set_status(f"Downloading... {done / 1024 ** 2:.1f} of {total / 1024 ** 2:.1f} MB")
+
+    def _cancel_download(self):
+        if self.download_job:
+            self.download_job.cancel()
+            self.download_progress['value'] = 0
+            self._set_status("Download cancelled")
     
     def _preview_audio(self):
         if not self.processor:
@@ -77,16 +272,37 @@ class AudioExtractorGUI:
             start = self.start_time.get().strip()
             end = self.end_time.get().strip()
             self.processor.set_time_range(start, end)
-            self.processor.play_preview()
         except Exception as e:
             messagebox.showerror("Error", str(e))
+            return
+        self.waveform.set_selection(self.processor.start_time, self.processor.end_time)
+
+        # Only the latest preview request should play
+        if self.preview_job:
+            self.preview_job.cancel()
+
+        processor = self.processor
+
+        def preview(job):
+            with self.preview_lock:
+                job.check_cancelled()
+                processor.play_preview()
+
+        self.preview_job = self.runner.submit(preview, on_error=self._show_error)
     
+    def _stop_preview(self):
+        if self.preview_job:
+            self.preview_job.cancel()
+        if self.processor:
+            self.processor.stop_preview()
+
     def _adjust_volume(self):
         if not self.processor:
             messagebox.showerror("Error", "Please download a video first")
             return
             
         try:
+            # Only records the gain, so this is instant on any source length
             db_change = float(self.volume_adj.get())
             self.processor.adjust_volume(db_change)
             messagebox.showinfo("Success", "Volume adjusted!")
@@ -108,16 +324,81 @@ class AudioExtractorGUI:
                     ("M4A files", "*.m4a")
                 ]
             )
-            if file_path:
-                self.file_saver.save_audio(self.processor.get_audio_segment(), file_path)
-                messagebox.showinfo("Success", "Audio saved successfully!")
         except Exception as e:
             messagebox.showerror("Error", str(e))
+            return
+        if not file_path:
+            return
+
+        # Saves are queued and run one after another on their own processor,
+        # with the selection as it is now, so editing can continue meanwhile
+        source = self.processor
+        file_saver = FileSaver(self.clip_cache, profile=self.profile.get())
+        selection = (source.start_time, source.end_time, source.gain_db, source.fade_in, source.fade_out)
+
+        def save(job):
+            from .audio_processor import AudioProcessor
+            from .playback import NullBackend
+
+            processor = AudioProcessor(source.video_path, lazy=True, playback=NullBackend())
+            try:
+                processor.start_time, processor.end_time, processor.gain_db, \
+                    processor.fade_in, processor.fade_out = selection
+                job.check_cancelled()
+                file_saver.save_clip(processor, file_path)
+            finally:
+                processor.cleanup()
+            return file_path
+
+        def done(path):
+            self._save_finished(save_job)
+            self._set_status(f"Saved {path}")
+
+        def failed(error):
+            self._save_finished(save_job)
+            self._show_error(error)
+
+        save_job = self.runner.submit(save, on_done=done, on_error=failed, serial=True)
+        self.save_jobs.append(save_job)
+        self.save_progress.start()
+        self._set_status(f"Saving... ({len(self.save_jobs)} queued)")
+
+    def _save_finished(self, job):
+        # Already gone if the saves were cancelled after it finished
+        if job in self.save_jobs:
+            self.save_jobs.remove(job)
+        if not self.save_jobs:
+            self.save_progress.stop()
+
+    def _cancel_saves(self):
+        for job in self.save_jobs:
+            job.cancel()
+        self.save_jobs = []
+        self.save_progress.stop()
+        self._set_status("Saves cancelled")
+
+    def _set_status(self, text: str):
+        self.status['text'] = text
+
+    def _show_error(self, error: Exception):
+        self._set_status("Error")
+        messagebox.showerror("Error", str(error))
+
+    def _close(self):
+        self.runner.shutdown()
+        if self.waveform_job:
+            self.waveform_job.cancel()
+        if self.download_job:
+            self.download_job.cancel()
+        if self.processor:
+            self.processor.cleanup()
+        self.root.destroy()
     
     def __del__(self):
         self.downloader.cleanup()
 
-def main():
+def main(scratch_dir: str | None = None, scratch_quota_bytes: int | None = None):
+    start_scratch_space(scratch_dir, quota_bytes=scratch_quota_bytes)
     root = tk.Tk()
     app = AudioExtractorGUI(root)
     root.mainloop()
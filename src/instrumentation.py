@@ -0,0 +1,204 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def peak_rss_bytes() -> int | None:
+    """
+    Get the peak resident set size of this process.
+
+    Returns:
+        int | None: Peak RSS in bytes, or None where it cannot be measured
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Instrumentation:
+    """
+    Records per-stage timings and counters (bytes downloaded and written,
+    decoded samples, ...) and passes them to the configured sinks.
+    """
+
+    def __init__(self, sinks: list | None = None):
+        """
+        Args:
+            sinks (list): Objects with record(event) and flush(snapshot) methods
+        """
+        self.sinks = sinks or []
+        self.stages: dict[str, dict] = {}
+        self.counters: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, **labels):
+        """
+        Time a pipeline stage.
+
+        Args:
+            name (str): Stage name, e.g. "download" or "encode"
+            **labels: Extra fields recorded with the event, e.g. the file path
+        """
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            event = {
+                'event': 'stage',
+                'stage': name,
+                'seconds': seconds,
+                'ok': error is None,
+                'peak_rss_bytes': peak_rss_bytes(),
+                'timestamp': time.time(),
+                **labels
+            }
+            with self._lock:
+                totals = self.stages.setdefault(name, {'count': 0, 'seconds': 0.0, 'errors': 0})
+                totals['count'] += 1
+                totals['seconds'] += seconds
+                totals['errors'] += error is not None
+            for sink in self.sinks:
+                sink.record(event)
+
+    def count(self, name: str, value: float = 1):
+        """
+        Add to a counter.
+
+        Args:
+            name (str): Counter name, e.g. "bytes_downloaded"
+            value (float): Amount to add
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self) -> dict:
+        """
+        Get the totals recorded so far.
+
+        Returns:
+            dict: Per-stage totals, counters and the peak RSS
+        """
+        with self._lock:
+            return {
+                'stages': {name: dict(totals) for name, totals in self.stages.items()},
+                'counters': dict(self.counters),
+                'peak_rss_bytes': peak_rss_bytes()
+            }
+
+    def flush(self):
+        """Write the current totals to all sinks."""
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            sink.flush(snapshot)
+
+
+class NullInstrumentation(Instrumentation):
+    """Instrumentation that records nothing, used when none is configured."""
+
+    @contextmanager
+    def stage(self, name: str, **labels):
+        yield
+
+    def count(self, name: str, value: float = 1):
+        pass
+
+
+class JsonLogSink:
+    """Appends every stage event, and totals on flush, to a JSON lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, event: dict):
+        self._write(event)
+
+    def flush(self, snapshot: dict):
+        self._write({'event': 'summary', 'timestamp': time.time(), **snapshot})
+
+    def _write(self, entry: dict):
+        line = json.dumps(entry, default=str)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+class PrometheusTextSink:
+    """
+    Writes totals in the Prometheus text exposition format on flush, e.g.
+    for the node_exporter textfile collector.
+    """
+    PREFIX = 'vid2audioclip'
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def record(self, event: dict):
+        pass
+
+    def flush(self, snapshot: dict):
+        # Write atomically so scrapers never see a half-written file
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render(snapshot))
+        os.replace(temp_path, self.path)
+
+    @classmethod
+    def render(cls, snapshot: dict) -> str:
+        """
+        Format a snapshot in the Prometheus text exposition format.
+
+        Args:
+            snapshot (dict): Totals as returned by Instrumentation.snapshot()
+
+        Returns:
+            str: The metrics, one per line
+        """
+        lines = [
+            f"# TYPE {cls.PREFIX}_stage_seconds_total counter",
+            *(f'{cls.PREFIX}_stage_seconds_total{{stage="{name}"}} {totals["seconds"]}'
+              for name, totals in sorted(snapshot['stages'].items())),
+            f"# TYPE {cls.PREFIX}_stage_runs_total counter",
+            *(f'{cls.PREFIX}_stage_runs_total{{stage="{name}"}} {totals["count"]}'
+              for name, totals in sorted(snapshot['stages'].items())),
+            f"# TYPE {cls.PREFIX}_stage_errors_total counter",
+            *(f'{cls.PREFIX}_stage_errors_total{{stage="{name}"}} {totals["errors"]}'
+              for name, totals in sorted(snapshot['stages'].items())),
+        ]
+        for name, value in sorted(snapshot['counters'].items()):
+            lines += [f"# TYPE {cls.PREFIX}_{name}_total counter", f"{cls.PREFIX}_{name}_total {value}"]
+        if snapshot['peak_rss_bytes'] is not None:
+            lines += [f"# TYPE {cls.PREFIX}_peak_rss_bytes gauge",
+                      f"{cls.PREFIX}_peak_rss_bytes {snapshot['peak_rss_bytes']}"]
+        return '\n'.join(lines) + '\n'
+
+
+_instrumentation: Instrumentation = NullInstrumentation()
+
+def get_instrumentation() -> Instrumentation:
+    """Return the instrumentation used by the pipeline."""
+    return _instrumentation
+
+def set_instrumentation(instrumentation: Instrumentation | None):
+    """
+    Set the instrumentation used by the pipeline.
+
+    Args:
+        instrumentation (Instrumentation): New instrumentation, or None to disable it
+    """
+    global _instrumentation
+    _instrumentation = instrumentation or NullInstrumentation()
@@ -0,0 +1,342 @@
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from .audio_processor import AudioProcessor
+from .clip_cache import ClipCache
+from .encoding_profiles import get_profile
+from .file_saver import FileSaver
+from .playback import NullBackend
+from .shared_pcm import PCMHandle, SharedPCM
+from .utils.time_converter import TimeConverter
+
+# Clips closer together than this are decoded as one region, trading a
+# little extra decoding for fewer ffmpeg runs
+MERGE_GAP_SECONDS = 10.0
+
+
+@dataclass
+class ClipRequest:
+    """A single clip to cut, as read from a manifest row."""
+    url: str
+    start: str
+    end: str
+    output_path: str
+    gain: float = 0.0
+    line: int = 0
+    # Encoding profile name, None for the extractor's profile
+    profile: str | None = None
+
+
+@dataclass
+class ClipResult:
+    """Outcome of extracting one clip."""
+    request: ClipRequest
+    success: bool
+    seconds: float
+    error: str | None = None
+
+
+def merge_ranges(ranges: list[tuple[float, float]], gap: float = 0.0) -> list[tuple[float, float]]:
+    """
+    Sort ranges and merge the ones that overlap or are at most gap seconds apart.
+
+    Args:
+        ranges (list[tuple[float, float]]): (start, end) pairs in seconds
+        gap (float): Largest distance between ranges that still get merged
+
+    Returns:
+        list[tuple[float, float]]: Disjoint ranges in ascending order
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + gap:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+CUE_TRACK_PATTERN = re.compile(r'^\s*TRACK\s+\d+', re.IGNORECASE)
+CUE_TITLE_PATTERN = re.compile(r'^\s*TITLE\s+"?(.*?)"?\s*$', re.IGNORECASE)
+CUE_INDEX_PATTERN = re.compile(r'^\s*INDEX\s+01\s+(\d+):(\d+):(\d+)', re.IGNORECASE)
+# "1:30 2:45 Title", "1:30 - 2:45 Title" or chapter style "1:30 Title"; an
+# end time needs a colon so titles starting with a number are not mistaken for one
+TIMESTAMP_PATTERN = re.compile(
+    r'^\s*(?P<start>\d+(?::\d+){0,2}(?:[.,]\d+)?)'
+    r'(?:\s*(?:-|–|to)?\s*(?P<end>\d+(?::\d+){1,2}(?:[.,]\d+)?))?'
+    r'\s*(?:[-–|:]\s+)?(?P<title>.*?)\s*$'
+)
+
+
+def read_ranges(ranges_path: str) -> list[tuple[float, float | None, str]]:
+    """
+    Read clip ranges from a cue sheet (.cue) or a timestamp list.
+
+    A timestamp list has one clip per line, either "START END [title]" or,
+    like a YouTube chapter list, "START [title]". Clips without an end time
+    (and cue sheet tracks) end where the next one starts; the last one ends
+    at None, meaning the end of the source.
+
+    Args:
+        ranges_path (str): Path to the ranges file
+
+    Returns:
+        list[tuple[float, float | None, str]]: (start, end, title) in seconds
+
+    Raises:
+        ValueError: If the file cannot be read or a line is invalid
+    """
+    try:
+        with open(ranges_path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    except OSError as e:
+        raise ValueError(f"Failed to read ranges file: {str(e)}")
+
+    entries = []  # (start, end or None, title)
+    if ranges_path.lower().endswith('.cue'):
+        title = ''
+        in_track = False
+        for line in lines:
+            if CUE_TRACK_PATTERN.match(line):
+                in_track = True
+                title = ''
+            elif in_track and CUE_TITLE_PATTERN.match(line):
+                title = CUE_TITLE_PATTERN.match(line).group(1)
+            elif in_track and CUE_INDEX_PATTERN.match(line):
+                minutes, seconds, frames = map(int, CUE_INDEX_PATTERN.match(line).groups())
+                # Cue sheet frames are 1/75 of a second
+                entries.append((minutes * 60 + seconds + frames / 75, None, title))
+    else:
+        rows = []  # (line number, start, end or None, title) as text
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            match = TIMESTAMP_PATTERN.match(line)
+            if not match:
+                raise ValueError(f"Invalid range on line {line_number}: {line.strip()}")
+            rows.append((line_number, match.group('start'), match.group('end'), match.group('title')))
+
+        # Long lists are converted in bulk rather than line by line
+        starts, errors = TimeConverter.parse_many([row[1] for row in rows])
+        ends, end_errors = TimeConverter.parse_many([row[2] or 0 for row in rows])
+        errors = {**end_errors, **errors}
+        if errors:
+            index = min(errors)
+            raise ValueError(f"Invalid range on line {rows[index][0]}: {errors[index]}")
+        for (_, _, end, title), start_seconds, end_seconds in zip(rows, starts.tolist(), ends.tolist()):
+            entries.append((start_seconds, end_seconds if end else None, title))
+
+    ranges = []
+    for index, (start, end, title) in enumerate(entries):
+        if end is None and index + 1 < len(entries):
+            end = entries[index + 1][0]
+        ranges.append((start, end, title))
+    return ranges
+
+
+def clip_filename(index: int, title: str, file_format: str) -> str:
+    """
+    Build an output file name such as "03 - Chorus.mp3" for a numbered clip.
+    """
+    safe_title = re.sub(r'[<>:"/\\|?*\x00-\x1f]', '_', title).strip(' .')
+    return f"{index:02d} - {safe_title}.{file_format}" if safe_title else f"{index:02d}.{file_format}"
+
+
+def _encode_clip(handle: PCMHandle, start_ms: int, end_ms: int, gain: float, output_path: str,
+                 profile: str | None = None) -> float:
+    """
+    Encode a range of shared decoded audio to a file. Runs inside a worker process.
+
+    Returns:
+        float: Seconds spent encoding
+    """
+    started = time.perf_counter()
+    shared = SharedPCM.attach(handle)
+    error = None
+    try:
+        segment = shared.segment(start_ms, end_ms)
+        if gain:
+            segment = segment.apply_gain(gain)
+        FileSaver(profile=profile).save_audio(segment, output_path)
+    except Exception as e:
+        # Keep only the message: the traceback would keep views into the
+        # shared block alive, and the block cannot be closed while they are
+        error = str(e)
+    finally:
+        segment = None
+        shared.close()
+    if error:
+        raise ValueError(error)
+    return time.perf_counter() - started
+
+
+def submit_clips(video_path: str, requests: list[tuple[int, ClipRequest]], executor, record,
+                 merge_gap: float = MERGE_GAP_SECONDS, clip_cache: ClipCache | None = None,
+                 profile: str | None = None) -> dict:
+    """
+    Cut clips from one source and submit them to an executor for encoding.
+
+    The clip ranges are sorted and merged, and each merged region is
+    decoded once, so decoding grows with the total clip length rather than
+    with clip count or source length. Clips found in the clip cache are
+    copied from it and not decoded at all.
+
+    Each decoded region is placed in shared memory, and the encoders cut
+    their clips out of it in place, so a region is held once no matter how
+    many clips and worker processes use it. The memory is freed when the
+    region's last encode finishes.
+
+    Args:
+        video_path (str): Source file
+        requests (list[tuple[int, ClipRequest]]): Clips with their result index
+        executor: Executor to encode on
+        record: Callable invoked with (index, ClipResult) for clips that fail before encoding
+        merge_gap (float): Clips at most this many seconds apart are decoded together
+        clip_cache (ClipCache): Cache to serve repeated clips from and add new ones to
+        profile (str): Encoding profile for requests that do not name one
+
+    Returns:
+        dict: Pending futures mapped to (index, seconds spent cutting), for collect_results()
+
+    Raises:
+        ValueError: If the source cannot be opened
+    """
+    processor = AudioProcessor(video_path, lazy=True, playback=NullBackend())
+    try:
+        clips = []
+        cache_keys = {}
+        for index, request in requests:
+            started = time.perf_counter()
+            try:
+                clip_profile = get_profile(request.profile or profile)
+                processor.set_time_range(request.start, request.end)
+                if clip_cache:
+                    cache_keys[index] = clip_cache.key(
+                        video_path, processor.start_time, processor.end_time,
+                        os.path.splitext(request.output_path)[1].lstrip('.').lower(),
+                        gain=request.gain, settings={'stream_copy': False, **clip_profile.settings()}
+                    )
+                    os.makedirs(os.path.dirname(request.output_path) or '.', exist_ok=True)
+                    if clip_cache.get(cache_keys[index], request.output_path):
+                        record(index, ClipResult(request, True, time.perf_counter() - started))
+                        continue
+            except (ValueError, OSError) as e:
+                record(index, ClipResult(request, False, 0.0, str(e)))
+                continue
+            clips.append((processor.start_time, processor.end_time, index, request))
+        clips.sort(key=lambda clip: clip[:2])
+
+        pending = {}
+        for window_start, window_end in merge_ranges([clip[:2] for clip in clips], merge_gap):
+            started = time.perf_counter()
+            try:
+                processor.preload(window_start, window_end)
+                processor.start_time, processor.end_time = window_start, window_end
+                shared = SharedPCM.from_segment(processor.get_audio_segment(), int(window_start * 1000))
+            except (ValueError, OSError) as e:
+                for start, end, index, request in clips:
+                    if window_start <= start and end <= window_end:
+                        record(index, ClipResult(request, False, time.perf_counter() - started, str(e)))
+                continue
+
+            futures = []
+            for start, end, index, request in clips:
+                if not (window_start <= start and end <= window_end):
+                    continue
+                started = time.perf_counter()
+                try:
+                    future = executor.submit(
+                        _encode_clip,
+                        shared.handle,
+                        # Same millisecond positions as AudioProcessor slicing
+                        int(start * 1000),
+                        int(end * 1000),
+                        request.gain,
+                        request.output_path,
+                        request.profile or profile
+                    )
+                except Exception as e:
+                    record(index, ClipResult(request, False, time.perf_counter() - started, str(e)))
+                    continue
+                if index in cache_keys:
+                    future.add_done_callback(
+                        lambda future, key=cache_keys[index], path=request.output_path:
+                            future.exception() is None and clip_cache.put(key, path)
+                    )
+                futures.append(future)
+                pending[future] = (index, time.perf_counter() - started)
+            shared.release_when_done(futures)
+        return pending
+    finally:
+        processor.cleanup()
+
+
+def collect_results(pending: dict, requests: list[ClipRequest], record):
+    """
+    Wait for encodes submitted by submit_clips() and record their results
+    as they complete.
+    """
+    for future in as_completed(pending):
+        index, slice_seconds = pending[future]
+        try:
+            encode_seconds = future.result()
+            record(index, ClipResult(requests[index], True, slice_seconds + encode_seconds))
+        except Exception as e:
+            record(index, ClipResult(requests[index], False, slice_seconds, str(e)))
+
+
+class MultiClipExtractor:
+    def __init__(self, max_workers: int | None = None, executor_class=ProcessPoolExecutor,
+                 merge_gap: float = MERGE_GAP_SECONDS, clip_cache: ClipCache | None = None,
+                 profile: str | None = None):
+        """
+        Initialize the multi-clip extractor.
+
+        Args:
+            max_workers (int): Number of encoder processes, defaults to the CPU count
+            executor_class: Executor used for encoding, ProcessPoolExecutor by default
+            merge_gap (float): Clips at most this many seconds apart are decoded together
+            clip_cache (ClipCache): Cache to serve repeated clips from
+            profile (str): Encoding profile for requests that do not name one
+
+        Raises:
+            ValueError: If the profile does not exist
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor_class = executor_class
+        self.merge_gap = merge_gap
+        self.clip_cache = clip_cache
+        self.profile = get_profile(profile).name
+
+    def run(self, video_path: str, requests: list[ClipRequest], on_result=None) -> list[ClipResult]:
+        """
+        Extract several clips from one source file in a single pass.
+
+        Args:
+            video_path (str): Source file
+            requests (list[ClipRequest]): Clips to extract
+            on_result: Optional callable invoked with each ClipResult as it completes
+
+        Returns:
+            list[ClipResult]: One result per request, in request order
+        """
+        results: dict[int, ClipResult] = {}
+
+        def record(index: int, result: ClipResult):
+            results[index] = result
+            if on_result:
+                on_result(result)
+
+        with self.executor_class(max_workers=self.max_workers) as executor:
+            try:
+                pending = submit_clips(video_path, list(enumerate(requests)), executor, record,
+                                       self.merge_gap, self.clip_cache, self.profile)
+            except Exception as e:
+                for index, request in enumerate(requests):
+                    record(index, ClipResult(request, False, 0.0, str(e)))
+                pending = {}
+            collect_results(pending, requests, record)
+
+        return [results[index] for index in range(len(requests))]
@@ -0,0 +1,153 @@
+import subprocess
+import tempfile
+from collections.abc import Iterator
+from typing import TYPE_CHECKING
+from .instrumentation import get_instrumentation
+from .probe import probe_media
+
+if TYPE_CHECKING:
+    from pydub import AudioSegment
+
+SAMPLE_WIDTH = 2
+# Used when the source does not report its format
+DEFAULT_FRAME_RATE = 44100
+DEFAULT_CHANNELS = 2
+
+
+def decode_command(video_path: str, frame_rate: int, channels: int,
+                   start_second: float | None = None, duration: float | None = None) -> list[str]:
+    """
+    Build the ffmpeg command that decodes a media file to signed 16-bit
+    little-endian PCM on stdout.
+
+    The start position is given before the input (input seeking), so ffmpeg
+    jumps to the nearest keyframe and only decodes from there, instead of
+    decoding and discarding everything before the start.
+
+    Args:
+        video_path (str): Path to the media file
+        frame_rate (int): Output sample rate
+        channels (int): Output channel count
+        start_second (float): Where to start decoding, None for the beginning
+        duration (float): How much to decode in seconds, None for the rest of the file
+
+    Returns:
+        list[str]: The command
+    """
+    from pydub import AudioSegment
+
+    command = [AudioSegment.converter, '-v', 'error', '-nostdin']
+    if start_second:
+        command += ['-ss', f"{start_second:.6f}"]
+    command += ['-i', video_path]
+    if duration is not None:
+        command += ['-t', f"{duration:.6f}"]
+    command += [
+        '-map', '0:a:0', '-vn',
+        '-f', 's16le', '-acodec', 'pcm_s16le',
+        '-ar', str(frame_rate), '-ac', str(channels),
+        '-'
+    ]
+    return command
+
+
+def output_format(video_path: str) -> tuple[int, int]:
+    """
+    Get the sample rate and channel count a media file is decoded at.
+
+    Returns:
+        tuple[int, int]: (frame_rate, channels) of its first audio stream
+
+    Raises:
+        ValueError: If the file cannot be probed
+    """
+    info = probe_media(video_path)
+    return info.sample_rate or DEFAULT_FRAME_RATE, info.channels or DEFAULT_CHANNELS
+
+
+def decode_range(video_path: str, start_second: float, duration: float) -> 'AudioSegment':
+    """
+    Decode part of a media file, seeking to the start before decoding.
+
+    Args:
+        video_path (str): Path to the media file
+        start_second (float): Start of the range in seconds
+        duration (float): Length of the range in seconds
+
+    Returns:
+        AudioSegment: The decoded range
+
+    Raises:
+        ValueError: If the file cannot be probed or decoded
+    """
+    from pydub import AudioSegment
+
+    frame_rate, channels = output_format(video_path)
+    command = decode_command(video_path, frame_rate, channels, start_second, duration)
+    try:
+        result = subprocess.run(command, capture_output=True)
+    except OSError as e:
+        raise ValueError(f"Failed to run ffmpeg: {str(e)}")
+    if result.returncode != 0:
+        message = result.stderr.decode(errors='replace').strip() or "ffmpeg failed"
+        raise ValueError(f"Failed to decode audio: {message}")
+
+    frame_width = SAMPLE_WIDTH * channels
+    # Drop a trailing partial frame if the decoder stopped mid-frame
+    data = result.stdout[:len(result.stdout) - len(result.stdout) % frame_width]
+    get_instrumentation().count('decoded_samples', len(data) // SAMPLE_WIDTH)
+    return AudioSegment(data=data, sample_width=SAMPLE_WIDTH, frame_rate=frame_rate, channels=channels)
+
+
+def iter_pcm(video_path: str, frame_rate: int, channels: int, chunk_frames: int,
+             start_second: float | None = None, duration: float | None = None) -> Iterator[bytes]:
+    """
+    Decode a media file through a pipe, a fixed number of frames at a time,
+    so the decoded audio is never held in memory at once. Closing the
+    iterator early stops the decoder.
+
+    Args:
+        video_path (str): Path to the media file
+        frame_rate (int): Output sample rate, e.g. from output_format()
+        channels (int): Output channel count
+        chunk_frames (int): Frames per chunk; only the last chunk is shorter
+        start_second (float): Where to start decoding, None for the beginning
+        duration (float): How much to decode in seconds, None for the rest of the file
+
+    Yields:
+        bytes: Signed 16-bit little-endian PCM, whole frames only
+
+    Raises:
+        ValueError: If decoding fails
+    """
+    instrumentation = get_instrumentation()
+    frame_width = SAMPLE_WIDTH * channels
+    command = decode_command(video_path, frame_rate, channels, start_second, duration)
+    with tempfile.TemporaryFile() as stderr:
+        try:
+            decoder = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr)
+        except OSError as e:
+            raise ValueError(f"Failed to run ffmpeg: {str(e)}")
+
+        finished = False
+        try:
+            while True:
+                chunk = decoder.stdout.read(chunk_frames * frame_width)
+                # Drop a trailing partial frame if the decoder stopped mid-frame
+                chunk = chunk[:len(chunk) - len(chunk) % frame_width]
+                if not chunk:
+                    break
+                instrumentation.count('decoded_samples', len(chunk) // SAMPLE_WIDTH)
+                yield chunk
+            finished = True
+        finally:
+            decoder.stdout.close()
+            if not finished and decoder.poll() is None:
+                # The caller stopped reading early
+                decoder.kill()
+            returncode = decoder.wait()
+
+        if finished and returncode != 0:
+            stderr.seek(0)
+            message = stderr.read().decode(errors='replace').strip() or "ffmpeg failed"
+            raise ValueError(f"Failed to decode audio: {message}")
@@ -0,0 +1,169 @@
+import mmap
+import os
+import struct
+import subprocess
+import uuid
+from .instrumentation import get_instrumentation
+from .pcm_decoder import SAMPLE_WIDTH, decode_command, output_format
+from .shared_pcm import PCMView, segment_from_buffer
+
+
+class PCMSidecar:
+    """
+    Decoded audio of a media file stored next to it as raw PCM, so the file
+    is decoded once and later opens just map the samples into memory.
+
+    The sidecar is a fixed-size header followed by interleaved signed 16-bit
+    little endian samples. Opening it costs the same for any file length, and
+    slicing only reads the pages of the requested range.
+    """
+    SIDECAR_SUFFIX = '.pcm'
+    MAGIC = b'V2APCM'
+    # Bump when the file layout changes so stale sidecars are rebuilt
+    FORMAT_VERSION = 1
+    # The decoder's output, written to the file unchanged
+    SAMPLE_WIDTH = SAMPLE_WIDTH
+    # magic, version, sample width, frame rate, channels, source size, source mtime (ns)
+    HEADER = struct.Struct('<6sHHIHqq32x')
+
+    def __init__(self, sidecar_path: str, frame_rate: int, channels: int):
+        """
+        Map an existing sidecar file. Use for_file() or load() instead of
+        calling this directly.
+
+        Args:
+            sidecar_path (str): Path to the sidecar
+            frame_rate (int): Sample rate recorded in its header
+            channels (int): Channel count recorded in its header
+        """
+        self.path = sidecar_path
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.sample_width = self.SAMPLE_WIDTH
+
+        with open(sidecar_path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)[self.HEADER.size:]
+
+    @property
+    def duration(self) -> float:
+        """Length of the decoded audio in seconds."""
+        frames = len(self._view) // (self.sample_width * self.channels)
+        return frames / self.frame_rate
+
+    @classmethod
+    def for_file(cls, video_path: str) -> 'PCMSidecar':
+        """
+        Open the sidecar next to a media file, decoding the file into it
+        first if it is missing, from another format version or older than
+        the file.
+
+        Args:
+            video_path (str): Path to the media file
+
+        Returns:
+            PCMSidecar: The mapped sidecar
+
+        Raises:
+            ValueError: If the file cannot be decoded
+        """
+        sidecar_path = video_path + cls.SIDECAR_SUFFIX
+        try:
+            stat = os.stat(video_path)
+        except OSError as e:
+            raise ValueError(f"Failed to read media file: {str(e)}")
+
+        sidecar = cls.load(sidecar_path, stat.st_size, stat.st_mtime_ns)
+        if sidecar is None:
+            cls.build(video_path, sidecar_path, stat.st_size, stat.st_mtime_ns)
+            sidecar = cls.load(sidecar_path, stat.st_size, stat.st_mtime_ns)
+            if sidecar is None:
+                raise ValueError("Failed to decode audio: sidecar could not be read back")
+        return sidecar
+
+    @classmethod
+    def load(cls, sidecar_path: str, source_size: int, source_mtime_ns: int) -> 'PCMSidecar | None':
+        """
+        Map a sidecar written by build().
+
+        Returns:
+            PCMSidecar | None: The sidecar, or None if the file is missing,
+            from another format version, or was built from a different source file
+        """
+        try:
+            with open(sidecar_path, 'rb') as f:
+                header = f.read(cls.HEADER.size)
+            magic, version, sample_width, frame_rate, channels, size, mtime_ns = cls.HEADER.unpack(header)
+        except (OSError, struct.error):
+            return None
+        if (magic != cls.MAGIC or version != cls.FORMAT_VERSION or sample_width != cls.SAMPLE_WIDTH
+                or not frame_rate or not channels
+                or size != source_size or mtime_ns != source_mtime_ns):
+            return None
+
+        try:
+            return cls(sidecar_path, frame_rate, channels)
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def build(cls, video_path: str, sidecar_path: str, source_size: int, source_mtime_ns: int):
+        """
+        Decode a media file into a sidecar, streaming the samples from ffmpeg
+        straight to disk.
+
+        Raises:
+            ValueError: If the file cannot be decoded
+        """
+        frame_rate, channels = output_format(video_path)
+        command = decode_command(video_path, frame_rate, channels)
+
+        # Write to a temporary file first so readers never see a partial
+        # sidecar; unique per build, as threads may build the same sidecar
+        temp_path = f"{sidecar_path}.{uuid.uuid4().hex}.tmp"
+        instrumentation = get_instrumentation()
+        try:
+            with instrumentation.stage('decode_sidecar', path=video_path):
+                with open(temp_path, 'wb') as f:
+                    f.write(cls.HEADER.pack(cls.MAGIC, cls.FORMAT_VERSION, cls.SAMPLE_WIDTH,
+                                            frame_rate, channels, source_size, source_mtime_ns))
+                    f.flush()
+                    result = subprocess.run(command, stdout=f, stderr=subprocess.PIPE)
+                if result.returncode != 0:
+                    raise ValueError(result.stderr.decode(errors='replace').strip() or "ffmpeg failed")
+                os.replace(temp_path, sidecar_path)
+        except Exception as e:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise ValueError(f"Failed to decode audio: {str(e)}")
+
+        frames = (os.path.getsize(sidecar_path) - cls.HEADER.size) // (cls.SAMPLE_WIDTH * channels)
+        instrumentation.count('decoded_samples', frames * channels)
+
+    def segment(self, start_ms: int, end_ms: int) -> PCMView:
+        """
+        Get a range of the decoded audio without copying it.
+
+        Args:
+            start_ms (int): Start in milliseconds
+            end_ms (int): End in milliseconds
+
+        Returns:
+            PCMView: Audio whose data is a view into the mapped file
+
+        Raises:
+            ValueError: If the range ends past the end of the audio
+        """
+        return segment_from_buffer(self._view, start_ms, end_ms, self.sample_width,
+                                   self.frame_rate, self.channels)
+
+    def close(self):
+        """Unmap the file. Segments taken from it must not be used afterwards."""
+        self._view.release()
+        try:
+            self._map.close()
+        except BufferError:
+            # A segment is still alive; the mapping goes away with it
+            pass
@@ -0,0 +1,290 @@
+import os
+import threading
+import time
+from pydub import AudioSegment
+
+class PlaybackBackend:
+    """
+    Base class for preview playback.
+
+    play() returns immediately; audio is played in the background until it
+    ends or stop() is called.
+    """
+
+    def play(self, segment: AudioSegment, start: float = 0.0):
+        """
+        Start playing an audio segment, stopping any current playback.
+
+        Args:
+            segment (AudioSegment): Audio to play
+            start (float): Position in seconds to start from
+        """
+        raise NotImplementedError
+
+    def stop(self):
+        """Stop playback."""
+
+    def seek(self, seconds: float):
+        """Jump to a position in seconds within the current segment."""
+
+    def wait(self):
+        """Block until playback has finished."""
+
+    @property
+    def is_playing(self) -> bool:
+        return False
+
+    @property
+    def can_stop(self) -> bool:
+        """
+        Whether stop() and seek() work. Callers must wait() for playback of
+        a backend that cannot stop before starting another one.
+        """
+        return True
+
+
+class StreamingBackend(PlaybackBackend):
+    """
+    Streams PCM from the segment's memory to a sink in a background thread,
+    without copying or writing it to disk.
+
+    Subclasses implement _open_sink() and _write().
+    """
+    # Amount of audio written to the sink per step; bounds stop/seek latency
+    BLOCK_SECONDS = 0.05
+
+    def __init__(self):
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._segment = None
+        self._position = 0  # in bytes
+
+    def play(self, segment: AudioSegment, start: float = 0.0):
+        self.stop()
+        self._stop_event.clear()
+        self._segment = segment
+        self._frame_width = segment.frame_width
+        self._position = self._to_offset(start)
+        self._thread = threading.Thread(target=self._run, args=(segment,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def seek(self, seconds: float):
+        with self._lock:
+            # Nothing to seek in before the first play()
+            if self._segment is not None:
+                self._position = self._to_offset(seconds)
+
+    def wait(self):
+        if self._thread:
+            self._thread.join()
+
+    @property
+    def is_playing(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _to_offset(self, seconds: float) -> int:
+        """Convert seconds to a frame-aligned byte offset in the current segment."""
+        frames = max(0, int(seconds * self._segment.frame_rate))
+        return min(frames * self._frame_width, len(self._segment.raw_data))
+
+    def _run(self, segment: AudioSegment):
+        data = memoryview(segment.raw_data)
+        block_size = max(1, int(segment.frame_rate * self.BLOCK_SECONDS)) * segment.frame_width
+        sink = self._open_sink(segment.sample_width, segment.channels, segment.frame_rate)
+        try:
+            while not self._stop_event.is_set():
+                with self._lock:
+                    position = self._position
+                    if position >= len(data):
+                        break
+                    self._position = min(position + block_size, len(data))
+                self._write(sink, data[position:position + block_size])
+        finally:
+            self._close_sink(sink)
+
+    def _open_sink(self, sample_width: int, channels: int, frame_rate: int):
+        raise NotImplementedError
+
+    def _write(self, sink, block: memoryview):
+        raise NotImplementedError
+
+    def _close_sink(self, sink):
+        pass
+
+
+class PyAudioBackend(StreamingBackend):
+    """Streams previews to the sound card through PyAudio."""
+
+    def __init__(self):
+        super().__init__()
+        import pyaudio
+        self._pyaudio = pyaudio.PyAudio()
+
+    def _open_sink(self, sample_width: int, channels: int, frame_rate: int):
+        return self._pyaudio.open(
+            format=self._pyaudio.get_format_from_width(sample_width),
+            channels=channels,
+            rate=frame_rate,
+            output=True
+        )
+
+    def _write(self, sink, block: memoryview):
+        sink.write(block.tobytes())
+
+    def _close_sink(self, sink):
+        sink.stop_stream()
+        sink.close()
+
+
+class SimpleAudioBackend(PlaybackBackend):
+    """Plays previews with simpleaudio straight from the segment's buffer."""
+
+    def __init__(self):
+        import simpleaudio
+        self._simpleaudio = simpleaudio
+        self._play_object = None
+        self._segment = None
+        self._started_at = 0.0
+
+    def play(self, segment: AudioSegment, start: float = 0.0):
+        self.stop()
+        self._segment = segment
+        frames = max(0, int(start * segment.frame_rate))
+        offset = min(frames * segment.frame_width, len(segment.raw_data))
+        self._play_object = self._simpleaudio.play_buffer(
+            memoryview(segment.raw_data)[offset:],
+            num_channels=segment.channels,
+            bytes_per_sample=segment.sample_width,
+            sample_rate=segment.frame_rate
+        )
+
+    def stop(self):
+        if self._play_object:
+            self._play_object.stop()
+            self._play_object = None
+
+    def seek(self, seconds: float):
+        if self._segment is not None:
+            self.play(self._segment, seconds)
+
+    def wait(self):
+        if self._play_object:
+            self._play_object.wait_done()
+
+    @property
+    def is_playing(self) -> bool:
+        return self._play_object is not None and self._play_object.is_playing()
+
+
+class PlaysoundBackend(PlaybackBackend):
+    """
+    Fallback for systems without a streaming audio library: exports the
+    preview to a WAV file and plays it with playsound in a background thread.
+    Stopping and seeking are not supported, so a new preview waits for the
+    previous one to finish.
+    """
+
+    def __init__(self, temp_dir: str):
+        self.temp_dir = temp_dir
+        self._thread = None
+
+    def play(self, segment: AudioSegment, start: float = 0.0):
+        from playsound import playsound
+
+        # Ensure temp directory exists
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+        # Create a new preview file with timestamp
+        timestamp = int(time.time() * 1000)
+        preview_path = os.path.join(self.temp_dir, f'preview_{timestamp}.wav')
+
+        # playsound cannot be interrupted; never delete a file still playing
+        self.wait()
+
+        # Remove old preview files
+        self._cleanup_old_previews()
+
+        # Export and verify file was created
+        segment[int(start * 1000):].export(preview_path, format='wav')
+        if not os.path.exists(preview_path):
+            raise ValueError("Failed to create preview file")
+
+        self._thread = threading.Thread(target=playsound, args=(preview_path,), daemon=True)
+        self._thread.start()
+
+    def wait(self):
+        if self._thread:
+            self._thread.join()
+
+    @property
+    def is_playing(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def can_stop(self) -> bool:
+        return False
+
+    def _cleanup_old_previews(self):
+        """Clean up old preview files."""
+        try:
+            for file in os.listdir(self.temp_dir):
+                if file.startswith('preview_') and file.endswith('.wav'):
+                    file_path = os.path.join(self.temp_dir, file)
+                    try:
+                        os.remove(file_path)
+                    except:
+                        pass
+        except:
+            pass
+
+
+class NullBackend(PlaybackBackend):
+    """Discards previews, for headless use."""
+
+    def play(self, segment: AudioSegment, start: float = 0.0):
+        pass
+
+
+class RecordingBackend(StreamingBackend):
+    """Collects the streamed PCM in memory instead of playing it, for tests."""
+
+    def __init__(self):
+        super().__init__()
+        self.recorded = bytearray()
+        self.format = None
+
+    def _open_sink(self, sample_width: int, channels: int, frame_rate: int):
+        self.recorded = bytearray()
+        self.format = (sample_width, channels, frame_rate)
+        return self.recorded
+
+    def _write(self, sink, block: memoryview):
+        sink.extend(block)
+
+
+def default_backend(temp_dir: str) -> PlaybackBackend:
+    """
+    Pick the best playback backend available on this system.
+
+    Args:
+        temp_dir (str): Directory for preview files if only the file-based
+            fallback is available
+
+    Returns:
+        PlaybackBackend: PyAudio or simpleaudio streaming if installed
+        (pip install .[pyaudio] or .[simpleaudio]), otherwise the playsound
+        fallback, which cannot stop or seek
+    """
+    for backend_class in (PyAudioBackend, SimpleAudioBackend):
+        try:
+            return backend_class()
+        except Exception:
+            continue
+    return PlaysoundBackend(temp_dir)
@@ -0,0 +1,97 @@
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pydub.utils import mediainfo_json
+
+# Number of files whose probe results are kept in memory
+CACHE_SIZE = 256
+
+_cache: OrderedDict[tuple, 'MediaInfo'] = OrderedDict()
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class MediaInfo:
+    """Stream metadata of the first audio stream in a media file."""
+    duration_ms: int
+    codec: str | None = None
+    sample_rate: int | None = None
+    channels: int | None = None
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds."""
+        return self.duration_ms / 1000
+
+
+def probe_media(path: str) -> MediaInfo:
+    """
+    Read the duration and stream metadata of a media file with ffprobe,
+    without decoding any audio.
+
+    Results are cached per path, size and modification time, so probing the
+    same file again (e.g. for validation, then for saving) is free.
+
+    Args:
+        path (str): Path to the media file
+
+    Returns:
+        MediaInfo: Metadata of the first audio stream
+
+    Raises:
+        ValueError: If the file has no audio or cannot be probed
+    """
+    try:
+        stat = os.stat(path)
+        identity = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    except OSError:
+        # Let ffprobe report the error; nothing to cache
+        identity = None
+
+    if identity:
+        with _lock:
+            info = _cache.get(identity)
+            if info is not None:
+                _cache.move_to_end(identity)
+                return info
+
+    info = _read_media_info(path)
+    if identity:
+        with _lock:
+            _cache[identity] = info
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return info
+
+
+def clear_cache():
+    """Forget all cached probe results."""
+    with _lock:
+        _cache.clear()
+
+
+def _read_media_info(path: str) -> MediaInfo:
+    try:
+        info = mediainfo_json(path)
+    except Exception as e:
+        raise ValueError(f"Failed to probe media file: {str(e)}")
+
+    audio_streams = [s for s in info.get('streams', []) if s.get('codec_type') == 'audio']
+    if not audio_streams:
+        raise ValueError("No audio stream found")
+    stream = audio_streams[0]
+
+    # Containers such as WebM only record the duration in the format section
+    duration = stream.get('duration') or info.get('format', {}).get('duration')
+    try:
+        duration_ms = round(float(duration) * 1000)
+    except (TypeError, ValueError):
+        raise ValueError("Could not determine audio duration")
+
+    return MediaInfo(
+        duration_ms=duration_ms,
+        codec=stream.get('codec_name'),
+        sample_rate=int(stream['sample_rate']) if stream.get('sample_rate') else None,
+        channels=int(stream['channels']) if stream.get('channels') else None,
+    )
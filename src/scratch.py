@@ -0,0 +1,288 @@
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+
+class ScratchSpace:
+    DIR_PREFIX = 'job-'
+    # Written next to each job directory, so the directory only holds the job's files
+    OWNER_SUFFIX = '.owner'
+    # Directories whose owner cannot be checked (no owner file, another
+    # host, or no process check on this platform) are removed after this long
+    ORPHAN_MAX_AGE_SECONDS = 24 * 3600
+    # Other processes free space without telling us, so waits re-check this often
+    POLL_SECONDS = 0.5
+    DEFAULT_TIMEOUT_SECONDS = 600
+    ROOT_ENVIRONMENT_VARIABLE = 'VID2AUDIOCLIP_SCRATCH'
+
+    def __init__(self, root: str | None = None, quota_bytes: int | None = None, min_free_bytes: int = 0):
+        """
+        Initialize a root directory that jobs get private scratch directories
+        in, e.g. for downloads that are not cached and preview files.
+
+        Every job directory records the process that owns it, so processes
+        sharing the root never remove each other's files, and directories
+        left behind by crashed runs are found by sweep(). Writers call
+        reserve() before producing large files, which waits while the root
+        is over its quota or the disk is nearly full.
+
+        Args:
+            root (str): Directory holding the job directories, e.g. a tmpfs
+                such as /dev/shm. Defaults to $VID2AUDIOCLIP_SCRATCH, or
+                vid2audioclip in the system temporary directory
+            quota_bytes (int): Maximum total size of all files under root, None for no limit
+            min_free_bytes (int): Free disk space that reservations must leave
+        """
+        if root is None:
+            root = (os.environ.get(self.ROOT_ENVIRONMENT_VARIABLE)
+                    or os.path.join(tempfile.gettempdir(), 'vid2audioclip'))
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self.min_free_bytes = min_free_bytes
+        self._reserved = 0
+        self._condition = threading.Condition()
+        os.makedirs(self.root, exist_ok=True)
+
+    def job(self, name: str = 'job') -> 'ScratchDir':
+        """
+        Create a private directory for a job.
+
+        Args:
+            name (str): Short label included in the directory name
+
+        Returns:
+            ScratchDir: The directory, removed by its cleanup() or when it is garbage collected
+        """
+        path = os.path.join(self.root, f"{self.DIR_PREFIX}{name}-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        # The owner goes first, so sweep() never sees a directory without one
+        with open(path + self.OWNER_SUFFIX, 'w') as f:
+            json.dump({'pid': os.getpid(), 'host': socket.gethostname(), 'created': time.time()}, f)
+        os.makedirs(path)
+        return ScratchDir(self, path)
+
+    def usage(self) -> int:
+        """Total size in bytes of the files under the root, from all processes."""
+        total = 0
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                try:
+                    total += os.path.getsize(os.path.join(directory, name))
+                except OSError:
+                    # Removed while walking
+                    pass
+        return total
+
+    def reserve(self, nbytes: int, timeout: float | None = DEFAULT_TIMEOUT_SECONDS) -> 'Reservation':
+        """
+        Wait until nbytes more fit within the quota and the free disk space,
+        then hold them until the reservation is released.
+
+        Hold the reservation while writing the file; once it is written, its
+        size is counted by usage() and the reservation can be released. A
+        size of 0 just waits until the root is back under its quota.
+
+        Args:
+            nbytes (int): Expected size of the file about to be written
+            timeout (float): Longest wait in seconds, None to wait indefinitely
+
+        Returns:
+            Reservation: Context manager releasing the space on exit
+
+        Raises:
+            ValueError: If nbytes can never fit or the wait times out
+        """
+        if self.quota_bytes is not None and nbytes > self.quota_bytes:
+            raise ValueError(f"File of {nbytes} bytes exceeds the scratch space quota of {self.quota_bytes} bytes")
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while not self._fits(nbytes):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise ValueError("Timed out waiting for scratch space")
+                self._condition.wait(self.POLL_SECONDS if remaining is None else min(self.POLL_SECONDS, remaining))
+            self._reserved += nbytes
+        return Reservation(self, nbytes)
+
+    def sweep(self) -> int:
+        """
+        Remove job directories left behind by processes that no longer run,
+        e.g. after a crash. Call at startup.
+
+        Returns:
+            int: Number of directories removed
+        """
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return 0
+
+        removed = 0
+        for name in names:
+            if not name.startswith(self.DIR_PREFIX) or name.endswith(self.OWNER_SUFFIX):
+                continue
+            path = os.path.join(self.root, name)
+            if self._is_orphan(path):
+                _remove_job(path, self.OWNER_SUFFIX)
+                removed += 1
+        return removed
+
+    def _fits(self, nbytes: int) -> bool:
+        if self.quota_bytes is not None and self.usage() + self._reserved + nbytes > self.quota_bytes:
+            return False
+        if self.min_free_bytes:
+            try:
+                free = shutil.disk_usage(self.root).free
+            except OSError:
+                return True
+            if free - self._reserved - nbytes < self.min_free_bytes:
+                return False
+        return True
+
+    def _release(self, nbytes: int):
+        with self._condition:
+            self._reserved -= nbytes
+            self._condition.notify_all()
+
+    def _is_orphan(self, path: str) -> bool:
+        """Whether a job directory's owner has exited."""
+        try:
+            with open(path + self.OWNER_SUFFIX) as f:
+                owner = json.load(f)
+            alive = owner['host'] == socket.gethostname() and _process_alive(int(owner['pid']))
+        except (OSError, ValueError, KeyError, TypeError):
+            # Missing or damaged
+            alive = None
+        if alive is not None:
+            return not alive
+
+        try:
+            return time.time() - os.path.getmtime(path) > self.ORPHAN_MAX_AGE_SECONDS
+        except OSError:
+            return False
+
+
+class ScratchDir:
+    """A job's private directory in a ScratchSpace."""
+
+    def __init__(self, space: ScratchSpace, path: str):
+        self.space = space
+        self.path = path
+        # Also runs at interpreter exit, so only crashes leave the directory behind
+        self._finalizer = weakref.finalize(self, _remove_job, path, space.OWNER_SUFFIX)
+
+    def file(self, name: str) -> str:
+        """Path for a file in the directory."""
+        return os.path.join(self.path, name)
+
+    def reserve(self, nbytes: int, timeout: float | None = ScratchSpace.DEFAULT_TIMEOUT_SECONDS) -> 'Reservation':
+        """Reserve space for a file in the directory; see ScratchSpace.reserve()."""
+        return self.space.reserve(nbytes, timeout)
+
+    def cleanup(self):
+        """Remove the directory and all its contents."""
+        self._finalizer()
+
+    def __enter__(self) -> 'ScratchDir':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cleanup()
+
+
+class Reservation:
+    """Space held in a ScratchSpace until release() is called."""
+
+    def __init__(self, space: ScratchSpace, nbytes: int):
+        self.space = space
+        self.nbytes = nbytes
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.space._release(self.nbytes)
+
+    def __enter__(self) -> 'Reservation':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def _remove_job(path: str, owner_suffix: str):
+    """Remove a job directory, then its owner file."""
+    shutil.rmtree(path, ignore_errors=True)
+    try:
+        os.remove(path + owner_suffix)
+    except OSError:
+        pass
+
+
+def _process_alive(pid: int) -> bool | None:
+    """
+    Whether a process on this host is running.
+
+    Returns:
+        bool | None: None where this cannot be checked cheaply
+    """
+    if pid == os.getpid():
+        return True
+    if os.name == 'nt':
+        # os.kill would terminate the process instead of probing it
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running, as another user
+        return True
+    except OSError:
+        return None
+    return True
+
+
+_scratch_space: ScratchSpace | None = None
+_scratch_lock = threading.Lock()
+
+def get_scratch_space() -> ScratchSpace:
+    """Return the scratch space used by the pipeline, creating the default one on first use."""
+    global _scratch_space
+    with _scratch_lock:
+        if _scratch_space is None:
+            _scratch_space = ScratchSpace()
+        return _scratch_space
+
+def set_scratch_space(scratch_space: ScratchSpace | None):
+    """
+    Set the scratch space used by the pipeline.
+
+    Args:
+        scratch_space (ScratchSpace): New scratch space, or None for the default
+    """
+    global _scratch_space
+    with _scratch_lock:
+        _scratch_space = scratch_space
+
+def start_scratch_space(root: str | None = None, quota_bytes: int | None = None) -> ScratchSpace:
+    """
+    Set up the scratch space at program startup: remove what crashed runs
+    left behind and make it the one used by the pipeline.
+
+    Args:
+        root (str): Directory holding the job directories, None for the default
+        quota_bytes (int): Maximum total size of all files under root, None for no limit
+
+    Returns:
+        ScratchSpace: The new scratch space
+    """
+    scratch_space = ScratchSpace(root, quota_bytes=quota_bytes)
+    scratch_space.sweep()
+    set_scratch_space(scratch_space)
+    return scratch_space
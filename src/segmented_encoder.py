@@ -0,0 +1,224 @@
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING
+from .encoding_profiles import EncodingProfile
+from .instrumentation import get_instrumentation
+from .shared_pcm import PCMHandle, SharedPCM
+
+if TYPE_CHECKING:
+    from pydub import AudioSegment
+
+# Layer III bitrates in kbps by header index, for MPEG-1 and for MPEG-2/2.5
+_MPEG1_BITRATES = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+_MPEG2_BITRATES = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+# MPEG version bits -> (sample rates by header index, samples per frame, bitrates)
+_MPEG_VERSIONS = {
+    3: ((44100, 48000, 32000), 1152, _MPEG1_BITRATES),
+    2: ((22050, 24000, 16000), 576, _MPEG2_BITRATES),
+    0: ((11025, 12000, 8000), 576, _MPEG2_BITRATES),
+}
+
+
+def mp3_samples_per_frame(frame_rate: int) -> int | None:
+    """
+    Get the number of samples per channel in an MP3 frame at a sample rate.
+
+    Returns:
+        int | None: 1152 or 576, or None if MP3 cannot store that sample rate
+    """
+    for rates, samples, _ in _MPEG_VERSIONS.values():
+        if frame_rate in rates:
+            return samples
+    return None
+
+
+def split_mp3_frames(data: bytes) -> list[memoryview]:
+    """
+    Split a raw Layer III stream, without ID3 tags, into its frames.
+
+    Args:
+        data (bytes): The stream
+
+    Returns:
+        list[memoryview]: One view per frame, header included
+
+    Raises:
+        ValueError: If the data is not a sequence of whole MP3 frames
+    """
+    view = memoryview(data)
+    frames = []
+    position = 0
+    while position < len(data):
+        if position + 4 > len(data):
+            raise ValueError("Truncated MP3 frame header")
+        flags, rate_flags = data[position + 1], data[position + 2]
+        if data[position] != 0xFF or flags & 0xE0 != 0xE0:
+            raise ValueError(f"Lost MP3 frame sync at byte {position}")
+
+        version = (flags >> 3) & 3
+        layer = (flags >> 1) & 3
+        bitrate_index = rate_flags >> 4
+        rate_index = (rate_flags >> 2) & 3
+        padding = (rate_flags >> 1) & 1
+        # Layer III is coded as 1; free format (bitrate index 0) has no fixed length
+        if version not in _MPEG_VERSIONS or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+            raise ValueError(f"Unsupported MP3 frame at byte {position}")
+
+        rates, samples, bitrates = _MPEG_VERSIONS[version]
+        length = samples // 8 * bitrates[bitrate_index] * 1000 // rates[rate_index] + padding
+        if position + length > len(data):
+            raise ValueError("Truncated MP3 frame")
+        frames.append(view[position:position + length])
+        position += length
+    return frames
+
+
+def _encode_mp3_chunk(handle: PCMHandle, first: int, last: int, skip: int, keep: int | None,
+                      options: list[str], converter: str) -> bytes:
+    """
+    Encode frames [first, last) of shared PCM and return the MP3 frames from
+    skip on (keep of them, or all if keep is None). Runs inside a worker process.
+    """
+    pcm_format = SegmentedEncoder.PCM_FORMATS[handle.sample_width]
+    command = [
+        converter, '-v', 'error',
+        '-f', pcm_format, '-ar', str(handle.frame_rate), '-ac', str(handle.channels),
+        '-i', '-',
+        *options,
+        # Without the bit reservoir every frame holds all of its own data,
+        # so frames from different encoders can follow each other
+        '-acodec', 'libmp3lame', '-reservoir', '0',
+        '-write_xing', '0', '-id3v2_version', '0',
+        '-f', 'mp3', '-'
+    ]
+
+    shared = SharedPCM.attach(handle)
+    error = None
+    encoded = b''
+    try:
+        data = shared.frames(first, last)
+        result = subprocess.run(command, input=data, capture_output=True)
+        if result.returncode != 0:
+            error = result.stderr.decode(errors='replace').strip() or "ffmpeg failed"
+        else:
+            frames = split_mp3_frames(result.stdout)
+            end = len(frames) if keep is None else skip + keep
+            if end > len(frames):
+                error = f"Encoder returned {len(frames)} frames, expected at least {end}"
+            else:
+                encoded = b''.join(frames[skip:end])
+    except Exception as e:
+        # Only the message, so no view into the shared block outlives close()
+        error = str(e)
+    finally:
+        data = None
+        shared.close()
+    if error:
+        raise ValueError(error)
+    return encoded
+
+
+class SegmentedEncoder:
+    """
+    Encodes long MP3 clips in several processes at once.
+
+    The clip is split into chunks on MP3 frame boundaries. Each chunk is
+    encoded with a few frames of the audio before it (and after it) so the
+    encoder is in the same state as it would be mid-stream, and only the
+    frames covering the chunk itself are kept. Frames start at the same
+    sample positions as in a single encode of the whole clip, and with the
+    bit reservoir off they do not borrow space from each other, so joining
+    the kept frames gives one continuous stream without gaps or clicks.
+
+    The joined stream has no Xing/LAME header, so players do not trim the
+    encoder delay (about 25 ms of silence at the start). Other formats, VBR
+    MP3 and clips shorter than two chunks are left to a single encoder:
+    see supports().
+    """
+    FORMATS = {'mp3'}
+    # Chunks are never shorter than this, so the pre-roll stays a small overhead
+    MIN_CHUNK_SECONDS = 30.0
+    # Frames of context encoded (and dropped) before and after each chunk
+    PREROLL_FRAMES = 8
+    TAIL_FRAMES = 4
+    # Sample width -> ffmpeg raw PCM format
+    PCM_FORMATS = {2: 's16le', 4: 's32le'}
+
+    def __init__(self, max_workers: int | None = None, executor_class=ProcessPoolExecutor):
+        """
+        Args:
+            max_workers (int): Number of encoder processes, defaults to the CPU count
+            executor_class: Executor used for encoding, ProcessPoolExecutor by default
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor_class = executor_class
+
+    def supports(self, segment: 'AudioSegment', file_format: str, profile: EncodingProfile) -> bool:
+        """
+        Whether encode() can handle a clip, or it should go to a single encoder.
+
+        Args:
+            segment (AudioSegment): The clip, after profile.prepare()
+            file_format (str): Output format
+            profile (EncodingProfile): Encoding profile of the clip
+        """
+        return (file_format in self.FORMATS
+                and self._chunk_count(segment) > 1
+                and segment.sample_width in self.PCM_FORMATS
+                and mp3_samples_per_frame(segment.frame_rate) is not None
+                and profile.codecs.get(file_format, 'libmp3lame') == 'libmp3lame'
+                # VBR streams need the Xing header for seeking and duration
+                and file_format not in profile.qualities)
+
+    def encode(self, segment: 'AudioSegment', output_path: str, options: list[str] | None = None):
+        """
+        Encode a clip to an MP3 file in parallel chunks.
+
+        Args:
+            segment (AudioSegment): The clip, after profile.prepare(); check supports() first
+            output_path (str): Path of the MP3 file
+            options (list[str]): Extra ffmpeg output options, e.g. from the profile
+
+        Raises:
+            ValueError: If a chunk fails to encode
+        """
+        from pydub import AudioSegment
+
+        samples_per_frame = mp3_samples_per_frame(segment.frame_rate)
+        total = int(segment.frame_count())
+        chunk_count = self._chunk_count(segment)
+        mp3_frames = -(-total // samples_per_frame)
+        chunk = -(-mp3_frames // chunk_count) * samples_per_frame
+
+        shared = SharedPCM.from_segment(segment)
+        try:
+            with self.executor_class(max_workers=min(self.max_workers, chunk_count)) as executor:
+                futures = []
+                for start in range(0, total, chunk):
+                    end = start + chunk
+                    preroll = min(start, self.PREROLL_FRAMES * samples_per_frame)
+                    is_last = end >= total
+                    futures.append(executor.submit(
+                        _encode_mp3_chunk,
+                        shared.handle,
+                        start - preroll,
+                        total if is_last else end + self.TAIL_FRAMES * samples_per_frame,
+                        preroll // samples_per_frame,
+                        # The last chunk keeps the encoder's final flushed frames
+                        None if is_last else chunk // samples_per_frame,
+                        list(options or []),
+                        AudioSegment.converter
+                    ))
+                parts = [future.result() for future in futures]
+        finally:
+            shared.close()
+            shared.unlink()
+
+        with open(output_path, 'wb') as f:
+            for part in parts:
+                f.write(part)
+        get_instrumentation().count('encoded_chunks', len(parts))
+
+    def _chunk_count(self, segment: 'AudioSegment') -> int:
+        return max(1, min(self.max_workers, int(segment.duration_seconds // self.MIN_CHUNK_SECONDS)))
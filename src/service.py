@@ -0,0 +1,473 @@
+import asyncio
+import hashlib
+import http
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+from .youtube_downloader import YoutubeDownloader
+from .clip_cache import ClipCache
+from .file_saver import FileSaver
+from .encoding_profiles import get_profile
+from .instrumentation import PrometheusTextSink, get_instrumentation
+from .multi_clip import ClipRequest, ClipResult, clip_filename, collect_results, submit_clips
+from .utils.time_converter import TimeConverter
+
+
+@dataclass
+class ServiceJob:
+    """A clip job submitted to the service."""
+    id: str
+    key: str
+    url: str
+    ranges: list[dict]
+    gain: float
+    file_format: str
+    profile: str = 'default'
+    status: str = 'queued'  # queued, running, done, failed or cancelled
+    created: float = field(default_factory=time.time)
+    started: float | None = None
+    finished: float | None = None
+    results: list[ClipResult] = field(default_factory=list)
+    error: str | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'status': self.status,
+            'url': self.url,
+            'format': self.file_format,
+            'profile': self.profile,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'error': self.error,
+            'clips': [
+                {
+                    'index': index,
+                    'start': result.request.start,
+                    'end': result.request.end,
+                    'success': result.success,
+                    'seconds': result.seconds,
+                    'error': result.error,
+                    'download': f"/jobs/{self.id}/clips/{index}" if result.success else None,
+                }
+                for index, result in enumerate(self.results)
+            ],
+        }
+
+
+def parse_job(payload: dict) -> tuple[str, list[dict], float, str, str]:
+    """
+    Validate a job submission.
+
+    A job looks like {"url": ..., "ranges": [{"start": "1:30", "end": "2:00",
+    "title": "...", "gain": -3}, ...], "gain": 0, "format": "mp3",
+    "profile": "default"}; "title", both "gain"s, "format" and "profile"
+    are optional.
+
+    Returns:
+        tuple[str, list[dict], float, str, str]: URL, normalised ranges, gain,
+        format and encoding profile name
+
+    Raises:
+        ValueError: If the job is malformed
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Job must be a JSON object")
+    url = payload.get('url')
+    if not isinstance(url, str) or not url.strip():
+        raise ValueError("Job needs a \"url\"")
+
+    file_format = str(payload.get('format', 'mp3')).lower()
+    if file_format not in FileSaver.SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported format. Supported formats: {', '.join(sorted(FileSaver.SUPPORTED_FORMATS))}")
+
+    profile = get_profile(payload.get('profile')).name
+
+    ranges = payload.get('ranges')
+    if not isinstance(ranges, list) or not ranges:
+        raise ValueError("Job needs a non-empty \"ranges\" list")
+
+    try:
+        gain = float(payload.get('gain') or 0)
+        normalised = []
+        for clip in ranges:
+            start = TimeConverter.time_to_seconds(str(clip['start']))
+            end = TimeConverter.time_to_seconds(str(clip['end']))
+            if start >= end:
+                raise ValueError(f"Range {clip['start']}-{clip['end']} ends before it starts")
+            normalised.append({
+                'start': start,
+                'end': end,
+                'title': str(clip.get('title') or ''),
+                'gain': float(clip.get('gain') or 0),
+            })
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"Invalid range: {str(e)}")
+    return url.strip(), normalised, gain, file_format, profile
+
+
+class ClipService:
+    """
+    Local HTTP/JSON service that runs clip jobs on a bounded worker pool.
+
+    Endpoints:
+        POST   /jobs                    Submit a job, returns its id
+        GET    /jobs/<id>               Job status and per-clip results
+        GET    /jobs/<id>/clips/<n>     Download an extracted clip
+        DELETE /jobs/<id>               Cancel a queued job
+        GET    /metrics                 Queue and stage metrics (Prometheus text)
+        GET    /health                  Liveness check
+
+    A job identical to one still queued or running is not run again; the
+    submission returns the existing job instead.
+    """
+    MAX_BODY_BYTES = 1024 * 1024
+    # Finished jobs kept for status queries
+    MAX_FINISHED_JOBS = 1000
+    CHUNK_SIZE = 256 * 1024
+
+    def __init__(self, downloader: YoutubeDownloader | None = None, output_dir: str = 'service_output',
+                 workers: int = 2, encoder_workers: int | None = None, max_queue: int = 100,
+                 executor_class=ProcessPoolExecutor, clip_cache: ClipCache | None = None,
+                 profile: str | None = None):
+        """
+        Args:
+            downloader (YoutubeDownloader): Downloader to fetch sources with, ideally with a cache
+            output_dir (str): Directory the clips are written to, one subdirectory per job
+            workers (int): Number of jobs processed at the same time
+            encoder_workers (int): Number of encoder processes shared by all jobs, defaults to the CPU count
+            max_queue (int): Jobs that may wait before submissions are refused
+            executor_class: Executor used for encoding, ProcessPoolExecutor by default
+            clip_cache (ClipCache): Cache serving clips that were extracted before, even by finished jobs
+            profile (str): Encoding profile for jobs that do not name one
+        """
+        self.downloader = downloader or YoutubeDownloader()
+        self.output_dir = output_dir
+        self.workers = workers
+        self.encoder_workers = encoder_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.executor_class = executor_class
+        self.clip_cache = clip_cache
+        self.profile = get_profile(profile).name
+
+        self.jobs: dict[str, ServiceJob] = {}
+        self.in_flight: dict[str, ServiceJob] = {}
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self._queue = None
+        self._executor = None
+        self._worker_tasks = []
+        self._server = None
+        # Downloads in progress by video ID, shared by the jobs that need them
+        self._downloads: dict[str, Future] = {}
+        # Running jobs by video ID; uncached sources are removed when the last one ends
+        self._source_users: dict[str, int] = {}
+        self._downloads_lock = threading.Lock()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8765):
+        """
+        Start the workers and listen for requests.
+
+        Returns:
+            The asyncio server; server.sockets[0].getsockname() gives the bound address
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._queue = asyncio.Queue(self.max_queue)
+        self._executor = self.executor_class(max_workers=self.encoder_workers)
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    async def serve_forever(self, host: str = '127.0.0.1', port: int = 8765):
+        server = await self.start(host, port)
+        address = server.sockets[0].getsockname()
+        print(f"Serving on http://{address[0]}:{address[1]}")
+        try:
+            await server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        """Stop accepting requests and shut the workers down."""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        if self._executor:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        self.downloader.cleanup()
+
+    def submit(self, payload: dict) -> tuple[ServiceJob, bool]:
+        """
+        Queue a job unless an identical one is already queued or running.
+
+        Returns:
+            tuple[ServiceJob, bool]: The job, and whether it was newly created
+
+        Raises:
+            ValueError: If the job is malformed
+            asyncio.QueueFull: If too many jobs are waiting
+        """
+        if isinstance(payload, dict) and not payload.get('profile'):
+            payload = {**payload, 'profile': self.profile}
+        url, ranges, gain, file_format, profile = parse_job(payload)
+        video_id = (YoutubeDownloader._extract_video_id(url)
+                    if self.downloader._is_valid_youtube_url(url) else None)
+        key = hashlib.sha256(json.dumps(
+            [video_id or url, ranges, gain, file_format, profile], sort_keys=True
+        ).encode()).hexdigest()
+
+        existing = self.in_flight.get(key)
+        if existing is not None:
+            self.deduplicated += 1
+            return existing, False
+
+        job = ServiceJob(uuid.uuid4().hex[:12], key, url, ranges, gain, file_format, profile)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise
+        self.jobs[job.id] = job
+        self.in_flight[key] = job
+        self.submitted += 1
+        self._forget_old_jobs()
+        return job, True
+
+    def cancel(self, job: ServiceJob) -> bool:
+        """Cancel a queued job. Running jobs cannot be cancelled."""
+        if job.status != 'queued':
+            return False
+        job.status = 'cancelled'
+        job.finished = time.time()
+        self.in_flight.pop(job.key, None)
+        return True
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status == 'cancelled':
+                    continue
+                job.status = 'running'
+                job.started = time.time()
+                try:
+                    job.results = await asyncio.to_thread(self._run_job, job)
+                    job.status = 'done' if all(result.success for result in job.results) else 'failed'
+                except Exception as e:
+                    job.status = 'failed'
+                    job.error = str(e)
+                job.finished = time.time()
+                self.in_flight.pop(job.key, None)
+            finally:
+                self._queue.task_done()
+
+    def _run_job(self, job: ServiceJob) -> list[ClipResult]:
+        """Download the source and extract the job's clips. Runs in a worker thread."""
+        with get_instrumentation().stage('service_job', job=job.id), self._source(job.url) as video_path:
+            job_dir = os.path.join(self.output_dir, job.id)
+            os.makedirs(job_dir, exist_ok=True)
+
+            requests = [
+                ClipRequest(
+                    url=job.url,
+                    start=str(clip['start']),
+                    end=str(clip['end']),
+                    output_path=os.path.join(job_dir, clip_filename(number, clip['title'], job.file_format)),
+                    gain=job.gain + clip['gain'],
+                    line=number
+                )
+                for number, clip in enumerate(job.ranges, start=1)
+            ]
+            results: dict[int, ClipResult] = {}
+
+            def record(index: int, result: ClipResult):
+                results[index] = result
+
+            pending = submit_clips(video_path, list(enumerate(requests)), self._executor, record,
+                                   clip_cache=self.clip_cache, profile=job.profile)
+            collect_results(pending, requests, record)
+            return [results[index] for index in range(len(requests))]
+
+    @contextmanager
+    def _source(self, url: str):
+        """
+        Download a job's source for the duration of the block. A source that
+        did not go to the download cache is removed once no running job uses
+        it, so it neither piles up in the scratch directory nor holds up
+        later downloads waiting for scratch quota.
+        """
+        key = YoutubeDownloader._extract_video_id(url) or url
+        with self._downloads_lock:
+            self._source_users[key] = self._source_users.get(key, 0) + 1
+        video_path = None
+        try:
+            video_path = self._download(url)
+            yield video_path
+        finally:
+            # Under the lock, so a job starting now cannot be handed the file being removed
+            with self._downloads_lock:
+                self._source_users[key] -= 1
+                if not self._source_users[key]:
+                    del self._source_users[key]
+                    if video_path:
+                        self.downloader.discard(video_path)
+
+    def _download(self, url: str) -> str:
+        """
+        Download a job's source. Workers share one downloader, so jobs for a
+        video that is already being downloaded (under any URL form) wait for
+        that download and use its file instead of starting another one.
+        """
+        key = YoutubeDownloader._extract_video_id(url) or url
+        with self._downloads_lock:
+            future = self._downloads.get(key)
+            owner = future is None
+            if owner:
+                future = self._downloads[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            future.set_result(self.downloader.download_video(url))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            # Later jobs go through the downloader again, e.g. its cache
+            with self._downloads_lock:
+                del self._downloads[key]
+        return future.result()
+
+    def _forget_old_jobs(self):
+        finished = [job for job in self.jobs.values() if job.finished is not None]
+        for job in sorted(finished, key=lambda job: job.finished)[:max(0, len(finished) - self.MAX_FINISHED_JOBS)]:
+            del self.jobs[job.id]
+
+    def metrics(self) -> str:
+        """Service gauges and counters plus the stage metrics, in Prometheus text format."""
+        prefix = PrometheusTextSink.PREFIX
+        statuses = {'queued': 0, 'running': 0, 'done': 0, 'failed': 0, 'cancelled': 0}
+        for job in self.jobs.values():
+            statuses[job.status] += 1
+        lines = [
+            f"# TYPE {prefix}_service_queue_depth gauge",
+            f"{prefix}_service_queue_depth {statuses['queued']}",
+            f"# TYPE {prefix}_service_workers gauge",
+            f"{prefix}_service_workers {self.workers}",
+            f"# TYPE {prefix}_service_jobs gauge",
+            *(f'{prefix}_service_jobs{{status="{status}"}} {count}' for status, count in statuses.items()),
+            f"# TYPE {prefix}_service_jobs_submitted_total counter",
+            f"{prefix}_service_jobs_submitted_total {self.submitted}",
+            f"# TYPE {prefix}_service_jobs_deduplicated_total counter",
+            f"{prefix}_service_jobs_deduplicated_total {self.deduplicated}",
+            f"# TYPE {prefix}_service_jobs_rejected_total counter",
+            f"{prefix}_service_jobs_rejected_total {self.rejected}",
+        ]
+        if self.clip_cache:
+            lines += [f"# TYPE {prefix}_clip_cache_hit_ratio gauge",
+                      f"{prefix}_clip_cache_hit_ratio {self.clip_cache.hit_rate}"]
+        return '\n'.join(lines) + '\n' + PrometheusTextSink.render(get_instrumentation().snapshot())
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                request_line = await reader.readline()
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+            except ValueError:
+                await self._send_json(writer, 400, {'error': "Malformed request"})
+                return
+            if length > self.MAX_BODY_BYTES:
+                await self._send_json(writer, 413, {'error': "Request body too large"})
+                return
+            body = await reader.readexactly(length) if length else b''
+            await self._route(writer, method.upper(), urlparse(target).path.rstrip('/'), body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, writer: asyncio.StreamWriter, method: str, path: str, body: bytes):
+        parts = path.strip('/').split('/')
+        if method == 'GET' and path == '/health':
+            await self._send_json(writer, 200, {'status': 'ok'})
+        elif method == 'GET' and path == '/metrics':
+            await self._send(writer, 200, self.metrics().encode(), 'text/plain; version=0.0.4')
+        elif method == 'POST' and path == '/jobs':
+            try:
+                job, created = self.submit(json.loads(body or b'null'))
+            except (ValueError, json.JSONDecodeError) as e:
+                await self._send_json(writer, 400, {'error': str(e)})
+                return
+            except asyncio.QueueFull:
+                await self._send_json(writer, 503, {'error': "Job queue is full"})
+                return
+            await self._send_json(writer, 202 if created else 200, {**job.to_dict(), 'deduplicated': not created})
+        elif parts[0] == 'jobs' and len(parts) >= 2 and parts[1] in self.jobs:
+            job = self.jobs[parts[1]]
+            if method == 'GET' and len(parts) == 2:
+                await self._send_json(writer, 200, job.to_dict())
+            elif method == 'DELETE' and len(parts) == 2:
+                if self.cancel(job):
+                    await self._send_json(writer, 200, job.to_dict())
+                else:
+                    await self._send_json(writer, 409, {'error': f"Job is {job.status}"})
+            elif method == 'GET' and len(parts) == 4 and parts[2] == 'clips' and parts[3].isdigit():
+                index = int(parts[3])
+                if index >= len(job.results) or not job.results[index].success:
+                    await self._send_json(writer, 404, {'error': "No such clip"})
+                    return
+                await self._send_file(writer, job.results[index].request.output_path)
+            else:
+                await self._send_json(writer, 405, {'error': "Method not allowed"})
+        else:
+            await self._send_json(writer, 404, {'error': "Not found"})
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: dict):
+        await self._send(writer, status, json.dumps(payload).encode(), 'application/json')
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, body: bytes, content_type: str):
+        writer.write(self._headers(status, len(body), content_type) + body)
+        await writer.drain()
+
+    async def _send_file(self, writer: asyncio.StreamWriter, path: str):
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            await self._send_json(writer, 404, {'error': "Clip file is gone"})
+            return
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            writer.write(self._headers(200, size, 'application/octet-stream',
+                                       {'Content-Disposition': f'attachment; filename="{os.path.basename(path)}"'}))
+            while chunk := await asyncio.to_thread(f.read, self.CHUNK_SIZE):
+                writer.write(chunk)
+                await writer.drain()
+
+    @staticmethod
+    def _headers(status: int, length: int, content_type: str, extra: dict | None = None) -> bytes:
+        lines = [
+            f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {length}",
+            "Connection: close",
+            *(f"{name}: {value}" for name, value in (extra or {}).items()),
+        ]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1', errors='replace')
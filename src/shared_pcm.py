@@ -0,0 +1,224 @@
+import array
+import threading
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from pydub import AudioSegment
+
+
+class PCMView(AudioSegment):
+    """
+    AudioSegment whose raw data is a view into a buffer, such as shared memory
+    or a mapped PCM sidecar, instead of bytes.
+
+    AudioSegment assumes bytes in a few places; those methods are overridden
+    here to give the same results as on a copy. Everything else already works
+    on any buffer, and effects return segments holding bytes. A view is only
+    valid until its buffer is closed: call detach() to keep the audio longer.
+    """
+
+    def detach(self) -> AudioSegment:
+        """
+        Copy the audio into an ordinary AudioSegment holding bytes.
+
+        Returns:
+            AudioSegment: The copy, independent of the buffer
+        """
+        return AudioSegment(data=bytes(self._data), sample_width=self.sample_width,
+                            frame_rate=self.frame_rate, channels=self.channels)
+
+    def get_array_of_samples(self, array_type_override=None) -> array.array:
+        # array.array(typecode, view) would take each byte as a sample
+        samples = array.array(array_type_override or self.array_type)
+        samples.frombytes(self._data)
+        return samples
+
+    def append(self, seg: AudioSegment, crossfade: int = 100) -> AudioSegment:
+        # Views cannot be concatenated with +
+        return self.detach().append(seg, crossfade)
+
+    def __mul__(self, arg) -> AudioSegment:
+        return self.detach() * arg
+
+    def __getitem__(self, millisecond):
+        try:
+            return super().__getitem__(millisecond)
+        except TypeError:
+            # Padding a slice that ends in a partial frame with silence needs bytes
+            return self.detach()[millisecond]
+
+    def __hash__(self):
+        # Writable views, e.g. into shared memory, cannot be hashed
+        return hash(AudioSegment) ^ hash((self.channels, self.frame_rate, self.sample_width, bytes(self._data)))
+
+
+def segment_from_buffer(buffer: memoryview, start_ms: int, end_ms: int, sample_width: int,
+                        frame_rate: int, channels: int, base_ms: int = 0) -> AudioSegment:
+    """
+    Wrap a range of raw interleaved PCM in an AudioSegment without copying it.
+
+    Frames are picked like AudioSegment slicing does, so the result matches
+    slicing a segment holding the same audio. As there, at most 2 ms missing
+    at the end of the buffer are filled with silence.
+
+    Args:
+        buffer (memoryview): The PCM data
+        start_ms (int): Start in milliseconds, as a position in the source
+        end_ms (int): End in milliseconds, as a position in the source
+        sample_width (int): Bytes per sample
+        frame_rate (int): Sample rate
+        channels (int): Channel count
+        base_ms (int): Position of the first frame of buffer in the source
+
+    Returns:
+        PCMView: Audio whose data is a view into buffer
+
+    Raises:
+        ValueError: If the range ends more than 2 ms past the end of buffer
+    """
+    frame_width = sample_width * channels
+    frames_per_ms = frame_rate / 1000.0
+    first = int(max(0, start_ms - base_ms) * frames_per_ms)
+    last = int(max(0, end_ms - base_ms) * frames_per_ms)
+
+    data = buffer[first * frame_width:last * frame_width]
+    missing_frames = (last - first) - len(data) // frame_width
+    if missing_frames > 0:
+        if missing_frames > int(2 * frames_per_ms):
+            raise ValueError(f"Range {start_ms}-{end_ms} ms ends {missing_frames} frames past the end of the audio")
+        # Rounding at the very end of the buffer; pad with silence
+        data = bytes(data) + bytes(missing_frames * frame_width)
+    return PCMView(data=data, sample_width=sample_width, frame_rate=frame_rate, channels=channels)
+
+
+@dataclass(frozen=True)
+class PCMHandle:
+    """Picklable reference to decoded audio in shared memory."""
+    name: str
+    size: int
+    sample_width: int
+    frame_rate: int
+    channels: int
+    # Position of the first frame in the source, in milliseconds
+    start_ms: int = 0
+
+
+class SharedPCM:
+    """
+    Decoded PCM placed in shared memory once, so encoder processes can cut
+    clips out of it without receiving their own copy.
+
+    The process that decodes calls from_segment() and hands handle to the
+    workers, which attach() to it and take segment()s that are views into
+    the shared buffer rather than copies.
+    """
+
+    def __init__(self, memory: shared_memory.SharedMemory, handle: PCMHandle):
+        self._memory = memory
+        self.handle = handle
+        self._view = memory.buf[:handle.size]
+
+    @classmethod
+    def from_segment(cls, segment: AudioSegment, start_ms: int = 0) -> 'SharedPCM':
+        """
+        Copy decoded audio into a new shared memory block.
+
+        Args:
+            segment (AudioSegment): The decoded audio
+            start_ms (int): Position of the segment in the source in milliseconds
+
+        Returns:
+            SharedPCM: The owner of the block; call unlink() when all users are done
+        """
+        data = segment.raw_data
+        # Zero-sized blocks are not allowed
+        memory = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+        memory.buf[:len(data)] = data
+        handle = PCMHandle(memory.name, len(data), segment.sample_width, segment.frame_rate,
+                           segment.channels, start_ms)
+        return cls(memory, handle)
+
+    @classmethod
+    def attach(cls, handle: PCMHandle) -> 'SharedPCM':
+        """
+        Open a block created by from_segment(), e.g. in a worker process.
+
+        Raises:
+            ValueError: If the block no longer exists
+        """
+        try:
+            memory = shared_memory.SharedMemory(name=handle.name)
+        except OSError as e:
+            raise ValueError(f"Failed to attach shared audio: {str(e)}")
+        return cls(memory, handle)
+
+    def segment(self, start_ms: int, end_ms: int) -> PCMView:
+        """
+        Get a range of the shared audio without copying it.
+
+        Args:
+            start_ms (int): Start in milliseconds, as a position in the source
+            end_ms (int): End in milliseconds, as a position in the source
+
+        Returns:
+            PCMView: Audio whose data is a view into the shared block
+        """
+        handle = self.handle
+        return segment_from_buffer(self._view, start_ms, end_ms, handle.sample_width,
+                                   handle.frame_rate, handle.channels, handle.start_ms)
+
+    def frames(self, first: int, last: int) -> memoryview:
+        """
+        Get raw interleaved PCM by frame index, without copying it.
+
+        Args:
+            first (int): First frame, counted from the start of the block
+            last (int): Frame after the last one; clamped to the end of the block
+
+        Returns:
+            memoryview: View into the shared block
+        """
+        frame_width = self.handle.sample_width * self.handle.channels
+        return self._view[first * frame_width:last * frame_width]
+
+    def close(self):
+        """
+        Detach from the block. Segments taken from it must not be used afterwards.
+        """
+        self._view.release()
+        try:
+            self._memory.close()
+        except BufferError:
+            # A segment is still alive; the mapping goes away with the process
+            pass
+
+    def unlink(self):
+        """Free the block once every process has closed it. Only the creator calls this."""
+        try:
+            self._memory.unlink()
+        except FileNotFoundError:
+            pass
+
+    def release_when_done(self, futures):
+        """
+        Close and unlink the block once all futures using it have finished.
+
+        Args:
+            futures: Futures of the jobs reading from the block, all already submitted
+        """
+        remaining = len(futures)
+        lock = threading.Lock()
+
+        def done(_):
+            nonlocal remaining
+            with lock:
+                remaining -= 1
+                last = remaining == 0
+            if last:
+                self.close()
+                self.unlink()
+
+        if not futures:
+            self.close()
+            self.unlink()
+        for future in futures:
+            future.add_done_callback(done)
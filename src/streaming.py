@@ -0,0 +1,114 @@
+from pydub.utils import db_to_float
+from .audio_processor import AudioProcessor
+from .pcm_decoder import iter_pcm
+from .playback import PlaybackBackend
+
+try:
+    import audioop
+except ImportError:
+    from pydub import pyaudioop as audioop
+
+class StreamingAudioProcessor(AudioProcessor):
+    """
+    Audio processor for clips too long to hold in memory.
+
+    Saving reads the selection from an ffmpeg decoder pipe in fixed-size PCM
+    blocks, with gain and fades applied per block, so peak memory does not
+    depend on the clip length. Previews and get_audio_segment() decode the
+    selection into memory like a lazy AudioProcessor.
+    """
+    BLOCK_SECONDS = 1.0
+    SAMPLE_WIDTH = 2
+    # Fades change gain in steps of this length, like pydub's fades
+    FADE_STEP_SECONDS = 0.001
+
+    def __init__(self, video_path: str, playback: PlaybackBackend | None = None):
+        """
+        Initialize the streaming processor with a video file.
+
+        Args:
+            video_path (str): Path to the video file
+            playback (PlaybackBackend): Backend used for previews
+        """
+        super().__init__(video_path, lazy=True, playback=playback)
+        info = self.media_info()
+        self.frame_rate = info.sample_rate or 44100
+        self.channels = info.channels or 2
+
+    def iter_pcm_blocks(self, block_seconds: float | None = None):
+        """
+        Decode the selection block by block.
+
+        Args:
+            block_seconds (float): Length of each block, defaults to BLOCK_SECONDS
+
+        Yields:
+            bytes: Signed 16-bit little-endian PCM at frame_rate and channels,
+            with gain and fades applied
+
+        Raises:
+            ValueError: If decoding fails
+        """
+        frame_width = self.SAMPLE_WIDTH * self.channels
+        block_frames = max(1, int((block_seconds or self.BLOCK_SECONDS) * self.frame_rate))
+        total_frames = round((self.end_time - self.start_time) * self.frame_rate)
+        if total_frames <= 0:
+            return
+
+        blocks = iter_pcm(self.video_path, self.frame_rate, self.channels, block_frames,
+                          self.start_time, self.end_time - self.start_time)
+        position = 0
+        try:
+            for block in blocks:
+                block = block[:(total_frames - position) * frame_width]
+                yield self._process_block(block, position, total_frames)
+                position += len(block) // frame_width
+                if position >= total_frames:
+                    # Everything needed was read; don't wait for trailing output
+                    break
+        finally:
+            blocks.close()
+
+    def _process_block(self, block: bytes, position: int, total_frames: int) -> bytes:
+        """
+        Apply gain and fades to one block.
+
+        Args:
+            block (bytes): PCM frames
+            position (int): Index of the block's first frame within the selection
+            total_frames (int): Number of frames in the selection
+        """
+        if self.gain_db:
+            block = audioop.mul(block, self.SAMPLE_WIDTH, db_to_float(self.gain_db))
+
+        fade_in_frames = min(int(self.fade_in * self.frame_rate), total_frames)
+        if fade_in_frames:
+            block = self._apply_ramp(block, position, 0, fade_in_frames, 0.0, 1.0)
+
+        fade_out_frames = min(int(self.fade_out * self.frame_rate), total_frames)
+        if fade_out_frames:
+            block = self._apply_ramp(block, position, total_frames - fade_out_frames, total_frames, 1.0, 0.0)
+
+        return block
+
+    def _apply_ramp(self, block: bytes, position: int, ramp_start: int, ramp_end: int,
+                    from_ratio: float, to_ratio: float) -> bytes:
+        """
+        Scale the part of a block that overlaps the frames [ramp_start,
+        ramp_end) by a linear ramp from from_ratio to to_ratio.
+        """
+        frame_width = self.SAMPLE_WIDTH * self.channels
+        first = max(position, ramp_start)
+        last = min(position + len(block) // frame_width, ramp_end)
+        if first >= last:
+            return block
+
+        step = max(1, int(self.FADE_STEP_SECONDS * self.frame_rate))
+        pieces = [block[:(first - position) * frame_width]]
+        for frame in range(first, last, step):
+            chunk_end = min(frame + step, last)
+            ratio = from_ratio + (to_ratio - from_ratio) * (frame - ramp_start) / (ramp_end - ramp_start)
+            chunk = block[(frame - position) * frame_width:(chunk_end - position) * frame_width]
+            pieces.append(audioop.mul(chunk, self.SAMPLE_WIDTH, ratio))
+        pieces.append(block[(last - position) * frame_width:])
+        return b''.join(pieces)
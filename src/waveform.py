@@ -0,0 +1,245 @@
+import os
+import numpy as np
+from pydub import AudioSegment
+from .instrumentation import get_instrumentation
+from .pcm_decoder import iter_pcm, output_format
+
+class PeakIndex:
+    """
+    Multi-resolution min/max/RMS summary of a source's audio, for drawing
+    waveforms at any zoom level without touching the samples again.
+
+    Level 0 summarises blocks of BLOCK_FRAMES frames; every further level
+    combines LEVEL_FACTOR blocks of the level below, so rendering a view of
+    any length reads at most a few blocks per pixel.
+    """
+    BLOCK_FRAMES = 128
+    LEVEL_FACTOR = 4
+    # Level-0 blocks reduced at a time while building, which bounds the
+    # memory used for samples regardless of the source length
+    CHUNK_BLOCKS = 512
+    # Bump when the file layout changes so stale sidecars are rebuilt
+    FORMAT_VERSION = 1
+    SIDECAR_SUFFIX = '.peaks.npz'
+
+    def __init__(self, frame_rate: int, levels: list[tuple[np.ndarray, np.ndarray, np.ndarray]]):
+        """
+        Args:
+            frame_rate (int): Sample rate of the summarised audio
+            levels (list): (mins, maxs, mean squares) per level, normalised to [-1, 1]
+        """
+        self.frame_rate = frame_rate
+        self.levels = levels
+
+    @property
+    def duration(self) -> float:
+        """Length of the summarised audio in seconds, rounded up to whole blocks."""
+        return len(self.levels[0][0]) * self.BLOCK_FRAMES / self.frame_rate
+
+    @classmethod
+    def from_segment(cls, segment: AudioSegment) -> 'PeakIndex':
+        """
+        Build the index from decoded audio, reading its samples in place.
+
+        Args:
+            segment (AudioSegment): Decoded audio, any channel count
+
+        Returns:
+            PeakIndex: The index
+        """
+        chunk_bytes = cls.CHUNK_BLOCKS * cls.BLOCK_FRAMES * segment.sample_width * segment.channels
+        data = memoryview(segment.raw_data)
+        chunks = (data[offset:offset + chunk_bytes] for offset in range(0, len(data), chunk_bytes))
+        return cls.from_pcm(chunks, segment.frame_rate, segment.channels, segment.sample_width)
+
+    @classmethod
+    def from_pcm(cls, chunks, frame_rate: int, channels: int, sample_width: int = 2) -> 'PeakIndex':
+        """
+        Build the index from interleaved PCM arriving in chunks, e.g. from a
+        decoder pipe. Each chunk is reduced to level-0 blocks as it arrives,
+        so only the summaries are kept.
+
+        Args:
+            chunks: Iterable of buffers of whole frames of signed little-endian samples
+            frame_rate (int): Sample rate of the audio
+            channels (int): Channel count of the audio
+            sample_width (int): Bytes per sample
+
+        Returns:
+            PeakIndex: The index
+        """
+        dtype = np.dtype(f'<i{sample_width}')
+        scale = float(1 << (8 * sample_width - 1))
+        block_samples = cls.BLOCK_FRAMES * channels
+        mins, maxs, squares = [], [], []
+
+        def reduce(blocks: np.ndarray):
+            mins.append(blocks.min(axis=1).astype(np.float32) / scale)
+            maxs.append(blocks.max(axis=1).astype(np.float32) / scale)
+            values = blocks.astype(np.float32)
+            values /= scale
+            np.square(values, out=values)
+            squares.append(values.mean(axis=1))
+
+        # Samples of a block split across two chunks
+        remainder = np.empty(0, dtype=dtype)
+        for chunk in chunks:
+            samples = np.frombuffer(chunk, dtype=dtype)
+            if len(remainder):
+                samples = np.concatenate((remainder, samples))
+            whole = len(samples) - len(samples) % block_samples
+            if whole:
+                reduce(samples[:whole].reshape(-1, block_samples))
+            remainder = samples[whole:].copy()
+
+        if len(remainder) or not mins:
+            # The last block is padded with silence
+            last = np.zeros(block_samples, dtype=dtype)
+            last[:len(remainder)] = remainder
+            reduce(last.reshape(1, -1))
+
+        levels = [(np.concatenate(mins), np.concatenate(maxs), np.concatenate(squares))]
+        while len(levels[-1][0]) > 1:
+            mins, maxs, squares = levels[-1]
+            count = -(-len(mins) // cls.LEVEL_FACTOR)
+            pad = count * cls.LEVEL_FACTOR - len(mins)
+            levels.append((
+                np.pad(mins, (0, pad), mode='edge').reshape(count, -1).min(axis=1),
+                np.pad(maxs, (0, pad), mode='edge').reshape(count, -1).max(axis=1),
+                np.pad(squares, (0, pad), mode='edge').reshape(count, -1).mean(axis=1),
+            ))
+        return cls(frame_rate, levels)
+
+    @classmethod
+    def for_file(cls, video_path: str) -> 'PeakIndex':
+        """
+        Load the index cached next to a media file, building and caching it
+        first if it is missing or older than the file.
+
+        Args:
+            video_path (str): Path to the media file
+
+        Returns:
+            PeakIndex: The index
+
+        Raises:
+            ValueError: If the file cannot be decoded
+        """
+        sidecar_path = video_path + cls.SIDECAR_SUFFIX
+        try:
+            stat = os.stat(video_path)
+        except OSError as e:
+            raise ValueError(f"Failed to read media file: {str(e)}")
+
+        index = cls.load(sidecar_path, stat.st_size, stat.st_mtime_ns)
+        if index is not None:
+            return index
+
+        instrumentation = get_instrumentation()
+        try:
+            with instrumentation.stage('waveform_index', path=video_path):
+                # Streamed from the decoder, so the whole source is never in memory
+                frame_rate, channels = output_format(video_path)
+                chunks = iter_pcm(video_path, frame_rate, channels, cls.CHUNK_BLOCKS * cls.BLOCK_FRAMES)
+                index = cls.from_pcm(chunks, frame_rate, channels)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Failed to decode audio: {str(e)}")
+
+        try:
+            index.save(sidecar_path, stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            # The index still works without its cache file
+            pass
+        return index
+
+    def save(self, sidecar_path: str, source_size: int, source_mtime_ns: int):
+        """Write the index to a sidecar file, tagged with the source's size and mtime."""
+        arrays = {}
+        for level, (mins, maxs, squares) in enumerate(self.levels):
+            arrays[f'min_{level}'] = mins
+            arrays[f'max_{level}'] = maxs
+            arrays[f'square_{level}'] = squares
+
+        # Write to a temporary file first so readers never see a partial index;
+        # np.savez appends .npz to names without it
+        temp_path = f"{sidecar_path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            temp_path,
+            header=np.array([self.FORMAT_VERSION, self.frame_rate, self.BLOCK_FRAMES, self.LEVEL_FACTOR,
+                             len(self.levels), source_size, source_mtime_ns], dtype=np.int64),
+            **arrays
+        )
+        os.replace(temp_path, sidecar_path)
+
+    @classmethod
+    def load(cls, sidecar_path: str, source_size: int, source_mtime_ns: int) -> 'PeakIndex | None':
+        """
+        Read an index written by save().
+
+        Returns:
+            PeakIndex | None: The index, or None if the file is missing, from
+            another format version, or was built from a different source file
+        """
+        try:
+            with np.load(sidecar_path) as data:
+                version, frame_rate, block_frames, level_factor, level_count, size, mtime_ns = data['header']
+                if (version != cls.FORMAT_VERSION or block_frames != cls.BLOCK_FRAMES
+                        or level_factor != cls.LEVEL_FACTOR
+                        or size != source_size or mtime_ns != source_mtime_ns):
+                    return None
+                levels = [
+                    (data[f'min_{level}'], data[f'max_{level}'], data[f'square_{level}'])
+                    for level in range(level_count)
+                ]
+        except (OSError, KeyError, ValueError):
+            return None
+        return cls(int(frame_rate), levels)
+
+    def render(self, start: float, end: float, width: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Summarise a time range into one column per pixel.
+
+        Args:
+            start (float): Start of the view in seconds
+            end (float): End of the view in seconds
+            width (int): Number of pixels
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: Minimum, maximum and RMS per pixel
+        """
+        width = max(1, int(width))
+        frames_per_pixel = max(end - start, 0) * self.frame_rate / width
+
+        # Use the coarsest level that still has at least one block per pixel
+        level = 0
+        block_frames = self.BLOCK_FRAMES
+        while (level + 1 < len(self.levels)
+               and block_frames * self.LEVEL_FACTOR <= frames_per_pixel):
+            level += 1
+            block_frames *= self.LEVEL_FACTOR
+        mins, maxs, squares = self.levels[level]
+
+        edges = np.linspace(start * self.frame_rate, end * self.frame_rate, width + 1) / block_frames
+        first = np.clip(edges[:-1].astype(np.int64), 0, len(mins) - 1)
+        last = np.clip(np.ceil(edges[1:]).astype(np.int64), first + 1, len(mins))
+        # Pixels narrower than a block repeat that block; wider ones reduce
+        # their few blocks, so the work is proportional to the width
+        return (
+            self._reduce(np.minimum, mins, first, last),
+            self._reduce(np.maximum, maxs, first, last),
+            np.sqrt(self._reduce(np.add, squares, first, last) / (last - first)),
+        )
+
+    @staticmethod
+    def _reduce(ufunc, values: np.ndarray, first: np.ndarray, last: np.ndarray) -> np.ndarray:
+        """
+        Apply ufunc over values[first[i]:last[i]] for every pixel i, one
+        vectorized step per block offset.
+        """
+        result = values[first].copy()
+        for offset in range(1, int((last - first).max())):
+            inside = first + offset < last
+            result[inside] = ufunc(result[inside], values[(first + offset)[inside]])
+        return result
@@ -1,21 +1,73 @@
+import glob
+import hashlib
 import os
-import shutil
-import tempfile
-from pytubefix import YouTube
+import re
+import time
+import uuid
+from contextlib import contextmanager
 from urllib.parse import urlparse, parse_qs
+from .download_cache import DownloadCache
+from .instrumentation import get_instrumentation
+from .scratch import ScratchSpace, get_scratch_space
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+# pytubefix takes longer to import than the rest of the program together, so
+# it is only imported once a video has to be resolved (see _youtube_class())
+YouTube = None
 
 class YoutubeDownloader:
-    def __init__(self):
-        """Initialize the downloader with a temporary directory."""
-        self.temp_dir = os.path.join(tempfile.gettempdir(), 'youtube_temp')
-        os.makedirs(self.temp_dir, exist_ok=True)
+    CHUNK_SIZE = 256 * 1024
+    # Size of each ranged request; YouTube throttles long unranged responses
+    RANGE_SIZE = 8 * 1024 * 1024
+    TIMEOUT_SECONDS = 30
+    MAX_RANGE_RETRIES = 3
+    RETRY_DELAY_SECONDS = 0.5
+    AUDIO_BITRATE_POLICIES = ('smallest', 'largest')
+
+    def __init__(self, cache: DownloadCache | None = None, audio_only: bool = False,
+                 audio_bitrate: str | int = 'smallest', scratch: ScratchSpace | None = None):
+        """
+        Initialize the downloader with its own scratch directory.
+
+        Args:
+            cache (DownloadCache): Optional persistent cache; downloads are kept
+                there instead of the scratch directory and reused across runs
+            audio_only (bool): Download an audio-only stream instead of the
+                progressive video stream
+            audio_bitrate (str | int): Audio stream policy in audio-only mode:
+                "smallest", "largest", or a bitrate in kbps to pick the best
+                stream at or below it
+            scratch (ScratchSpace): Where downloads without a cache go,
+                defaults to the pipeline's scratch space
+
+        Raises:
+            ValueError: If the audio bitrate policy is invalid
+        """
+        if not isinstance(audio_bitrate, int) and audio_bitrate not in self.AUDIO_BITRATE_POLICIES:
+            raise ValueError(f"Invalid audio bitrate policy: {audio_bitrate}")
+
+        self.cache = cache
+        self.audio_only = audio_only
+        self.audio_bitrate = audio_bitrate
+        self.scratch = scratch or get_scratch_space()
+        # Private to this downloader, so concurrent ones never touch each other's files
+        self._scratch_dir = self.scratch.job('download')
+        self.temp_dir = self._scratch_dir.path
 
-    def download_video(self, url: str) -> str:
+    def download_video(self, url: str, on_progress=None, expected_sha256: str | None = None) -> str:
         """
-        Download a video from YouTube and save it to the temporary directory.
+        Download a video from YouTube and save it to the scratch directory.
         
         Args:
             url (str): The YouTube video URL
+            on_progress: Optional callable invoked with (bytes_downloaded, total_bytes)
+            expected_sha256 (str): Optional SHA-256 hex digest the download must match
             
         Returns:
             str: Path to the downloaded video file
@@ -26,17 +78,290 @@ class YoutubeDownloader:
         if not self._is_valid_youtube_url(url):
             raise ValueError("Invalid YouTube URL")
 
+        instrumentation = get_instrumentation()
+        video_id = self._extract_video_id(url)
+        if self.cache and video_id:
+            # Only a stream this downloader would have selected itself
+            cached_path = self.cache.get(video_id, policy=self.selection_policy)
+            if cached_path:
+                instrumentation.count('download_cache_hits')
+                return cached_path
+            instrumentation.count('download_cache_misses')
+
+        with instrumentation.stage('download', url=url):
+            return self._download(url, video_id, on_progress, expected_sha256)
+
+    def _download(self, url: str, video_id: str | None, on_progress, expected_sha256: str | None) -> str:
+        """Resolve the stream for a URL and download it."""
         try:
-            yt = YouTube(url)
-            video = yt.streams.filter(progressive=True, file_extension='mp4').first()
-            return video.download(output_path=self.temp_dir)
+            yt = _youtube_class()(url)
+            video = self._select_stream(yt)
+            if video is None:
+                raise ValueError("No suitable stream found")
+
+            # Download under a temporary name and move it into place once complete.
+            # The partial file is kept on failure so a retry can resume it. Only
+            # the holder of its lock writes to it; anyone else downloading the
+            # same stream waits and then uses the finished file
+            if not (self.cache and video_id):
+                # Named by video and stream, never by title: videos sharing a
+                # title must not resolve to each other's file
+                name = f"{video_id}_{video.itag}" if video_id else uuid.uuid4().hex
+                output_path = os.path.join(self.temp_dir, f"{name}.{video.subtype}")
+                partial_path = output_path + '.part'
+                with _exclusive_lock(partial_path):
+                    if os.path.exists(output_path):
+                        return output_path
+                    # Waits while the scratch space is over its quota
+                    with self._scratch_dir.reserve(self._expected_size(video)):
+                        self._fetch(video.url, partial_path, on_progress, expected_sha256)
+                    os.replace(partial_path, output_path)
+                return output_path
+
+            partial_path = self.cache.temp_path(video.subtype, f"{video_id}_{video.itag}")
+            with _exclusive_lock(partial_path):
+                if os.path.exists(self.cache.entry_path(video_id, video.itag, video.subtype)):
+                    # Downloaded by another policy or a concurrent download
+                    cached_path = self.cache.get(video_id, video.itag)
+                    if cached_path:
+                        self.cache.add_policy(cached_path, self.selection_policy)
+                        return cached_path
+                self._fetch(video.url, partial_path, on_progress, expected_sha256)
+                return self.cache.put(video_id, video.itag, partial_path, self.selection_policy)
         except Exception as e:
             raise ValueError(f"Failed to download video: {str(e)}")
 
+    async def download_many(self, urls: list[str], max_concurrency: int = 4, on_progress=None,
+                            retries: int = 3, backoff: float = 1.0) -> dict[str, str | Exception]:
+        """
+        Download several videos concurrently.
+
+        URLs pointing at the same video (e.g. youtu.be/x and
+        youtube.com/watch?v=x) are downloaded once. Failed downloads are
+        retried with exponential backoff.
+
+        Args:
+            urls (list[str]): YouTube video URLs
+            max_concurrency (int): Maximum number of downloads running at once
+            on_progress: Optional callable invoked on the event loop with
+                (url, bytes_downloaded, total_bytes)
+            retries (int): Number of retries after a failed download
+            backoff (float): Delay before the first retry in seconds, doubled on each retry
+
+        Returns:
+            dict[str, str | Exception]: Path to the downloaded file for each
+            input URL, or the exception that made it fail
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(max_concurrency)
+        results: dict[str, str | Exception] = {}
+
+        # Group the input URLs by video so each video is downloaded once
+        videos: dict[str, list[str]] = {}
+        for url in urls:
+            video_id = self._extract_video_id(url) if self._is_valid_youtube_url(url) else None
+            if video_id is None:
+                results[url] = ValueError("Invalid YouTube URL")
+                continue
+            videos.setdefault(video_id, []).append(url)
+
+        async def download(video_id: str, video_urls: list[str]) -> str:
+            def report(done: int, total: int):
+                if on_progress:
+                    for url in video_urls:
+                        loop.call_soon_threadsafe(on_progress, url, done, total)
+
+            canonical_url = f"https://www.youtube.com/watch?v={video_id}"
+            async with semaphore:
+                for attempt in range(retries + 1):
+                    try:
+                        return await asyncio.to_thread(self.download_video, canonical_url, report)
+                    except ValueError:
+                        if attempt == retries:
+                            raise
+                    await asyncio.sleep(backoff * 2 ** attempt)
+
+        outcomes = await asyncio.gather(
+            *(download(video_id, video_urls) for video_id, video_urls in videos.items()),
+            return_exceptions=True
+        )
+        for video_urls, outcome in zip(videos.values(), outcomes):
+            for url in video_urls:
+                results[url] = outcome
+
+        return {url: results[url] for url in urls}
+
+    @property
+    def selection_policy(self) -> str:
+        """
+        Identifies how _select_stream() picks a stream, e.g. "progressive" or
+        "audio:128", so cached downloads can be matched without resolving
+        the video.
+        """
+        if not self.audio_only:
+            return 'progressive'
+        return f"audio:{self.audio_bitrate}"
+
+    def _select_stream(self, yt):
+        """
+        Pick the stream to download according to the download mode.
+
+        Returns:
+            Stream | None: The selected stream, or None if there is none
+        """
+        if not self.audio_only:
+            return yt.streams.filter(progressive=True, file_extension='mp4').first()
+
+        streams = sorted(yt.streams.filter(only_audio=True), key=lambda stream: stream.bitrate or 0)
+        if not streams:
+            return None
+        if self.audio_bitrate == 'smallest':
+            return streams[0]
+        if self.audio_bitrate == 'largest':
+            return streams[-1]
+
+        # Best stream at or below the requested bitrate, else the smallest one
+        at_or_below = [stream for stream in streams if (stream.bitrate or 0) <= self.audio_bitrate * 1000]
+        return at_or_below[-1] if at_or_below else streams[0]
+
+    def _fetch(self, stream_url: str, output_path: str, on_progress=None,
+               expected_sha256: str | None = None):
+        """
+        Download a file over HTTP in ranged chunks.
+
+        An existing file at output_path is treated as an earlier partial
+        download and resumed. A dropped connection resumes from the last
+        byte written; HTTP error responses are raised to the caller.
+
+        Args:
+            stream_url (str): Direct URL of the media stream
+            output_path (str): Where to write the file
+            on_progress: Optional callable invoked with (bytes_downloaded, total_bytes)
+            expected_sha256 (str): Optional SHA-256 hex digest the file must match
+
+        Raises:
+            ValueError: If the checksum does not match
+        """
+        import http.client
+        import urllib.error
+        import urllib.request
+
+        instrumentation = get_instrumentation()
+        done = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+        total = None
+        failures = 0
+
+        while total is None or done < total:
+            headers = {
+                'User-Agent': 'Mozilla/5.0',
+                'Range': f"bytes={done}-{done + self.RANGE_SIZE - 1}"
+            }
+            request = urllib.request.Request(stream_url, headers=headers)
+            try:
+                with urllib.request.urlopen(request, timeout=self.TIMEOUT_SECONDS) as response:
+                    if response.status == 206:
+                        total = self._content_range_total(response.headers.get('Content-Range'))
+                        mode = 'ab'
+                    else:
+                        # Range not supported, the whole file follows
+                        done = 0
+                        mode = 'wb'
+
+                    with open(output_path, mode) as f:
+                        while True:
+                            chunk = response.read(self.CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            f.write(chunk)
+                            done += len(chunk)
+                            instrumentation.count('bytes_downloaded', len(chunk))
+                            if on_progress:
+                                on_progress(done, total or 0)
+
+                    if response.status != 206 or total is None:
+                        total = done
+            except urllib.error.HTTPError as e:
+                # A complete partial file gets "range not satisfiable"
+                if e.code == 416 and done == self._content_range_total(e.headers.get('Content-Range')):
+                    break
+                raise
+            except (urllib.error.URLError, http.client.HTTPException, OSError):
+                failures += 1
+                if failures > self.MAX_RANGE_RETRIES:
+                    raise
+                time.sleep(self.RETRY_DELAY_SECONDS * failures)
+                done = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+                continue
+            failures = 0
+
+        if expected_sha256:
+            digest = hashlib.sha256()
+            with open(output_path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+            if digest.hexdigest() != expected_sha256.lower():
+                os.remove(output_path)
+                raise ValueError("Checksum mismatch")
+
+    @staticmethod
+    def _content_range_total(content_range: str | None) -> int | None:
+        """Parse the total size out of a "bytes start-end/total" Content-Range header."""
+        match = re.search(r'/(\d+)\s*$', content_range or '')
+        return int(match.group(1)) if match else None
+
+    @staticmethod
+    def _expected_size(stream) -> int:
+        """Approximate size of a stream in bytes, 0 if unknown. Does not make a request."""
+        size = getattr(stream, 'filesize_approx', None)
+        return size if isinstance(size, int) else 0
+
+    def discard(self, path: str):
+        """
+        Remove a download that went to the scratch directory rather than the
+        cache, along with files built next to it such as decoded audio.
+        Cached downloads are left to the cache.
+        """
+        if os.path.dirname(path) != self.temp_dir:
+            return
+        for leftover in [path] + glob.glob(glob.escape(path) + '.*'):
+            try:
+                os.remove(leftover)
+            except OSError:
+                pass
+
     def cleanup(self):
-        """Remove the temporary directory and all its contents."""
-        if os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir)
+        """Remove the scratch directory and all its contents."""
+        if hasattr(self, '_scratch_dir'):
+            self._scratch_dir.cleanup()
+
+    @staticmethod
+    def _extract_video_id(url: str) -> str | None:
+        """
+        Extract the video ID from a YouTube URL.
+
+        Supports youtu.be short links and youtube.com watch, shorts, embed
+        and live URLs.
+
+        Returns:
+            str | None: The video ID, or None if the URL does not contain one
+        """
+        try:
+            parsed_url = urlparse(url)
+        except ValueError:
+            return None
+
+        path_parts = [part for part in parsed_url.path.split('/') if part]
+        if parsed_url.netloc == 'youtu.be':
+            return path_parts[0] if path_parts else None
+
+        if parsed_url.path == '/watch':
+            return parse_qs(parsed_url.query).get('v', [None])[0]
+
+        if len(path_parts) >= 2 and path_parts[0] in ('shorts', 'embed', 'live'):
+            return path_parts[1]
+        return None
 
     def _is_valid_youtube_url(self, url: str) -> bool:
         """Validate if the given URL is a valid YouTube URL."""
@@ -51,4 +376,44 @@ class YoutubeDownloader:
 
     def __del__(self):
         """Ensure cleanup is called when the object is destroyed."""
-        self.cleanup() 
\ No newline at end of file
+        self.cleanup() 
+
+
+@contextmanager
+def _exclusive_lock(path: str):
+    """
+    Hold an exclusive lock on path for the duration of the block, waiting
+    for any other thread or process holding it.
+
+    The lock is taken on a "<path>.lock" file that is left in place, so
+    waiters never end up locking different files. The operating system
+    releases it if the holder crashes.
+    """
+    with open(path + '.lock', 'a+b') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after about ten seconds; keep waiting
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _youtube_class():
+    """Return pytubefix's YouTube class, importing pytubefix on first use."""
+    global YouTube
+    if YouTube is None:
+        from pytubefix import YouTube
+    return YouTube
@@ -1,6 +1,10 @@
 import pytest
+import os
+import subprocess
 from src.audio_processor import AudioProcessor
+from src.playback import RecordingBackend
 from pydub import AudioSegment
+from pydub.generators import Sine
 from unittest.mock import Mock, patch, MagicMock
 from src.utils.time_converter import TimeConverter
 
@@ -12,6 +16,7 @@ class TestAudioProcessor:
             mock_audio = MagicMock(spec=AudioSegment)
             mock_audio.duration_seconds = 600  # 10 minutes duration
             mock_audio.dBFS = -20
+            mock_audio.channels = 2
             
             # Configure the mock to return itself for slicing
             mock_audio.__getitem__.return_value = mock_audio
@@ -21,7 +26,7 @@ class TestAudioProcessor:
             mock_audio.__radd__.return_value = mock_audio
             
             mock_from_file.return_value = mock_audio
-            processor = AudioProcessor("test_video.mp4")
+            processor = AudioProcessor("test_video.mp4", playback=RecordingBackend())
             yield processor
 
     def test_init_loads_audio(self, processor):
@@ -40,6 +45,14 @@ class TestAudioProcessor:
         assert processor.start_time == 180  # 3 minutes
         assert processor.end_time == 420    # 7 minutes
 
+    def test_adjust_time_range_keeps_full_precision(self, processor):
+        # 1/44100 s is one sample at 44.1 kHz
+        sample = 1 / 44100
+        processor.set_time_range(120 + sample, 480)
+        processor.adjust_time_range(sample, -sample)
+        assert processor.start_time == 120 + sample + sample
+        assert processor.end_time == 480 - sample
+
     def test_invalid_time_range_raises_error(self, processor):
         with pytest.raises(ValueError):
             processor.set_time_range("-1:00", "11:00")
@@ -48,38 +61,214 @@ class TestAudioProcessor:
         with pytest.raises(ValueError):
             processor.set_time_range("invalid", "2:00")
 
-    @patch('src.audio_processor.playsound')
-    @patch.object(AudioSegment, 'export')
-    @patch('os.path.exists', return_value=True)
-    @patch('os.makedirs', return_value=None)
-    def test_play_preview(self, mock_makedirs, mock_exists, mock_export, mock_playsound, processor):
+    def test_play_preview(self, processor):
         processor.set_time_range("0:02", "0:04")
         
-        # Create a mock audio segment with its own export method
-        mock_segment = MagicMock(spec=AudioSegment)
-        mock_segment.export = Mock(return_value=None)  # Add export method directly to segment
+        # Configure the audio slice to return real audio
+        segment = AudioSegment.silent(duration=2000, frame_rate=8000)
+        processor.audio.__getitem__.return_value = segment
         
-        # Configure the audio slice to return our mock segment
-        processor.audio.__getitem__.return_value = mock_segment
+        processor.play_preview(blocking=True)
         
+        # Verify the slice was streamed from memory without writing a preview file
+        assert processor.audio.__getitem__.call_args[0][0] == slice(2000, 4000)
+        assert bytes(processor.playback.recorded) == segment.raw_data
+        assert processor.playback.format == (2, 1, 8000)
+        assert not os.listdir(processor.temp_dir)
+
+    def test_play_preview_waits_if_backend_cannot_stop(self, processor):
+        processor.audio.__getitem__.return_value = AudioSegment.silent(duration=100)
+        processor.playback = Mock(can_stop=False)
         processor.play_preview()
-        
-        # Verify that the segment's export method was called
-        assert mock_segment.export.called
-        assert mock_segment.export.call_args[1]['format'] == 'wav'  # Check format parameter
-        mock_playsound.assert_called_once()
+        processor.playback.wait.assert_called_once()
+
+        processor.playback = Mock(can_stop=True)
+        processor.play_preview()
+        processor.playback.wait.assert_not_called()
 
     def test_adjust_volume(self, processor):
-        original_volume = -20
-        processor.audio.dBFS = original_volume
-        
-        # Mock the volume adjustment behavior
-        def adjust_volume(db_change):
-            processor.audio.dBFS = original_volume + db_change
-            return processor.audio
-            
-        processor.audio.__add__.side_effect = adjust_volume
-        
-        # Test
         processor.adjust_volume(10)
-        assert processor.audio.dBFS == -10  # Original (-20) + adjustment (10) 
\ No newline at end of file
+        processor.adjust_volume(-4)
+
+        # Volume changes are recorded without touching the decoded audio
+        assert processor.gain_db == 6
+        processor.audio.__add__.assert_not_called()
+        processor.audio.apply_gain.assert_not_called()
+
+        # The total gain is applied once, to the selection only
+        processor.set_time_range("2:00", "8:00")
+        processor.get_audio_segment()
+        processor.audio.__getitem__.assert_called_once_with(slice(120000, 480000))
+        processor.audio.apply_gain.assert_called_once_with(6)
+
+    def test_adjust_volume_applies_gain_to_samples(self, processor):
+        processor.audio.__getitem__.return_value = AudioSegment(
+            data=b'\x00\x10' * 8000, sample_width=2, frame_rate=8000, channels=1
+        )
+        original = processor.get_audio_segment()
+        processor.adjust_volume(6)
+        processor.adjust_volume(-6)
+        assert processor.get_audio_segment().raw_data == original.raw_data
+
+        processor.adjust_volume(-6.0206)  # half amplitude
+        assert abs(processor.get_audio_segment().get_array_of_samples()[0] - 0x1000 // 2) <= 1
+
+    def test_set_fades(self, processor):
+        assert not processor.has_effects
+        processor.set_fades(0.5, 1.5)
+        assert processor.has_effects
+        processor.get_audio_segment()
+        processor.audio.fade_in.assert_called_once_with(500)
+        processor.audio.fade_in.return_value.fade_out.assert_called_once_with(1500)
+        with pytest.raises(ValueError):
+            processor.set_fades(-1, 0)
+
+
+class TestLazyAudioProcessor:
+    @pytest.fixture
+    def processor(self):
+        probe_result = {
+            'streams': [{'codec_type': 'audio', 'duration': '10800.0'}],
+            'format': {'duration': '10800.0'}
+        }
+        with patch('src.probe.mediainfo_json', return_value=probe_result), \
+                patch('src.audio_processor.decode_range') as mock_decode:
+            mock_audio = MagicMock(spec=AudioSegment)
+            mock_audio.channels = 2
+            mock_audio.__getitem__.return_value = mock_audio
+            mock_audio.__add__.return_value = mock_audio
+            mock_decode.return_value = mock_audio
+            processor = AudioProcessor("test_video.mp4", lazy=True, playback=RecordingBackend())
+            processor.mock_decode = mock_decode
+            yield processor
+
+    def test_init_only_probes_duration(self, processor):
+        assert processor.audio is None
+        assert processor.end_time == 10800  # 3 hours
+        processor.mock_decode.assert_not_called()
+
+    def test_get_audio_segment_decodes_only_window(self, processor):
+        processor.set_time_range("1:00:00", "1:00:30")
+        segment = processor.get_audio_segment()
+
+        margin = processor.LAZY_MARGIN_SECONDS
+        processor.mock_decode.assert_called_once_with("test_video.mp4", 3600 - margin, 30 + 2 * margin)
+        segment_slice = processor._window.__getitem__.call_args[0][0]
+        assert segment_slice == slice(int(margin * 1000), int((30 + margin) * 1000))
+
+    def test_small_adjustment_reuses_window(self, processor):
+        processor.set_time_range("1:00:00", "1:00:30")
+        processor.get_audio_segment()
+        processor.adjust_time_range("1", "-1")
+        processor.get_audio_segment()
+        assert processor.mock_decode.call_count == 1
+
+        processor.set_time_range("2:00:00", "2:00:30")
+        processor.get_audio_segment()
+        assert processor.mock_decode.call_count == 2
+
+    def test_adjust_volume_tracks_gain(self, processor):
+        processor.adjust_volume(3)
+        processor.adjust_volume(-1)
+        assert processor.gain_db == 2
+        processor.get_audio_segment()
+        processor.mock_decode.return_value.apply_gain.assert_called_once_with(2)
+
+
+class TestBoundarySnapping:
+    @pytest.fixture
+    def audio(self):
+        tone = Sine(440, sample_rate=8000).to_audio_segment
+        # Tone with silent gaps at 2.0-2.3 s and 4.3-4.5 s
+        return (tone(duration=2000, volume=-6) + AudioSegment.silent(duration=300, frame_rate=8000)
+                + tone(duration=2000, volume=-6) + AudioSegment.silent(duration=200, frame_rate=8000)
+                + tone(duration=1000, volume=-6))
+
+    def _processor(self, audio, lazy=False):
+        probe_result = {'streams': [{'codec_type': 'audio', 'duration': str(audio.duration_seconds)}]}
+        with patch('src.probe.mediainfo_json', return_value=probe_result), \
+                patch('pydub.AudioSegment.from_file', return_value=audio):
+            return AudioProcessor("test_video.mp4", lazy=lazy, playback=RecordingBackend())
+
+    def test_snapping_disabled_by_default(self, audio):
+        processor = self._processor(audio)
+        processor.set_time_range("2.45", "4.1")
+        assert (processor.start_time, processor.end_time) == (2.45, 4.1)
+        processor.cleanup()
+
+    def test_boundaries_snap_to_nearest_silence(self, audio):
+        processor = self._processor(audio)
+        processor.set_snap(0.5)
+        processor.set_time_range("2.45", "4.1")
+        assert processor.start_time == pytest.approx(2.295, abs=0.001)
+        assert processor.end_time == pytest.approx(4.305, abs=0.001)
+        processor.cleanup()
+
+    def test_without_silence_snaps_to_quietest_point(self):
+        tone = Sine(440, sample_rate=8000).to_audio_segment
+        # A quieter passage at 1.0-1.1 s that is still above the silence threshold
+        audio = tone(duration=1000, volume=-6) + tone(duration=100, volume=-30) + tone(duration=1000, volume=-6)
+        processor = self._processor(audio)
+        processor.set_snap(0.2)
+        processor.set_time_range("0.5", "1.2")
+        assert processor.start_time == pytest.approx(0.5, abs=0.01)
+        assert 1.0 < processor.end_time < 1.1
+        processor.cleanup()
+
+    def test_adjustments_are_not_snapped_back(self, audio):
+        processor = self._processor(audio)
+        processor.set_snap(0.5)
+        processor.set_time_range("2.45", "4.1")
+        start, end = processor.start_time, processor.end_time
+        processor.adjust_time_range(0.1, -0.1)
+        assert processor.start_time == pytest.approx(start + 0.1)
+        assert processor.end_time == pytest.approx(end - 0.1)
+        processor.set_time_range("2.45", "4.1", snap=False)
+        assert (processor.start_time, processor.end_time) == (2.45, 4.1)
+        processor.cleanup()
+
+    def test_invalid_snap_tolerance(self, audio):
+        processor = self._processor(audio)
+        with pytest.raises(ValueError):
+            processor.set_snap(-1)
+        processor.cleanup()
+
+    def test_lazy_snapping_decodes_only_neighbourhood(self, audio):
+        processor = self._processor(audio, lazy=True)
+        processor.set_snap(0.5)
+        with patch('src.audio_processor.decode_range') as mock_decode:
+            mock_decode.side_effect = lambda path, start_second, duration: (
+                audio[int(start_second * 1000):int((start_second + duration) * 1000)]
+            )
+            processor.set_time_range("2.45", "4.1")
+
+        assert [call.args[1:] for call in mock_decode.call_args_list] == [(1.95, 1.0), (3.6, 1.0)]
+        assert processor.start_time == pytest.approx(2.295, abs=0.001)
+        assert processor.end_time == pytest.approx(4.305, abs=0.001)
+        processor.cleanup()
+
+    def test_pcm_cache_snaps_without_decoding(self, audio, tmp_path):
+        source = tmp_path / "video.mp4"
+        source.write_bytes(b"video")
+        probe_result = {'streams': [{'codec_type': 'audio', 'duration': str(audio.duration_seconds),
+                                     'sample_rate': '8000', 'channels': 1}]}
+
+        def ffmpeg(command, stdout, stderr):
+            stdout.write(audio.raw_data)
+            return subprocess.CompletedProcess(command, 0, stderr=b'')
+
+        with patch('src.probe.mediainfo_json', return_value=probe_result), \
+                patch('src.pcm_sidecar.subprocess.run', side_effect=ffmpeg), \
+                patch('src.audio_processor.decode_range') as mock_decode:
+            processor = AudioProcessor(str(source), pcm_cache=True, playback=RecordingBackend())
+            processor.set_snap(0.5)
+            processor.set_time_range("2.45", "4.1")
+            segment = processor.get_audio_segment()
+
+        mock_decode.assert_not_called()
+        assert processor.duration == audio.duration_seconds
+        assert processor.start_time == pytest.approx(2.295, abs=0.001)
+        assert processor.end_time == pytest.approx(4.305, abs=0.001)
+        assert bytes(segment.raw_data) == audio[2295:4305].raw_data
+        del segment
+        processor.cleanup()
@@ -0,0 +1,110 @@
+import pytest
+import threading
+import time
+from src.background import BackgroundRunner, JobCancelled
+
+class FakeRoot:
+    """Stands in for the Tk root; after() callbacks run when drained by the test."""
+
+    def __init__(self):
+        self.scheduled = []
+        self.thread = threading.current_thread()
+
+    def after(self, ms, callback):
+        self.scheduled.append(callback)
+
+    def run_pending(self, until, timeout: float = 5):
+        deadline = time.monotonic() + timeout
+        while not until():
+            assert time.monotonic() < deadline, "timed out waiting for callbacks"
+            callbacks, self.scheduled = self.scheduled, []
+            for callback in callbacks:
+                callback()
+            time.sleep(0.01)
+
+
+class TestBackgroundRunner:
+    @pytest.fixture
+    def root(self):
+        return FakeRoot()
+
+    @pytest.fixture
+    def runner(self, root):
+        runner = BackgroundRunner(root)
+        yield runner
+        runner.shutdown()
+
+    def test_result_delivered_on_ui_thread(self, runner, root):
+        results = []
+        runner.submit(lambda job: threading.current_thread(),
+                      on_done=lambda worker: results.append((worker, threading.current_thread())))
+        root.run_pending(lambda: results)
+
+        worker_thread, callback_thread = results[0]
+        assert worker_thread is not root.thread
+        assert callback_thread is root.thread
+
+    def test_error_and_progress_callbacks(self, runner, root):
+        progress = []
+        errors = []
+
+        def work(job):
+            job.report_progress(50, 100)
+            raise ValueError("failed")
+
+        runner.submit(work, on_error=errors.append, on_progress=lambda done, total: progress.append(done))
+        root.run_pending(lambda: errors)
+        assert progress == [50]
+        assert str(errors[0]) == "failed"
+
+    def test_cancel_running_job(self, runner, root):
+        started = threading.Event()
+        stopped = threading.Event()
+        results = []
+
+        def work(job):
+            started.set()
+            try:
+                while True:
+                    job.report_progress(0, 0)
+                    time.sleep(0.01)
+            except JobCancelled:
+                stopped.set()
+                raise
+
+        job = runner.submit(work, on_done=results.append, on_error=results.append)
+        started.wait(5)
+        job.cancel()
+        assert stopped.wait(5)
+        root.run_pending(lambda: runner.pending == 0)
+        assert results == []
+
+    def test_serial_jobs_run_in_order_and_can_be_cancelled(self, runner, root):
+        release = threading.Event()
+        order = []
+
+        runner.submit(lambda job: release.wait(5) and order.append(1), serial=True)
+        second = runner.submit(lambda job: order.append(2), serial=True)
+        runner.submit(lambda job: order.append(3), serial=True)
+        second.cancel()
+        assert runner.pending == 2
+
+        release.set()
+        root.run_pending(lambda: runner.pending == 0)
+        assert order == [1, 3]
+
+    def test_failing_callback_does_not_stop_delivery(self, runner, root):
+        reported = []
+        root.report_callback_exception = lambda *exc_info: reported.append(exc_info[1])
+        results = []
+
+        def fail(result):
+            raise IndexError("pop from empty list")
+
+        runner.submit(lambda job: 1, on_done=fail)
+        root.run_pending(lambda: reported)
+        runner.submit(lambda job: 2, on_done=results.append)
+        root.run_pending(lambda: results)
+
+        assert isinstance(reported[0], IndexError)
+        assert results == [2]
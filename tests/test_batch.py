@@ -0,0 +1,131 @@
+import pytest
+import os
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from src.batch import BatchExtractor, ClipRequest, read_manifest
+from src.youtube_downloader import YoutubeDownloader
+from pydub import AudioSegment
+from unittest.mock import Mock, patch
+
+class TestReadManifest:
+    def test_read_csv_manifest(self, tmp_path):
+        manifest = tmp_path / "clips.csv"
+        manifest.write_text(
+            "url,start,end,gain,output\n"
+            "https://youtube.com/watch?v=a,0:10,0:20,,a.mp3\n"
+            "https://youtube.com/watch?v=b,1:00,1:30,-3,b.wav\n"
+        )
+        requests = read_manifest(str(manifest))
+        assert len(requests) == 2
+        assert requests[0].gain == 0
+        assert requests[1].gain == -3
+        assert requests[1].output_path == "b.wav"
+        assert requests[1].line == 3
+
+    def test_read_jsonl_manifest(self, tmp_path):
+        manifest = tmp_path / "clips.jsonl"
+        manifest.write_text(
+            '{"url": "https://youtube.com/watch?v=a", "start": "0:10", "end": 20, "output": "a.mp3"}\n'
+            '\n'
+            '{"url": "https://youtube.com/watch?v=a", "start": 30, "end": 40, "gain": 2, "output": "b.mp3"}\n'
+        )
+        requests = read_manifest(str(manifest))
+        assert [r.end for r in requests] == ["20", "40"]
+        assert requests[1].line == 3
+
+    def test_read_profile_column(self, tmp_path):
+        manifest = tmp_path / "clips.csv"
+        manifest.write_text(
+            "url,start,end,output,profile\n"
+            "https://youtube.com/watch?v=a,0:10,0:20,a.mp3,voice-mono-16k\n"
+            "https://youtube.com/watch?v=a,0:30,0:40,b.mp3,\n"
+            "https://youtube.com/watch?v=a,0:50,0:60,c.mp3,lossless-ish\n"
+        )
+        with pytest.raises(ValueError, match="line 4"):
+            read_manifest(str(manifest))
+        manifest.write_text("\n".join(manifest.read_text().splitlines()[:3]))
+        assert [r.profile for r in read_manifest(str(manifest))] == ['voice-mono-16k', None]
+
+    def test_invalid_row_raises_error(self, tmp_path):
+        manifest = tmp_path / "clips.csv"
+        manifest.write_text("url,start,end\nhttps://youtube.com/watch?v=a,0:10,0:20\n")
+        with pytest.raises(ValueError, match="line 2"):
+            read_manifest(str(manifest))
+
+    def test_invalid_time_raises_error(self, tmp_path):
+        manifest = tmp_path / "clips.csv"
+        manifest.write_text("url,start,end,output\n"
+                            "https://youtube.com/watch?v=a,0:10,0:20,a.mp3\n"
+                            "https://youtube.com/watch?v=a,0:30,1:x0,b.mp3\n")
+        with pytest.raises(ValueError, match="line 3: Invalid time format"):
+            read_manifest(str(manifest))
+
+
+class TestBatchExtractor:
+    @pytest.fixture
+    def downloader(self):
+        downloader = YoutubeDownloader()
+        with patch.object(downloader, 'download_video') as mock_download_video:
+            mock_download_video.side_effect = lambda url, on_progress=None: f"{url[-1]}.mp4"
+            yield downloader
+
+    @pytest.fixture(autouse=True)
+    def probe(self):
+        probe_result = {'streams': [{'codec_type': 'audio', 'duration': '10.0'}]}
+        with patch('src.probe.mediainfo_json', return_value=probe_result) as mock_probe:
+            yield mock_probe
+
+    @pytest.fixture
+    def extractor(self, downloader):
+        return BatchExtractor(downloader, max_workers=2, executor_class=ThreadPoolExecutor, download_retries=0)
+
+    @patch('src.audio_processor.decode_range')
+    def test_run_downloads_each_source_once(self, mock_decode, extractor, downloader, tmp_path):
+        mock_decode.return_value = AudioSegment.silent(duration=10000)
+        requests = [
+            ClipRequest("https://youtube.com/watch?v=a", "1", "2", str(tmp_path / "a1.wav")),
+            ClipRequest("https://youtube.com/watch?v=b", "1", "3", str(tmp_path / "b1.wav")),
+            ClipRequest("https://youtube.com/watch?v=a", "4", "6", str(tmp_path / "a2.wav"), gain=3),
+        ]
+        results = extractor.run(requests)
+
+        assert downloader.download_video.call_count == 2
+        assert mock_decode.call_count == 2
+        assert all(result.success for result in results)
+        assert [result.request for result in results] == requests
+        with wave.open(str(tmp_path / "a2.wav")) as clip:
+            assert clip.getnframes() / clip.getframerate() == 2
+
+    @patch('src.audio_processor.decode_range')
+    def test_run_groups_url_forms_of_one_video(self, mock_decode, extractor, downloader, tmp_path):
+        mock_decode.return_value = AudioSegment.silent(duration=10000)
+        requests = [
+            ClipRequest("https://youtube.com/watch?v=a", "1", "2", str(tmp_path / "a1.wav")),
+            ClipRequest("https://youtu.be/a", "2", "3", str(tmp_path / "a2.wav")),
+        ]
+        results = extractor.run(requests)
+
+        assert all(result.success for result in results)
+        assert downloader.download_video.call_count == 1
+        # Both clips come from one decoded region
+        assert mock_decode.call_count == 1
+
+    @patch('src.audio_processor.decode_range')
+    def test_run_reports_failures_without_aborting(self, mock_decode, extractor, downloader, tmp_path):
+        mock_decode.return_value = AudioSegment.silent(duration=10000)
+        downloader.download_video.side_effect = lambda url, on_progress=None: (
+            (_ for _ in ()).throw(ValueError("Failed to download video")) if url.endswith('b') else "a.mp4"
+        )
+        requests = [
+            ClipRequest("https://youtube.com/watch?v=a", "1", "20", str(tmp_path / "bad_range.wav")),
+            ClipRequest("https://youtube.com/watch?v=b", "1", "2", str(tmp_path / "b.wav")),
+            ClipRequest("https://youtube.com/watch?v=a", "1", "2", str(tmp_path / "bad.format")),
+            ClipRequest("https://youtube.com/watch?v=a", "1", "2", str(tmp_path / "good.wav")),
+        ]
+        reported = []
+        results = extractor.run(requests, on_result=reported.append)
+
+        assert [result.success for result in results] == [False, False, False, True]
+        assert "download" in results[1].error
+        assert len(reported) == 4
+        assert os.path.exists(tmp_path / "good.wav")
@@ -0,0 +1,102 @@
+import pytest
+import os
+from src.clip_cache import ClipCache
+
+class TestClipCache:
+    @pytest.fixture
+    def cache(self, tmp_path):
+        return ClipCache(str(tmp_path / "cache"), max_bytes=100)
+
+    @pytest.fixture
+    def source(self, tmp_path):
+        path = tmp_path / "source.mp4"
+        path.write_bytes(b"source video")
+        return str(path)
+
+    def _clip(self, tmp_path, name, size):
+        path = tmp_path / name
+        path.write_bytes(b"x" * size)
+        return str(path)
+
+    def test_key_depends_on_every_field(self, cache, source):
+        key = cache.key(source, 1, 2, 'mp3')
+        assert key == cache.key(source, 1.0001, 2, 'mp3')
+        assert key != cache.key(source, 1, 3, 'mp3')
+        assert key != cache.key(source, 1, 2, 'wav')
+        assert key != cache.key(source, 1, 2, 'mp3', gain=3)
+        assert key != cache.key(source, 1, 2, 'mp3', fade_in=1)
+        assert key != cache.key(source, 1, 2, 'mp3', settings={'bitrate': '64k'})
+
+    def test_key_follows_source_content(self, cache, source, tmp_path):
+        copy = tmp_path / "copy.mp4"
+        copy.write_bytes(b"source video")
+        key = cache.key(source, 1, 2, 'mp3')
+        assert cache.key(str(copy), 1, 2, 'mp3') == key
+
+        with open(source, 'wb') as f:
+            f.write(b"another video")
+        os.utime(source, ns=(1, 1))
+        assert cache.key(source, 1, 2, 'mp3') != key
+
+    def test_source_digest_is_remembered_beside_source(self, cache, source, tmp_path):
+        digest = cache.source_digest(source)
+        assert os.path.exists(source + ClipCache.DIGEST_SUFFIX)
+        assert ClipCache(str(tmp_path / "other")).source_digest(source) == digest
+
+    def test_miss_then_hit(self, cache, source, tmp_path):
+        key = cache.key(source, 1, 2, 'mp3')
+        output = str(tmp_path / "out" / "clip.mp3")
+        os.makedirs(os.path.dirname(output))
+        assert not cache.get(key, output)
+
+        cache.put(key, self._clip(tmp_path, "encoded.mp3", 10))
+        assert cache.get(key, output)
+        with open(output, 'rb') as f:
+            assert f.read() == b"x" * 10
+        assert cache.hits == 1
+        assert cache.misses == 1
+        assert cache.hit_rate == 0.5
+
+    def test_hit_replaces_existing_output(self, cache, source, tmp_path):
+        key = cache.key(source, 1, 2, 'mp3')
+        cache.put(key, self._clip(tmp_path, "encoded.mp3", 10))
+        output = self._clip(tmp_path, "clip.mp3", 50)
+        assert cache.get(key, output)
+        assert os.path.getsize(output) == 10
+
+    def test_copies_when_hardlinks_disabled(self, tmp_path, source):
+        cache = ClipCache(str(tmp_path / "cache"), hardlink=False)
+        key = cache.key(source, 1, 2, 'mp3')
+        cache.put(key, self._clip(tmp_path, "encoded.mp3", 10))
+        output = str(tmp_path / "clip.mp3")
+        cache.get(key, output)
+        assert os.stat(output).st_nlink == 1
+
+    def test_evicts_least_recently_used(self, cache, source, tmp_path):
+        keys = [cache.key(source, start, start + 1, 'mp3') for start in range(3)]
+        cache.put(keys[0], self._clip(tmp_path, "a.mp3", 40))
+        cache.put(keys[1], self._clip(tmp_path, "b.mp3", 40))
+        os.utime(os.path.join(cache.cache_dir, f"{keys[0]}.mp3"), (1, 1))
+        os.utime(os.path.join(cache.cache_dir, f"{keys[1]}.mp3"), (2, 2))
+
+        # Using the first entry makes the second one the eviction candidate
+        assert cache.get(keys[0], str(tmp_path / "out.mp3"))
+        cache.put(keys[2], self._clip(tmp_path, "c.mp3", 40))
+
+        assert cache.get(keys[0], str(tmp_path / "out.mp3"))
+        assert not cache.get(keys[1], str(tmp_path / "out.mp3"))
+        assert cache.stats()['bytes'] == 80
+
+    def test_memory_tier_serves_small_clips(self, tmp_path, source):
+        cache = ClipCache(str(tmp_path / "cache"), memory_max_bytes=100, memory_item_max_bytes=20)
+        small = cache.key(source, 1, 2, 'mp3')
+        large = cache.key(source, 3, 4, 'mp3')
+        cache.put(small, self._clip(tmp_path, "small.mp3", 10))
+        cache.put(large, self._clip(tmp_path, "large.mp3", 30))
+
+        for name in os.listdir(cache.cache_dir):
+            os.remove(os.path.join(cache.cache_dir, name))
+        assert cache.get(small, str(tmp_path / "out.mp3"))
+        assert not cache.get(large, str(tmp_path / "out.mp3"))
+        assert cache.memory_hits == 1
+        assert cache.stats()['memory_bytes'] == 10
@@ -0,0 +1,89 @@
+import pytest
+import os
+from src.download_cache import DownloadCache
+
+class TestDownloadCache:
+    @pytest.fixture
+    def cache(self, tmp_path):
+        return DownloadCache(str(tmp_path / "cache"), max_bytes=100)
+
+    def _download(self, cache, size, extension='mp4'):
+        path = cache.temp_path(extension)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        return path
+
+    def test_miss_then_hit(self, cache):
+        assert cache.get("dQw4w9WgXcQ") is None
+        path = cache.put("dQw4w9WgXcQ", 18, self._download(cache, 10))
+
+        assert os.path.basename(path) == "dQw4w9WgXcQ_18.mp4"
+        assert cache.get("dQw4w9WgXcQ") == path
+        assert cache.get("dQw4w9WgXcQ", itag=18) == path
+        assert cache.get("dQw4w9WgXcQ", itag=140) is None
+        assert cache.hits == 2
+        assert cache.misses == 2
+
+    def test_lookup_by_selection_policy(self, cache):
+        path = cache.put("dQw4w9WgXcQ", 18, self._download(cache, 10), policy='progressive')
+        assert cache.get("dQw4w9WgXcQ", policy='progressive') == path
+        assert cache.get("dQw4w9WgXcQ", policy='audio:smallest') is None
+
+        cache.add_policy(path, 'audio:smallest')
+        assert cache.get("dQw4w9WgXcQ", policy='audio:smallest') == path
+        assert cache.stats()['entries'] == 1
+
+    def test_video_id_with_underscore(self, cache):
+        path = cache.put("a_b-c_d", 140, self._download(cache, 10, 'm4a'))
+        assert cache.get("a_b-c_d", itag=140) == path
+
+    def test_partial_downloads_are_not_entries(self, cache):
+        self._download(cache, 10)
+        assert cache.stats()['entries'] == 0
+
+    def test_evicts_least_recently_used(self, cache):
+        first = cache.put("first", 18, self._download(cache, 40))
+        second = cache.put("second", 18, self._download(cache, 40))
+        os.utime(first, (1, 1))
+        os.utime(second, (2, 2))
+
+        # Using the first entry makes the second one the eviction candidate
+        cache.get("first")
+        third = cache.put("third", 18, self._download(cache, 40))
+
+        assert os.path.exists(first)
+        assert not os.path.exists(second)
+        assert os.path.exists(third)
+        assert cache.stats()['bytes'] == 80
+
+    def test_keeps_new_entry_larger_than_cap(self, cache):
+        path = cache.put("large", 18, self._download(cache, 500))
+        assert os.path.exists(path)
+
+    def test_evicting_entry_removes_its_sidecars(self, cache):
+        first = cache.put("first", 18, self._download(cache, 40))
+        with open(first + ".peaks.npz", 'wb') as f:
+            f.write(b"index")
+        os.utime(first, (1, 1))
+        cache.put("second", 18, self._download(cache, 40))
+        cache.put("third", 18, self._download(cache, 40))
+
+        assert not os.path.exists(first)
+        assert not os.path.exists(first + ".peaks.npz")
+        assert cache.stats()['entries'] == 2
+
+    def test_sidecars_count_towards_entry_size(self, cache):
+        first = cache.put("first", 18, self._download(cache, 30))
+        with open(first + ".pcm", 'wb') as f:
+            f.write(b'x' * 60)
+        assert cache.stats()['bytes'] == 90
+
+        # 90 + 30 exceeds the cap, so the first entry goes with its sidecar
+        second = cache.put("second", 18, self._download(cache, 30))
+        assert not os.path.exists(first + ".pcm")
+        assert os.path.exists(second)
+
+    def test_clear(self, cache):
+        cache.put("first", 18, self._download(cache, 10))
+        cache.clear()
+        assert cache.stats()['entries'] == 0
@@ -0,0 +1,42 @@
+import pytest
+from src.encoding_profiles import PROFILES, EncodingProfile, get_profile
+from pydub import AudioSegment
+
+class TestEncodingProfiles:
+    def test_get_profile(self):
+        assert get_profile(None) is PROFILES['default']
+        assert get_profile('archive') is PROFILES['archive']
+        custom = EncodingProfile('custom', "Custom")
+        assert get_profile(custom) is custom
+        with pytest.raises(ValueError, match="voice-mono-16k"):
+            get_profile('lossless-ish')
+
+    def test_default_profile_changes_nothing(self):
+        profile = get_profile('default')
+        segment = AudioSegment.silent(duration=100, frame_rate=44100)
+        assert profile.prepare(segment) is segment
+        assert profile.export_options('mp3') == {}
+        assert profile.ffmpeg_options('mp3') == []
+
+    def test_voice_profile_downmixes_and_resamples(self):
+        profile = get_profile('voice-mono-16k')
+        segment = AudioSegment.silent(duration=1000, frame_rate=44100).set_channels(2)
+        prepared = profile.prepare(segment)
+        assert (prepared.channels, prepared.frame_rate) == (1, 16000)
+        assert len(prepared.raw_data) < len(segment.raw_data) / 5
+        assert profile.export_options('mp3') == {'bitrate': '32k'}
+        assert profile.ffmpeg_options('ogg') == ['-ar', '16000', '-ac', '1', '-q:a', '0']
+        assert not profile.stream_copy
+
+    def test_per_format_options(self):
+        profile = get_profile('archive')
+        assert profile.export_options('mp3') == {'parameters': ['-compression_level', '0', '-q:a', '0']}
+        assert profile.export_options('m4a') == {'bitrate': '256k'}
+        assert profile.export_options('wav') == {}
+
+        preview = get_profile('fast-preview')
+        assert preview.export_options('mp3')['parameters'][-2:] == ['-threads', '0']
+
+    def test_settings_identify_the_output(self):
+        settings = {name: str(profile.settings()) for name, profile in PROFILES.items()}
+        assert len(set(settings.values())) == len(PROFILES)
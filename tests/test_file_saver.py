@@ -1,8 +1,11 @@
 import pytest
 import os
 from src.file_saver import FileSaver
+from src.clip_cache import ClipCache
+from src.probe import MediaInfo
 from pydub import AudioSegment
-from unittest.mock import Mock, patch
+from src.streaming import StreamingAudioProcessor
+from unittest.mock import MagicMock, Mock, patch
 
 class TestFileSaver:
     @pytest.fixture
@@ -12,6 +15,8 @@ class TestFileSaver:
     @pytest.fixture
     def mock_audio_segment(self):
         audio = Mock(spec=AudioSegment)
+        audio.channels = 2
+        audio.frame_rate = 44100
         # Make export create a dummy file
         def mock_export(output_path, format):
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -32,4 +37,155 @@ class TestFileSaver:
     def test_invalid_path_raises_error(self, saver, mock_audio_segment):
         with pytest.raises(ValueError):
             # Use a path that will definitely be invalid
-            saver.save_audio(mock_audio_segment, "\0invalid/path/test.mp3") 
\ No newline at end of file
+            saver.save_audio(mock_audio_segment, "\0invalid/path/test.mp3") 
+
+    @pytest.fixture
+    def mock_processor(self, mock_audio_segment):
+        processor = Mock()
+        processor.video_path = "source.mp4"
+        processor.start_time = 12.5
+        processor.end_time = 20.0
+        processor.has_effects = False
+        processor.get_audio_segment.return_value = mock_audio_segment
+        return processor
+
+    @patch('src.file_saver.subprocess.run')
+    @patch('src.probe.probe_media', return_value=MediaInfo(60000, codec='aac'))
+    def test_save_clip_stream_copies_compatible_codec(self, mock_probe, mock_run, saver, mock_processor, tmp_path):
+        mock_run.return_value = Mock(returncode=0)
+        output_path = str(tmp_path / "clip.m4a")
+        saver.save_clip(mock_processor, output_path)
+
+        command = mock_run.call_args[0][0]
+        assert command[command.index('-c:a') + 1] == 'copy'
+        assert command[command.index('-ss') + 1] == '12.500'
+        assert command[command.index('-t') + 1] == '7.500'
+        mock_processor.get_audio_segment.assert_not_called()
+
+    @patch('src.file_saver.subprocess.run')
+    @patch('src.probe.probe_media', return_value=MediaInfo(60000, codec='aac'))
+    def test_save_clip_reencodes_incompatible_codec(self, mock_probe, mock_run, saver, mock_processor, tmp_path):
+        output_path = str(tmp_path / "clip.mp3")
+        saver.save_clip(mock_processor, output_path)
+        mock_run.assert_not_called()
+        assert os.path.exists(output_path)
+
+    @patch('src.file_saver.subprocess.run')
+    @patch('src.probe.probe_media', return_value=MediaInfo(60000, codec='aac'))
+    def test_save_clip_reencodes_with_volume_change(self, mock_probe, mock_run, saver, mock_processor, tmp_path):
+        mock_processor.has_effects = True
+        saver.save_clip(mock_processor, str(tmp_path / "clip.m4a"))
+        mock_run.assert_not_called()
+        mock_processor.get_audio_segment.assert_called_once()
+
+    @patch('src.file_saver.subprocess.run')
+    @patch('src.probe.probe_media', return_value=MediaInfo(60000, codec='aac'))
+    def test_save_clip_falls_back_when_copy_fails(self, mock_probe, mock_run, saver, mock_processor, tmp_path):
+        mock_run.return_value = Mock(returncode=1, stderr=b'error')
+        output_path = str(tmp_path / "clip.m4a")
+        saver.save_clip(mock_processor, output_path)
+        mock_processor.get_audio_segment.assert_called_once()
+        assert os.path.exists(output_path)
+
+    @patch('src.file_saver.subprocess.Popen')
+    @patch('src.probe.probe_media', return_value=MediaInfo(60000, codec='aac'))
+    def test_save_clip_streams_blocks_to_encoder(self, mock_probe, mock_popen, saver, tmp_path):
+        processor = MagicMock(spec=StreamingAudioProcessor)
+        processor.has_effects = True
+        processor.frame_rate = 48000
+        processor.channels = 2
+        processor.iter_pcm_blocks.return_value = iter([b'\x01' * 8, b'\x02' * 8])
+        mock_popen.return_value.wait.return_value = 0
+
+        saver.save_clip(processor, str(tmp_path / "long.mp3"))
+
+        command = mock_popen.call_args[0][0]
+        assert command[command.index('-f') + 1] == 's16le'
+        assert command[command.index('-ar') + 1] == '48000'
+        writes = [call.args[0] for call in mock_popen.return_value.stdin.write.call_args_list]
+        assert writes == [b'\x01' * 8, b'\x02' * 8]
+        mock_popen.return_value.stdin.close.assert_called_once()
+        processor.get_audio_segment.assert_not_called()
+
+    @patch('src.probe.probe_media', return_value=MediaInfo(60000, codec='aac'))
+    def test_save_clip_serves_repeats_from_clip_cache(self, mock_probe, mock_processor, tmp_path):
+        source = tmp_path / "source.mp4"
+        source.write_bytes(b"video")
+        mock_processor.video_path = str(source)
+        mock_processor.gain_db = 0.0
+        mock_processor.fade_in = 0.0
+        mock_processor.fade_out = 0.0
+        saver = FileSaver(ClipCache(str(tmp_path / "clips")))
+
+        saver.save_clip(mock_processor, str(tmp_path / "first.mp3"))
+        saver.save_clip(mock_processor, str(tmp_path / "second.mp3"))
+        mock_processor.get_audio_segment.assert_called_once()
+        assert saver.clip_cache.hits == 1
+        with open(tmp_path / "second.mp3") as f:
+            assert f.read() == 'test'
+
+        # Saving a new clip over a cached one must not change the cache entry
+        mock_processor.gain_db = 3.0
+        with open(tmp_path / "first.mp3", 'w') as f:
+            f.write('old')
+        saver.save_clip(mock_processor, str(tmp_path / "second.mp3"))
+        saver.save_clip(mock_processor, str(tmp_path / "third.mp3"))
+        mock_processor.gain_db = 0.0
+        saver.save_clip(mock_processor, str(tmp_path / "fourth.mp3"))
+        with open(tmp_path / "fourth.mp3") as f:
+            assert f.read() == 'test'
+
+    def test_save_audio_applies_profile(self, tmp_path):
+        segment = Mock(spec=AudioSegment)
+        prepared = segment.set_channels.return_value.set_frame_rate.return_value
+        segment.channels = 2
+        segment.set_channels.return_value.frame_rate = 44100
+        saver = FileSaver(profile='voice-mono-16k')
+
+        saver.save_audio(segment, str(tmp_path / "voice.mp3"))
+        segment.set_channels.assert_called_once_with(1)
+        segment.set_channels.return_value.set_frame_rate.assert_called_once_with(16000)
+        prepared.export.assert_called_once_with(str(tmp_path / "voice.mp3"), format='mp3', bitrate='32k')
+
+    @patch('src.file_saver.subprocess.run')
+    @patch('src.probe.probe_media', return_value=MediaInfo(60000, codec='aac'))
+    def test_save_clip_respects_profile_stream_copy(self, mock_probe, mock_run, mock_processor, tmp_path):
+        FileSaver(profile='voice-mono-16k').save_clip(mock_processor, str(tmp_path / "clip.m4a"))
+        mock_run.assert_not_called()
+        mock_processor.get_audio_segment.assert_called_once()
+
+    @patch('src.file_saver.subprocess.Popen')
+    def test_save_stream_passes_profile_options(self, mock_popen, tmp_path):
+        processor = MagicMock(spec=StreamingAudioProcessor)
+        processor.has_effects = True
+        processor.frame_rate = 48000
+        processor.channels = 2
+        processor.iter_pcm_blocks.return_value = iter([b'\x01' * 8])
+        mock_popen.return_value.wait.return_value = 0
+
+        FileSaver(profile='voice-mono-16k').save_clip(processor, str(tmp_path / "long.mp3"))
+        command = mock_popen.call_args[0][0]
+        assert command[command.index('-i') + 1:] == [
+            '-', '-ar', '16000', '-ac', '1', '-b:a', '32k', str(tmp_path / "long.mp3")
+        ]
+
+    @patch('src.segmented_encoder.SegmentedEncoder.encode')
+    def test_long_mp3_is_encoded_in_chunks(self, mock_encode, tmp_path):
+        segment = AudioSegment.silent(duration=120000, frame_rate=44100)
+        saver = FileSaver(profile='fast-preview', encode_workers=4)
+
+        saver.save_audio(segment, str(tmp_path / "long.mp3"))
+        prepared, output_path, options = mock_encode.call_args[0]
+        assert prepared.frame_rate == 22050
+        assert output_path == str(tmp_path / "long.mp3")
+        assert options == saver.profile.ffmpeg_options('mp3')
+
+        # Other formats use a single encoder
+        segment = Mock(spec=AudioSegment, channels=1, frame_rate=22050)
+        saver.save_audio(segment, str(tmp_path / "long.ogg"))
+        segment.export.assert_called_once()
+        assert mock_encode.call_count == 1
+
+    def test_unknown_profile(self):
+        with pytest.raises(ValueError):
+            FileSaver(profile='lossless-ish')
@@ -0,0 +1,59 @@
+import pytest
+import json
+from src.instrumentation import (
+    Instrumentation, JsonLogSink, NullInstrumentation, PrometheusTextSink,
+    get_instrumentation, set_instrumentation
+)
+from src.file_saver import FileSaver
+from pydub import AudioSegment
+
+class TestInstrumentation:
+    @pytest.fixture
+    def instrumentation(self, tmp_path):
+        instrumentation = Instrumentation([
+            JsonLogSink(str(tmp_path / "metrics.jsonl")),
+            PrometheusTextSink(str(tmp_path / "metrics.prom"))
+        ])
+        set_instrumentation(instrumentation)
+        yield instrumentation
+        set_instrumentation(None)
+
+    def test_stage_records_timing(self, instrumentation, tmp_path):
+        with instrumentation.stage('download', url="https://youtu.be/x"):
+            pass
+        with pytest.raises(ValueError):
+            with instrumentation.stage('download'):
+                raise ValueError("failed")
+
+        totals = instrumentation.snapshot()['stages']['download']
+        assert totals['count'] == 2
+        assert totals['errors'] == 1
+
+        events = [json.loads(line) for line in (tmp_path / "metrics.jsonl").read_text().splitlines()]
+        assert events[0]['stage'] == 'download'
+        assert events[0]['url'] == "https://youtu.be/x"
+        assert events[0]['ok'] is True
+        assert events[1]['ok'] is False
+
+    def test_flush_writes_prometheus_text(self, instrumentation, tmp_path):
+        with instrumentation.stage('encode'):
+            pass
+        instrumentation.count('bytes_written', 100)
+        instrumentation.count('bytes_written', 20)
+        instrumentation.flush()
+
+        text = (tmp_path / "metrics.prom").read_text()
+        assert 'vid2audioclip_stage_runs_total{stage="encode"} 1' in text
+        assert 'vid2audioclip_bytes_written_total 120' in text
+        summary = json.loads((tmp_path / "metrics.jsonl").read_text().splitlines()[-1])
+        assert summary['event'] == 'summary'
+        assert summary['counters'] == {'bytes_written': 120}
+
+    def test_pipeline_reports_to_current_instrumentation(self, instrumentation, tmp_path):
+        FileSaver().save_audio(AudioSegment.silent(duration=100), str(tmp_path / "clip.wav"))
+        snapshot = instrumentation.snapshot()
+        assert snapshot['stages']['encode']['count'] == 1
+        assert snapshot['counters']['bytes_written'] == (tmp_path / "clip.wav").stat().st_size
+
+    def test_disabled_by_default(self):
+        assert isinstance(get_instrumentation(), NullInstrumentation)
@@ -0,0 +1,152 @@
+import pytest
+import os
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from src.clip_cache import ClipCache
+from src.multi_clip import ClipRequest, MultiClipExtractor, clip_filename, merge_ranges, read_ranges
+from pydub import AudioSegment
+from unittest.mock import patch
+
+class TestMergeRanges:
+    def test_merges_overlapping_and_close_ranges(self):
+        ranges = [(30, 40), (0, 10), (5, 12), (45, 50), (100, 110)]
+        assert merge_ranges(ranges, gap=5) == [(0, 12), (30, 50), (100, 110)]
+
+    def test_without_gap_only_overlaps_merge(self):
+        assert merge_ranges([(0, 10), (11, 20)]) == [(0, 10), (11, 20)]
+
+
+class TestReadRanges:
+    def test_read_timestamp_list(self, tmp_path):
+        ranges_file = tmp_path / "ranges.txt"
+        ranges_file.write_text(
+            "# Setlist\n"
+            "0:10 0:20 First\n"
+            "1:00 - 1:30.5 Second\n"
+            "\n"
+            "2:00 2024 remix\n"
+            "3:00\n"
+        )
+        assert read_ranges(str(ranges_file)) == [
+            (10, 20, "First"),
+            (60, 90.5, "Second"),
+            (120, 180, "2024 remix"),
+            (180, None, ""),
+        ]
+
+    def test_read_chapter_list(self, tmp_path):
+        ranges_file = tmp_path / "chapters.txt"
+        ranges_file.write_text("0:00 - Intro\n1:05 Verse\n1:02:03 Outro\n")
+        assert read_ranges(str(ranges_file)) == [
+            (0, 65, "Intro"),
+            (65, 3723, "Verse"),
+            (3723, None, "Outro"),
+        ]
+
+    def test_read_cue_sheet(self, tmp_path):
+        cue_file = tmp_path / "album.cue"
+        cue_file.write_text(
+            'FILE "album.wav" WAVE\n'
+            '  TRACK 01 AUDIO\n'
+            '    TITLE "Opening"\n'
+            '    INDEX 01 00:00:00\n'
+            '  TRACK 02 AUDIO\n'
+            '    TITLE "Second Song"\n'
+            '    INDEX 00 03:58:00\n'
+            '    INDEX 01 04:00:15\n'
+        )
+        assert read_ranges(str(cue_file)) == [
+            (0, 240.2, "Opening"),
+            (240.2, None, "Second Song"),
+        ]
+
+    def test_invalid_line_raises_error(self, tmp_path):
+        ranges_file = tmp_path / "ranges.txt"
+        ranges_file.write_text("0:10 0:20 First\nIntro at 0:30\n")
+        with pytest.raises(ValueError, match="line 2"):
+            read_ranges(str(ranges_file))
+
+
+def test_clip_filename_strips_unsafe_characters():
+    assert clip_filename(3, 'AC/DC: "Live"', 'mp3') == '03 - AC_DC_ _Live_.mp3'
+    assert clip_filename(12, '', 'wav') == '12.wav'
+
+
+class TestMultiClipExtractor:
+    @pytest.fixture(autouse=True)
+    def probe(self):
+        probe_result = {'streams': [{'codec_type': 'audio', 'duration': '600.0'}]}
+        with patch('src.probe.mediainfo_json', return_value=probe_result):
+            yield
+
+    @pytest.fixture
+    def mock_decode(self):
+        with patch('src.audio_processor.decode_range') as mock_decode:
+            mock_decode.side_effect = lambda path, start_second, duration: (
+                AudioSegment.silent(duration=duration * 1000, frame_rate=8000)
+            )
+            yield mock_decode
+
+    @pytest.fixture
+    def extractor(self):
+        return MultiClipExtractor(max_workers=2, executor_class=ThreadPoolExecutor, merge_gap=10)
+
+    def test_decodes_each_merged_region_once(self, extractor, mock_decode, tmp_path):
+        requests = [
+            ClipRequest("video", "300", "310", str(tmp_path / "c.wav")),
+            ClipRequest("video", "10", "20", str(tmp_path / "a.wav")),
+            ClipRequest("video", "25", "30", str(tmp_path / "b.wav")),
+        ]
+        results = extractor.run("video.mp4", requests)
+
+        assert all(result.success for result in results)
+        assert [result.request for result in results] == requests
+        assert mock_decode.call_count == 2
+        decoded = sorted(call.args[1] for call in mock_decode.call_args_list)
+        assert decoded == [5, 295]
+        with wave.open(str(tmp_path / "b.wav")) as clip:
+            assert clip.getnframes() / clip.getframerate() == 5
+
+    def test_process_workers_cut_from_shared_audio(self, mock_decode, tmp_path):
+        extractor = MultiClipExtractor(max_workers=2, merge_gap=10)
+        requests = [
+            ClipRequest("video", "10", "12.5", str(tmp_path / "a.wav"), gain=-6),
+            ClipRequest("video", "15", "20", str(tmp_path / "b.wav")),
+        ]
+        results = extractor.run("video.mp4", requests)
+
+        assert all(result.success for result in results)
+        assert mock_decode.call_count == 1
+        with wave.open(str(tmp_path / "a.wav")) as clip:
+            assert clip.getnframes() == 2.5 * 8000
+
+    def test_invalid_ranges_fail_individually(self, extractor, mock_decode, tmp_path):
+        requests = [
+            ClipRequest("video", "10", "700", str(tmp_path / "too_long.wav")),
+            ClipRequest("video", "10", "20", str(tmp_path / "bad.format")),
+            ClipRequest("video", "20", "30", str(tmp_path / "good.wav")),
+        ]
+        reported = []
+        results = extractor.run("video.mp4", requests, on_result=reported.append)
+
+        assert [result.success for result in results] == [False, False, True]
+        assert len(reported) == 3
+        assert mock_decode.call_count == 1
+
+    def test_cached_clips_are_not_decoded_again(self, mock_decode, tmp_path):
+        source = tmp_path / "video.mp4"
+        source.write_bytes(b"video")
+        extractor = MultiClipExtractor(max_workers=2, executor_class=ThreadPoolExecutor,
+                                       clip_cache=ClipCache(str(tmp_path / "clips")))
+        first = [ClipRequest("video", "10", "20", str(tmp_path / "a.wav"))]
+        assert extractor.run(str(source), first)[0].success
+
+        repeat = [
+            ClipRequest("video", "10", "20", str(tmp_path / "again" / "a.wav")),
+            ClipRequest("video", "10", "20", str(tmp_path / "louder.wav"), gain=3),
+        ]
+        results = extractor.run(str(source), repeat)
+        assert all(result.success for result in results)
+        assert os.path.getsize(tmp_path / "again" / "a.wav") == os.path.getsize(tmp_path / "a.wav")
+        assert extractor.clip_cache.hits == 1
+        assert mock_decode.call_count == 2
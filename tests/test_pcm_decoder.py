@@ -0,0 +1,76 @@
+import pytest
+import subprocess
+import sys
+from pydub.generators import Sine
+from src.pcm_decoder import decode_command, decode_range, iter_pcm
+from src.probe import clear_cache
+from unittest.mock import patch
+
+PROBE_RESULT = {
+    'streams': [{'codec_type': 'audio', 'codec_name': 'aac', 'duration': '600.0',
+                 'sample_rate': '8000', 'channels': 2}]
+}
+
+
+class TestDecodeRange:
+    @pytest.fixture(autouse=True)
+    def probe(self):
+        clear_cache()
+        with patch('src.probe.mediainfo_json', return_value=PROBE_RESULT):
+            yield
+        clear_cache()
+
+    @pytest.fixture
+    def audio(self):
+        return Sine(440, sample_rate=8000).to_audio_segment(duration=1000).set_channels(2)
+
+    def test_seeks_before_opening_input(self):
+        command = decode_command("video.mp4", 8000, 2, start_second=3595.0, duration=40.0)
+        assert command.index('-ss') < command.index('-i') < command.index('-t')
+        assert command[command.index('-ss') + 1] == '3595.000000'
+        assert command[command.index('-f') + 1] == 's16le'
+        assert '-ss' not in decode_command("video.mp4", 8000, 2)
+
+    def test_decodes_pcm_from_pipe(self, audio):
+        # A trailing partial frame is dropped
+        result = subprocess.CompletedProcess([], 0, stdout=audio.raw_data + b'\x01', stderr=b'')
+        with patch('src.pcm_decoder.subprocess.run', return_value=result) as mock_run:
+            segment = decode_range("video.mp4", 3595.0, 1.0)
+
+        command = mock_run.call_args[0][0]
+        assert command[command.index('-ar') + 1] == '8000'
+        assert command[command.index('-ac') + 1] == '2'
+        assert (segment.frame_rate, segment.channels, segment.sample_width) == (8000, 2, 2)
+        assert segment.raw_data == audio.raw_data
+
+    def test_failure_raises_error(self):
+        failed = subprocess.CompletedProcess([], 1, stdout=b'', stderr=b'Invalid data found when processing input')
+        with patch('src.pcm_decoder.subprocess.run', return_value=failed):
+            with pytest.raises(ValueError, match="Invalid data found"):
+                decode_range("video.mp4", 0.0, 1.0)
+
+
+class TestIterPCM:
+    def _decoder(self, script):
+        """Stand-in for ffmpeg: a Python process running script."""
+        return patch('src.pcm_decoder.decode_command', return_value=[sys.executable, '-c', script])
+
+    def test_reads_fixed_size_chunks(self):
+        # 1000 stereo frames and half a frame
+        script = "import sys; sys.stdout.buffer.write(bytes(4000) + bytes(2))"
+        with self._decoder(script):
+            chunks = list(iter_pcm("video.mp4", 8000, 2, chunk_frames=300))
+        assert [len(chunk) for chunk in chunks] == [1200, 1200, 1200, 400]
+
+    def test_failure_raises_error(self):
+        script = "import sys; sys.stderr.write('Invalid data found'); sys.exit(1)"
+        with self._decoder(script):
+            with pytest.raises(ValueError, match="Invalid data found"):
+                list(iter_pcm("video.mp4", 8000, 2, chunk_frames=300))
+
+    def test_stopping_early_ends_decoder(self):
+        script = "import sys\nwhile True: sys.stdout.buffer.write(bytes(4096))"
+        with self._decoder(script):
+            chunks = iter_pcm("video.mp4", 8000, 2, chunk_frames=300)
+            assert len(next(chunks)) == 1200
+            chunks.close()
@@ -0,0 +1,112 @@
+import pytest
+import os
+import subprocess
+from pydub.generators import Sine
+from src.pcm_sidecar import PCMSidecar
+from src.probe import clear_cache
+from unittest.mock import patch
+
+PROBE_RESULT = {
+    'streams': [{'codec_type': 'audio', 'codec_name': 'aac', 'duration': '3.0',
+                 'sample_rate': '8000', 'channels': 2}]
+}
+
+
+class TestPCMSidecar:
+    @pytest.fixture(autouse=True)
+    def empty_probe_cache(self):
+        clear_cache()
+        yield
+        clear_cache()
+
+    @pytest.fixture
+    def audio(self):
+        return Sine(440, sample_rate=8000).to_audio_segment(duration=3000).set_channels(2)
+
+    @pytest.fixture
+    def source(self, tmp_path):
+        path = tmp_path / "video.mp4"
+        path.write_bytes(b"video")
+        return str(path)
+
+    @pytest.fixture
+    def ffmpeg(self, audio):
+        """Stand-in for ffmpeg that writes the decoded samples to stdout."""
+        def run(command, stdout, stderr):
+            stdout.write(audio.raw_data)
+            return subprocess.CompletedProcess(command, 0, stderr=b'')
+
+        with patch('src.probe.mediainfo_json', return_value=PROBE_RESULT), \
+                patch('src.pcm_sidecar.subprocess.run', side_effect=run) as mock_run:
+            yield mock_run
+
+    def test_decodes_once_then_maps(self, source, ffmpeg):
+        PCMSidecar.for_file(source).close()
+        sidecar = PCMSidecar.for_file(source)
+
+        assert ffmpeg.call_count == 1
+        command = ffmpeg.call_args[0][0]
+        assert command[command.index('-ar') + 1] == '8000'
+        assert command[command.index('-ac') + 1] == '2'
+        assert os.path.exists(source + PCMSidecar.SIDECAR_SUFFIX)
+        assert (sidecar.frame_rate, sidecar.channels, sidecar.duration) == (8000, 2, 3.0)
+        sidecar.close()
+
+    def test_segments_match_slicing(self, audio, source, ffmpeg):
+        sidecar = PCMSidecar.for_file(source)
+        for start_ms, end_ms in [(0, 3000), (1, 999), (1234, 2345), (2990, 3000)]:
+            segment = sidecar.segment(start_ms, end_ms)
+            assert isinstance(segment.raw_data, memoryview)
+            assert bytes(segment.raw_data) == audio[start_ms:end_ms].raw_data
+        del segment
+        sidecar.close()
+
+    def test_rebuilt_when_source_changes(self, source, ffmpeg):
+        PCMSidecar.for_file(source).close()
+        with open(source, 'ab') as f:
+            f.write(b"more")
+        PCMSidecar.for_file(source).close()
+        assert ffmpeg.call_count == 2
+
+    def test_rebuilt_for_other_format_version(self, source, ffmpeg):
+        PCMSidecar.for_file(source).close()
+        with patch.object(PCMSidecar, 'FORMAT_VERSION', PCMSidecar.FORMAT_VERSION + 1):
+            PCMSidecar.for_file(source).close()
+        assert ffmpeg.call_count == 2
+
+    def test_corrupt_header_is_rebuilt(self, source, ffmpeg):
+        with open(source + PCMSidecar.SIDECAR_SUFFIX, 'wb') as f:
+            f.write(b"junk")
+        PCMSidecar.for_file(source).close()
+        assert ffmpeg.call_count == 1
+
+    def test_decode_failure_leaves_no_sidecar(self, source, tmp_path):
+        failed = subprocess.CompletedProcess([], 1, stderr=b'Invalid data found when processing input')
+        with patch('src.probe.mediainfo_json', return_value=PROBE_RESULT), \
+                patch('src.pcm_sidecar.subprocess.run', return_value=failed):
+            with pytest.raises(ValueError, match="Invalid data found"):
+                PCMSidecar.for_file(source)
+        assert os.listdir(tmp_path) == ["video.mp4"]
+
+    def test_overlapping_builds_use_separate_temp_files(self, audio, source):
+        sidecar_path = source + PCMSidecar.SIDECAR_SUFFIX
+        stat = os.stat(source)
+        calls = []
+
+        def run(command, stdout, stderr):
+            calls.append(command)
+            if len(calls) == 1:
+                # Another build of the same sidecar finishes while this one decodes
+                PCMSidecar.build(source, sidecar_path, stat.st_size, stat.st_mtime_ns)
+            stdout.write(audio.raw_data)
+            return subprocess.CompletedProcess(command, 0, stderr=b'')
+
+        with patch('src.probe.mediainfo_json', return_value=PROBE_RESULT), \
+                patch('src.pcm_sidecar.subprocess.run', side_effect=run):
+            PCMSidecar.build(source, sidecar_path, stat.st_size, stat.st_mtime_ns)
+
+        assert len(calls) == 2
+        assert sorted(os.listdir(os.path.dirname(source))) == ["video.mp4", "video.mp4.pcm"]
+        sidecar = PCMSidecar.load(sidecar_path, stat.st_size, stat.st_mtime_ns)
+        assert sidecar.duration == 3.0
+        sidecar.close()
@@ -0,0 +1,130 @@
+import pytest
+import os
+import threading
+from src.playback import NullBackend, PlaysoundBackend, RecordingBackend, StreamingBackend
+from pydub import AudioSegment
+from unittest.mock import patch
+
+class BlockingSink(RecordingBackend):
+    """Recording backend that waits for permission before each block."""
+
+    def __init__(self):
+        super().__init__()
+        self.allow = threading.Semaphore(0)
+
+    def _write(self, sink, block):
+        self.allow.acquire()
+        super()._write(sink, block)
+
+
+class TestPlayback:
+    @pytest.fixture
+    def segment(self):
+        # One second of 16-bit stereo with a distinct value per frame
+        frames = b''.join(i.to_bytes(2, 'little') * 2 for i in range(8000))
+        return AudioSegment(data=frames, sample_width=2, frame_rate=8000, channels=2)
+
+    def test_streams_whole_segment(self, segment):
+        backend = RecordingBackend()
+        backend.play(segment)
+        backend.wait()
+        assert bytes(backend.recorded) == segment.raw_data
+        assert not backend.is_playing
+
+    def test_play_from_offset(self, segment):
+        backend = RecordingBackend()
+        backend.play(segment, start=0.5)
+        backend.wait()
+        assert bytes(backend.recorded) == segment.raw_data[len(segment.raw_data) // 2:]
+
+    def test_play_does_not_block(self, segment):
+        backend = BlockingSink()
+        backend.play(segment)
+        assert backend.is_playing
+        assert len(backend.recorded) == 0
+
+        for _ in range(100):
+            backend.allow.release()
+        backend.wait()
+        assert bytes(backend.recorded) == segment.raw_data
+
+    def test_stop(self, segment):
+        backend = BlockingSink()
+        backend.play(segment)
+        backend.allow.release()
+
+        stopper = threading.Thread(target=backend.stop)
+        stopper.start()
+        backend.allow.release()
+        stopper.join()
+
+        assert not backend.is_playing
+        assert 0 < len(backend.recorded) < len(segment.raw_data)
+
+    def test_seek(self, segment):
+        backend = BlockingSink()
+        backend.play(segment)
+        backend.seek(0.9)
+        for _ in range(100):
+            backend.allow.release()
+        backend.wait()
+
+        # Seeking is frame aligned and the remainder is played from there
+        block_size = int(8000 * StreamingBackend.BLOCK_SECONDS) * segment.frame_width
+        offset = int(0.9 * 8000) * segment.frame_width
+        assert bytes(backend.recorded) in (
+            segment.raw_data[offset:],
+            segment.raw_data[:block_size] + segment.raw_data[offset:]
+        )
+
+    def test_seek_before_play(self, segment):
+        backend = RecordingBackend()
+        backend.seek(0.5)
+        backend.play(segment)
+        backend.wait()
+        assert bytes(backend.recorded) == segment.raw_data
+
+    def test_null_backend(self, segment):
+        backend = NullBackend()
+        backend.play(segment)
+        backend.wait()
+        assert not backend.is_playing
+
+    @patch('playsound.playsound')
+    def test_playsound_backend_writes_single_preview(self, mock_playsound, segment, tmp_path):
+        backend = PlaysoundBackend(str(tmp_path))
+        backend.play(segment)
+        backend.wait()
+        backend.play(segment)
+        backend.wait()
+
+        assert mock_playsound.call_count == 2
+        assert len(os.listdir(tmp_path)) == 1
+
+    def test_playsound_backend_waits_for_previous_preview(self, segment, tmp_path):
+        release = threading.Event()
+        played = []
+        # Whether each file was still there when it finished playing
+        kept = []
+
+        def playsound(path):
+            played.append(path)
+            release.wait(5)
+            kept.append(os.path.exists(path))
+
+        backend = PlaysoundBackend(str(tmp_path))
+        assert not backend.can_stop
+        with patch('playsound.playsound', new=playsound):
+            backend.play(segment)
+            second = threading.Thread(target=backend.play, args=(segment,))
+            second.start()
+            second.join(0.1)
+            # Still waiting for the first preview to end
+            assert second.is_alive()
+            assert len(played) == 1
+
+            release.set()
+            second.join(5)
+            backend.wait()
+        assert len(played) == 2
+        assert kept == [True, True]
@@ -0,0 +1,75 @@
+import pytest
+import os
+from src.probe import MediaInfo, clear_cache, probe_media
+from unittest.mock import patch
+
+PROBE_RESULT = {
+    'streams': [
+        {'codec_type': 'video', 'codec_name': 'h264', 'duration': '100.0'},
+        {'codec_type': 'audio', 'codec_name': 'aac', 'duration': '95.1234',
+         'sample_rate': '48000', 'channels': 2},
+    ],
+    'format': {'duration': '100.0'}
+}
+
+
+class TestProbeMedia:
+    @pytest.fixture(autouse=True)
+    def empty_cache(self):
+        clear_cache()
+        yield
+        clear_cache()
+
+    @pytest.fixture
+    def source(self, tmp_path):
+        path = tmp_path / "video.mp4"
+        path.write_bytes(b"video")
+        return str(path)
+
+    def test_reads_first_audio_stream(self, source):
+        with patch('src.probe.mediainfo_json', return_value=PROBE_RESULT):
+            info = probe_media(source)
+        assert info == MediaInfo(duration_ms=95123, codec='aac', sample_rate=48000, channels=2)
+        assert info.duration == 95.123
+
+    def test_falls_back_to_format_duration(self, source):
+        probe_result = {'streams': [{'codec_type': 'audio', 'codec_name': 'opus'}], 'format': {'duration': '12.5'}}
+        with patch('src.probe.mediainfo_json', return_value=probe_result):
+            info = probe_media(source)
+        assert info.duration_ms == 12500
+        assert info.sample_rate is None and info.channels is None
+
+    def test_results_are_cached_per_file(self, source):
+        with patch('src.probe.mediainfo_json', return_value=PROBE_RESULT) as mock_probe:
+            assert probe_media(source) is probe_media(source)
+            assert mock_probe.call_count == 1
+
+            # A changed file is probed again
+            with open(source, 'ab') as f:
+                f.write(b"more")
+            probe_media(source)
+            assert mock_probe.call_count == 2
+
+    def test_missing_file_is_not_cached(self, tmp_path):
+        path = str(tmp_path / "missing.mp4")
+        with patch('src.probe.mediainfo_json', return_value=PROBE_RESULT) as mock_probe:
+            probe_media(path)
+            probe_media(path)
+        assert mock_probe.call_count == 2
+        assert not os.path.exists(path)
+
+    def test_no_audio_stream_raises_error(self, source):
+        with patch('src.probe.mediainfo_json', return_value={'streams': [{'codec_type': 'video'}]}):
+            with pytest.raises(ValueError, match="No audio stream"):
+                probe_media(source)
+
+    def test_unknown_duration_raises_error(self, source):
+        probe_result = {'streams': [{'codec_type': 'audio'}], 'format': {'duration': 'N/A'}}
+        with patch('src.probe.mediainfo_json', return_value=probe_result):
+            with pytest.raises(ValueError, match="duration"):
+                probe_media(source)
+
+    def test_probe_failure_raises_value_error(self, source):
+        with patch('src.probe.mediainfo_json', side_effect=OSError("ffprobe not found")):
+            with pytest.raises(ValueError, match="Failed to probe media file"):
+                probe_media(source)
@@ -0,0 +1,119 @@
+import pytest
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from src.scratch import ScratchSpace, get_scratch_space, set_scratch_space, start_scratch_space
+
+
+class TestScratchSpace:
+    @pytest.fixture
+    def space(self, tmp_path):
+        return ScratchSpace(str(tmp_path / "scratch"), quota_bytes=1000)
+
+    def _write(self, path, size):
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+
+    def test_jobs_get_private_directories(self, space):
+        first = space.job('download')
+        second = space.job('download')
+        assert first.path != second.path
+        assert os.path.dirname(first.path) == space.root
+
+        self._write(second.file("clip.mp4"), 10)
+        assert os.listdir(first.path) == []
+        first.cleanup()
+        assert not os.path.exists(first.path)
+        assert not os.path.exists(first.path + ScratchSpace.OWNER_SUFFIX)
+        assert os.path.exists(second.file("clip.mp4"))
+
+    def test_directory_removed_when_collected(self, space):
+        job = space.job()
+        path = job.path
+        del job
+        assert not os.path.exists(path)
+
+    def test_root_from_environment(self, tmp_path, monkeypatch):
+        monkeypatch.setenv(ScratchSpace.ROOT_ENVIRONMENT_VARIABLE, str(tmp_path / "shm"))
+        assert ScratchSpace().root == str(tmp_path / "shm")
+
+    def test_reserve_waits_for_quota(self, space, monkeypatch):
+        monkeypatch.setattr(ScratchSpace, 'POLL_SECONDS', 0.01)
+        job = space.job()
+        self._write(job.file("first.mp4"), 400)
+        held = space.reserve(500)
+
+        acquired = threading.Event()
+
+        def reserve():
+            with space.reserve(300):
+                acquired.set()
+
+        thread = threading.Thread(target=reserve)
+        thread.start()
+        # 400 on disk + 500 reserved + 300 exceeds the quota of 1000
+        assert not acquired.wait(0.1)
+        held.release()
+        thread.join(1)
+        assert acquired.is_set()
+
+    def test_files_removed_by_another_process_free_space(self, space, monkeypatch):
+        monkeypatch.setattr(ScratchSpace, 'POLL_SECONDS', 0.01)
+        job = space.job()
+        self._write(job.file("first.mp4"), 900)
+        timer = threading.Timer(0.05, os.remove, [job.file("first.mp4")])
+        timer.start()
+        with space.reserve(500, timeout=2):
+            pass
+        timer.join()
+
+    def test_reserve_times_out(self, space):
+        job = space.job()
+        self._write(job.file("first.mp4"), 900)
+        with pytest.raises(ValueError, match="Timed out"):
+            space.reserve(200, timeout=0.05)
+        with pytest.raises(ValueError, match="exceeds"):
+            space.reserve(2000)
+
+    def test_sweep_removes_only_orphans(self, space):
+        live = space.job()
+        # A process that has exited
+        finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                                  capture_output=True, text=True, check=True)
+        orphan = space.job()
+        with open(orphan.path + ScratchSpace.OWNER_SUFFIX) as f:
+            owner = json.load(f)
+        owner['pid'] = int(finished.stdout)
+        with open(orphan.path + ScratchSpace.OWNER_SUFFIX, 'w') as f:
+            json.dump(owner, f)
+
+        # Without an owner file, only removed once old
+        unknown = os.path.join(space.root, ScratchSpace.DIR_PREFIX + "unknown")
+        stale = os.path.join(space.root, ScratchSpace.DIR_PREFIX + "stale")
+        os.makedirs(unknown)
+        os.makedirs(stale)
+        old = time.time() - ScratchSpace.ORPHAN_MAX_AGE_SECONDS - 60
+        os.utime(stale, (old, old))
+
+        assert space.sweep() == 2
+        assert os.path.exists(live.path)
+        assert os.path.exists(unknown)
+        assert not os.path.exists(orphan.path)
+        assert not os.path.exists(orphan.path + ScratchSpace.OWNER_SUFFIX)
+        assert not os.path.exists(stale)
+
+    def test_start_sweeps_and_installs_space(self, tmp_path):
+        stale = tmp_path / (ScratchSpace.DIR_PREFIX + "stale")
+        stale.mkdir()
+        old = time.time() - ScratchSpace.ORPHAN_MAX_AGE_SECONDS - 60
+        os.utime(stale, (old, old))
+        try:
+            space = start_scratch_space(str(tmp_path), quota_bytes=1000)
+            assert get_scratch_space() is space
+            assert space.quota_bytes == 1000
+            assert not stale.exists()
+        finally:
+            set_scratch_space(None)
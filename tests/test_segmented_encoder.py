@@ -0,0 +1,120 @@
+import pytest
+import hashlib
+import os
+import subprocess
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from pydub import AudioSegment
+from src.encoding_profiles import get_profile
+from src.segmented_encoder import SegmentedEncoder, mp3_samples_per_frame, split_mp3_frames
+from unittest.mock import patch
+
+# MPEG-2.5 Layer III, 8 kbps, 8000 Hz, mono: 72 byte frames of 576 samples
+FRAME_HEADER = bytes([0xFF, 0xE3, 0x18, 0xC0])
+FRAME_LENGTH = 72
+ENCODER_DELAY = 576
+
+
+def fake_lame(command, input, capture_output):
+    """
+    Stand-in for ffmpeg/LAME: frame j depends only on the input samples it
+    would cover, [j * 576 - delay, (j + 1) * 576), and one frame is flushed
+    after the input ends, like the real encoder.
+    """
+    samples = np.frombuffer(bytes(input), dtype='<i2')
+    spf = mp3_samples_per_frame(int(command[command.index('-ar') + 1]))
+    frame_count = -(-(len(samples) + ENCODER_DELAY) // spf) + 1
+    output = b''
+    for j in range(frame_count):
+        window = samples[max(0, j * spf - ENCODER_DELAY):(j + 1) * spf].tobytes()
+        payload = hashlib.blake2b(window).digest()
+        output += FRAME_HEADER + payload + bytes(FRAME_LENGTH - 4 - len(payload))
+    return subprocess.CompletedProcess(command, 0, stdout=output, stderr=b'')
+
+
+class TestSplitMp3Frames:
+    def test_splits_on_frame_lengths(self):
+        # MPEG-1, 128 kbps, 44.1 kHz: 417 bytes, 418 with the padding bit
+        first = bytes([0xFF, 0xFB, 0x90, 0x00]) + bytes(413)
+        second = bytes([0xFF, 0xFB, 0x92, 0x00]) + bytes(414)
+        assert [len(frame) for frame in split_mp3_frames(first + second)] == [417, 418]
+
+    def test_rejects_other_data(self):
+        with pytest.raises(ValueError, match="sync"):
+            split_mp3_frames(b'ID3\x04' + bytes(100))
+        with pytest.raises(ValueError, match="Truncated"):
+            split_mp3_frames(FRAME_HEADER + bytes(10))
+
+    def test_samples_per_frame(self):
+        assert mp3_samples_per_frame(44100) == 1152
+        assert mp3_samples_per_frame(16000) == 576
+        assert mp3_samples_per_frame(96000) is None
+
+
+class TestSegmentedEncoder:
+    @pytest.fixture
+    def audio(self):
+        # 100 s of noise, so every frame's content is distinct
+        samples = np.random.default_rng(1).integers(-2 ** 15, 2 ** 15, 800_123, dtype=np.int16)
+        return AudioSegment(data=samples.tobytes(), sample_width=2, frame_rate=8000, channels=1)
+
+    @pytest.fixture
+    def encoder(self):
+        return SegmentedEncoder(max_workers=3, executor_class=ThreadPoolExecutor)
+
+    @pytest.fixture
+    def calls(self):
+        """
+        Runs fake_lame instead of ffmpeg and records (command, input frames)
+        per call. A Mock would keep the inputs, which are views into shared
+        memory, alive.
+        """
+        calls = []
+
+        def run(command, input, capture_output):
+            calls.append((command, len(input) // 2))
+            return fake_lame(command, input, capture_output)
+
+        with patch('src.segmented_encoder.subprocess.run', new=run):
+            yield calls
+
+    def test_joined_chunks_match_single_encode(self, audio, encoder, calls, tmp_path):
+        output_path = str(tmp_path / "clip.mp3")
+        encoder.encode(audio, output_path, ['-b:a', '8k'])
+        assert len(calls) == 3
+
+        with open(output_path, 'rb') as f:
+            joined = f.read()
+        single = fake_lame(['-ar', '8000'], audio.raw_data, True).stdout
+        assert joined == single
+
+    def test_chunks_are_self_contained_raw_frames(self, audio, encoder, calls, tmp_path):
+        encoder.encode(audio, str(tmp_path / "clip.mp3"), ['-b:a', '8k'])
+
+        command = calls[0][0]
+        assert command[command.index('-reservoir') + 1] == '0'
+        assert command[command.index('-write_xing') + 1] == '0'
+        assert command[command.index('-id3v2_version') + 1] == '0'
+        assert command.index('-b:a') < command.index('-acodec')
+        # Only the last chunk ends off a frame boundary
+        sizes = [size for _, size in calls]
+        assert sum(size % 576 != 0 for size in sizes) == 1
+        assert sum(sizes) == len(audio.get_array_of_samples()) + (2 * 8 + 2 * 4) * 576
+
+    def test_supports_long_cbr_mp3_only(self, audio, encoder):
+        default = get_profile('default')
+        assert encoder.supports(audio, 'mp3', default)
+        assert not encoder.supports(audio, 'ogg', default)
+        assert not encoder.supports(audio[:45000], 'mp3', default)
+        # VBR
+        assert not encoder.supports(audio, 'mp3', get_profile('archive'))
+        assert not encoder.supports(audio.set_frame_rate(7000), 'mp3', default)
+        assert not SegmentedEncoder(max_workers=1).supports(audio, 'mp3', default)
+
+    def test_chunk_failure_raises_error(self, audio, encoder, tmp_path):
+        failed = subprocess.CompletedProcess([], 1, stdout=b'', stderr=b'Unknown encoder')
+        output_path = str(tmp_path / "clip.mp3")
+        with patch('src.segmented_encoder.subprocess.run', new=lambda *args, **kwargs: failed):
+            with pytest.raises(ValueError, match="Unknown encoder"):
+                encoder.encode(audio, output_path)
+        assert not os.path.exists(output_path)
@@ -0,0 +1,215 @@
+import pytest
+import asyncio
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from src.service import ClipService, parse_job
+from src.youtube_downloader import YoutubeDownloader
+from pydub import AudioSegment
+from unittest.mock import patch
+
+URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+class TestParseJob:
+    def test_normalises_ranges(self):
+        url, ranges, gain, file_format, profile = parse_job({
+            'url': URL,
+            'ranges': [{'start': '1:30', 'end': 95, 'title': 'Chorus'}],
+            'format': 'WAV',
+        })
+        assert ranges == [{'start': 90, 'end': 95, 'title': 'Chorus', 'gain': 0}]
+        assert (url, gain, file_format, profile) == (URL, 0, 'wav', 'default')
+
+    @pytest.mark.parametrize("payload", [
+        [],
+        {'ranges': [{'start': 0, 'end': 1}]},
+        {'url': URL, 'ranges': []},
+        {'url': URL, 'ranges': [{'start': 0}]},
+        {'url': URL, 'ranges': [{'start': 5, 'end': 1}]},
+        {'url': URL, 'ranges': [{'start': 0, 'end': 1}], 'format': 'flac'},
+        {'url': URL, 'ranges': [{'start': 0, 'end': 1}], 'profile': 'lossless-ish'},
+    ])
+    def test_rejects_malformed_jobs(self, payload):
+        with pytest.raises(ValueError):
+            parse_job(payload)
+
+
+class TestClipService:
+    @pytest.fixture
+    def downloader(self):
+        downloader = YoutubeDownloader()
+        release = threading.Event()
+        release.set()
+        with patch.object(downloader, 'download_video') as mock_download_video:
+            def download(url, on_progress=None):
+                release.wait(5)
+                return "video.mp4"
+            mock_download_video.side_effect = download
+            downloader.release = release
+            yield downloader
+
+    @pytest.fixture(autouse=True)
+    def media(self):
+        probe_result = {'streams': [{'codec_type': 'audio', 'duration': '60.0'}]}
+        with patch('src.probe.mediainfo_json', return_value=probe_result), \
+                patch('src.audio_processor.decode_range') as mock_decode:
+            mock_decode.side_effect = lambda path, start_second, duration: (
+                AudioSegment.silent(duration=duration * 1000, frame_rate=8000)
+            )
+            yield
+
+    def _run(self, downloader, tmp_path, scenario):
+        """Start a service on a free port and run scenario(service, request) against it."""
+        async def main():
+            service = ClipService(downloader, str(tmp_path / "out"), workers=2,
+                                  encoder_workers=2, executor_class=ThreadPoolExecutor)
+            server = await service.start(port=0)
+            port = server.sockets[0].getsockname()[1]
+
+            def request(method, path, payload=None):
+                data = json.dumps(payload).encode() if payload is not None else None
+                http_request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=data, method=method)
+                try:
+                    with urllib.request.urlopen(http_request, timeout=5) as response:
+                        return response.status, response.read()
+                except urllib.error.HTTPError as e:
+                    return e.code, e.read()
+
+            async def call(method, path, payload=None):
+                return await asyncio.to_thread(request, method, path, payload)
+
+            try:
+                await scenario(service, call)
+            finally:
+                await service.stop()
+        asyncio.run(main())
+
+    async def _wait_finished(self, call, job_id):
+        for _ in range(200):
+            status, body = await call('GET', f"/jobs/{job_id}")
+            job = json.loads(body)
+            if job['status'] not in ('queued', 'running'):
+                return job
+            await asyncio.sleep(0.01)
+        raise AssertionError("Job did not finish")
+
+    def test_job_runs_and_clips_can_be_downloaded(self, downloader, tmp_path):
+        async def scenario(service, call):
+            status, body = await call('POST', '/jobs', {
+                'url': URL,
+                'ranges': [{'start': '0:01', 'end': '0:03', 'title': 'Intro'}, {'start': 10, 'end': 11}],
+                'format': 'wav',
+            })
+            assert status == 202
+            job = await self._wait_finished(call, json.loads(body)['id'])
+
+            assert job['status'] == 'done'
+            assert [clip['success'] for clip in job['clips']] == [True, True]
+            status, clip = await call('GET', job['clips'][0]['download'])
+            assert status == 200
+            assert clip[:4] == b'RIFF'
+
+            status, _ = await call('GET', f"/jobs/{job['id']}/clips/5")
+            assert status == 404
+        self._run(downloader, tmp_path, scenario)
+
+    def test_identical_in_flight_jobs_are_deduplicated(self, downloader, tmp_path):
+        downloader.release.clear()
+        payload = {'url': URL, 'ranges': [{'start': 1, 'end': 2}], 'format': 'wav'}
+
+        async def scenario(service, call):
+            first_status, first = await call('POST', '/jobs', payload)
+            # Same video under another URL form
+            second_status, second = await call('POST', '/jobs', {**payload, 'url': "https://youtu.be/dQw4w9WgXcQ"})
+            other_status, _ = await call('POST', '/jobs', {**payload, 'format': 'mp3'})
+            assert (first_status, second_status, other_status) == (202, 200, 202)
+            assert json.loads(second)['id'] == json.loads(first)['id']
+            assert json.loads(second)['deduplicated']
+
+            status, metrics = await call('GET', '/metrics')
+            assert status == 200
+            assert b"vid2audioclip_service_jobs_deduplicated_total 1" in metrics
+
+            downloader.release.set()
+            job = await self._wait_finished(call, json.loads(first)['id'])
+            assert job['status'] == 'done'
+        self._run(downloader, tmp_path, scenario)
+
+    def test_jobs_for_same_video_share_download(self, downloader, tmp_path):
+        downloader.release.clear()
+
+        async def scenario(service, call):
+            ids = []
+            for url, start in ((URL, 1), ("https://youtu.be/dQw4w9WgXcQ", 5)):
+                status, body = await call('POST', '/jobs', {'url': url, 'ranges': [{'start': start, 'end': 9}],
+                                                            'format': 'wav'})
+                assert status == 202
+                ids.append(json.loads(body)['id'])
+            # Both jobs are running, one waiting for the other's download
+            await asyncio.sleep(0.05)
+            downloader.release.set()
+
+            for job_id in ids:
+                assert (await self._wait_finished(call, job_id))['status'] == 'done'
+            assert downloader.download_video.call_count == 1
+        self._run(downloader, tmp_path, scenario)
+
+    def test_uncached_source_removed_after_last_job(self, downloader, tmp_path):
+        downloader.release.clear()
+        video_path = os.path.join(downloader.temp_dir, "dQw4w9WgXcQ_18.mp4")
+
+        def download(url, on_progress=None):
+            downloader.release.wait(5)
+            for path in (video_path, video_path + ".pcm"):
+                with open(path, 'wb') as f:
+                    f.write(b"video")
+            return video_path
+        downloader.download_video.side_effect = download
+
+        async def scenario(service, call):
+            ids = []
+            for url, start in ((URL, 1), ("https://youtu.be/dQw4w9WgXcQ", 5)):
+                status, body = await call('POST', '/jobs', {'url': url, 'ranges': [{'start': start, 'end': 9}],
+                                                            'format': 'wav'})
+                ids.append(json.loads(body)['id'])
+            await asyncio.sleep(0.05)
+            downloader.release.set()
+
+            for job_id in ids:
+                assert (await self._wait_finished(call, job_id))['status'] == 'done'
+            assert os.listdir(downloader.temp_dir) == []
+        self._run(downloader, tmp_path, scenario)
+
+    def test_full_queue_and_cancellation(self, downloader, tmp_path):
+        downloader.release.clear()
+
+        async def scenario(service, call):
+            service._queue._maxsize = 1
+            jobs = []
+            # Two jobs start running (one per worker), the third waits in the queue
+            for start in range(3):
+                status, body = await call('POST', '/jobs', {'url': URL, 'ranges': [{'start': start, 'end': 20}]})
+                assert status == 202
+                jobs.append(json.loads(body)['id'])
+                await asyncio.sleep(0.05)
+
+            status, body = await call('POST', '/jobs', {'url': URL, 'ranges': [{'start': 5, 'end': 20}]})
+            assert status == 503
+
+            status, body = await call('DELETE', f"/jobs/{jobs[2]}")
+            assert (status, json.loads(body)['status']) == (200, 'cancelled')
+            status, _ = await call('DELETE', f"/jobs/{jobs[0]}")
+            assert status == 409
+            downloader.release.set()
+        self._run(downloader, tmp_path, scenario)
+
+    def test_bad_requests(self, downloader, tmp_path):
+        async def scenario(service, call):
+            assert (await call('POST', '/jobs', {'url': URL}))[0] == 400
+            assert (await call('GET', '/jobs/unknown'))[0] == 404
+            assert (await call('GET', '/health'))[0] == 200
+        self._run(downloader, tmp_path, scenario)
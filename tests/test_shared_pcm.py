@@ -0,0 +1,82 @@
+import pytest
+import hashlib
+from concurrent.futures import Future, ProcessPoolExecutor
+from pydub import AudioSegment
+from pydub.generators import Sine
+from src.shared_pcm import SharedPCM, segment_from_buffer
+
+
+def digest_range(handle, start_ms, end_ms):
+    """Runs in a worker process."""
+    shared = SharedPCM.attach(handle)
+    try:
+        return hashlib.sha256(shared.segment(start_ms, end_ms).raw_data).hexdigest()
+    finally:
+        shared.close()
+
+
+class TestSharedPCM:
+    @pytest.fixture
+    def audio(self):
+        return Sine(440).to_audio_segment(duration=3000).set_frame_rate(44100).set_channels(2)
+
+    @pytest.fixture
+    def shared(self, audio):
+        shared = SharedPCM.from_segment(audio, start_ms=60000)
+        yield shared
+        shared.close()
+        shared.unlink()
+
+    def test_segments_match_slicing_a_copy(self, audio, shared):
+        attached = SharedPCM.attach(shared.handle)
+        for start_ms, end_ms in [(60000, 63000), (60001, 60999), (61234, 62345), (62990, 63000)]:
+            segment = attached.segment(start_ms, end_ms)
+            expected = audio[start_ms - 60000:end_ms - 60000]
+            assert bytes(segment.raw_data) == expected.raw_data
+            assert (segment.frame_rate, segment.channels) == (44100, 2)
+        del segment
+        attached.close()
+
+    def test_segments_are_views(self, shared):
+        segment = shared.segment(60500, 61500)
+        assert isinstance(segment.raw_data, memoryview)
+        # Effects still produce ordinary copies
+        assert isinstance(segment.apply_gain(-3).raw_data, bytes)
+
+    def test_views_behave_like_copies(self, audio, shared):
+        segment = shared.segment(60100, 60600)
+        expected = audio[100:600]
+        assert segment.get_array_of_samples() == expected.get_array_of_samples()
+        assert [channel.raw_data for channel in segment.split_to_mono()] == \
+            [channel.raw_data for channel in expected.split_to_mono()]
+        assert (segment + segment).raw_data == (expected + expected).raw_data
+        assert (segment * 2).raw_data == (expected * 2).raw_data
+        assert hash(segment) == hash(expected)
+        assert isinstance(segment.detach().raw_data, bytes)
+        del segment
+
+    def test_short_buffer_raises_error(self, audio):
+        data = memoryview(audio.raw_data)
+        # Rounding at the end is padded, like slicing
+        assert len(segment_from_buffer(data, 2500, 3001, 2, 44100, 2)) == 501
+        with pytest.raises(ValueError, match="past the end"):
+            segment_from_buffer(data, 2500, 3010, 2, 44100, 2)
+
+    def test_workers_attach_by_name(self, audio, shared):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            digests = list(executor.map(digest_range, [shared.handle] * 2, [60000, 61000], [61000, 63000]))
+        assert digests == [
+            hashlib.sha256(audio[0:1000].raw_data).hexdigest(),
+            hashlib.sha256(audio[1000:3000].raw_data).hexdigest(),
+        ]
+
+    def test_released_when_all_futures_finish(self, audio):
+        shared = SharedPCM.from_segment(audio)
+        futures = [Future(), Future()]
+        shared.release_when_done(futures)
+
+        futures[0].set_result(1.0)
+        SharedPCM.attach(shared.handle).close()
+        futures[1].set_exception(ValueError("encode failed"))
+        with pytest.raises(ValueError, match="Failed to attach"):
+            SharedPCM.attach(shared.handle)
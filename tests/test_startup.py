@@ -0,0 +1,47 @@
+import pytest
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Loaded on demand by the stage that needs them, never at startup
+HEAVY_MODULES = ['pytubefix', 'numpy', 'pydub', 'asyncio', 'tkinter']
+# Cumulative import time of src.cli; pulling in any of the heavy modules
+# above takes it well past this
+IMPORT_BUDGET_SECONDS = 0.3
+
+
+def run_python(code: str, *options: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *options, '-c', code], cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+
+
+def loaded_modules(module: str) -> set[str]:
+    result = run_python(f"import sys, {module}; print(' '.join(sys.modules))")
+    return {name.split('.')[0] for name in result.stdout.split()}
+
+
+def test_cli_import_skips_heavy_dependencies():
+    assert loaded_modules('src.cli').isdisjoint(HEAVY_MODULES)
+
+
+def test_gui_import_only_loads_tkinter():
+    pytest.importorskip('tkinter')
+    heavy = set(HEAVY_MODULES) - {'tkinter'}
+    assert loaded_modules('src.gui').isdisjoint(heavy)
+
+
+def test_cli_import_time_within_budget():
+    timings = []
+    for _ in range(3):
+        # -X importtime reports "import time: self | cumulative | module" in microseconds
+        stderr = run_python('import src.cli', '-X', 'importtime').stderr
+        line = next(line for line in stderr.splitlines() if line.rstrip().endswith('| src.cli'))
+        timings.append(int(line.split('|')[1]) / 1e6)
+    assert min(timings) < IMPORT_BUDGET_SECONDS
+
+
+def test_help_runs():
+    result = subprocess.run([sys.executable, 'main.py', '--help'], cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0
+    assert '--batch' in result.stdout
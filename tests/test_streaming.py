@@ -0,0 +1,73 @@
+import pytest
+import io
+from array import array
+from src.streaming import StreamingAudioProcessor
+from src.playback import NullBackend
+from unittest.mock import Mock, patch
+
+class TestStreamingAudioProcessor:
+    FRAME_RATE = 1000
+
+    @pytest.fixture
+    def processor(self):
+        probe_result = {
+            'streams': [{'codec_type': 'audio', 'duration': '36000.0', 'sample_rate': '1000', 'channels': '1'}],
+            'format': {'duration': '36000.0'}
+        }
+        with patch('src.probe.mediainfo_json', return_value=probe_result):
+            yield StreamingAudioProcessor("long_video.mp4", playback=NullBackend())
+
+    def _decode(self, processor, pcm: bytes, block_seconds: float = 1.0) -> list[bytes]:
+        decoder = Mock()
+        decoder.stdout = io.BufferedReader(io.BytesIO(pcm))
+        decoder.poll.return_value = 0
+        decoder.wait.return_value = 0
+        with patch('src.pcm_decoder.subprocess.Popen', return_value=decoder) as mock_popen:
+            blocks = list(processor.iter_pcm_blocks(block_seconds))
+        self.command = mock_popen.call_args[0][0]
+        return blocks
+
+    def test_init_probes_format(self, processor):
+        assert processor.frame_rate == 1000
+        assert processor.channels == 1
+        assert processor.end_time == 36000
+
+    def test_blocks_are_fixed_size(self, processor):
+        processor.set_time_range("1:00:00", "1:00:02.5")
+        pcm = array('h', [100] * 2500).tobytes()
+        blocks = self._decode(processor, pcm)
+
+        assert [len(block) for block in blocks] == [2000, 2000, 1000]
+        assert b''.join(blocks) == pcm
+        assert self.command[self.command.index('-ss') + 1] == "3600.000000"
+        assert self.command[self.command.index('-t') + 1] == "2.500000"
+        # Only the probed stream, and never reading the terminal
+        assert self.command[self.command.index('-map') + 1] == '0:a:0'
+        assert '-nostdin' in self.command
+
+    def test_stops_at_range_end(self, processor):
+        processor.set_time_range("0", "1")
+        blocks = self._decode(processor, array('h', [100] * 3000).tobytes())
+        assert sum(len(block) for block in blocks) == 2000
+
+    def test_gain_and_fades_per_block(self, processor):
+        processor.set_time_range("0", "3")
+        processor.adjust_volume(-6.0206)  # half amplitude
+        processor.set_fades(1, 0.5)
+        blocks = self._decode(processor, array('h', [1000] * 3000).tobytes(), block_seconds=0.4)
+        samples = array('h', b''.join(blocks))
+
+        assert len(samples) == 3000
+        assert samples[0] == 0
+        assert abs(samples[500] - 250) <= 1
+        assert abs(samples[1500] - 500) <= 1
+        assert abs(samples[2750] - 250) <= 1
+        assert samples[2999] <= 1
+
+    def test_decoder_failure_raises_error(self, processor):
+        decoder = Mock()
+        decoder.stdout = io.BufferedReader(io.BytesIO(b''))
+        decoder.wait.return_value = 1
+        with patch('src.pcm_decoder.subprocess.Popen', return_value=decoder):
+            with pytest.raises(ValueError, match="Failed to decode audio"):
+                list(processor.iter_pcm_blocks())
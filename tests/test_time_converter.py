@@ -32,4 +32,47 @@ class TestTimeConverter:
 
     def test_seconds_to_time_invalid(self):
         with pytest.raises(ValueError):
-            TimeConverter.seconds_to_time(-5) 
\ No newline at end of file
+            TimeConverter.seconds_to_time(-5)
+
+    def test_time_to_seconds_strips_whitespace(self):
+        assert TimeConverter.time_to_seconds(" 1:30 ") == 90
+        with pytest.raises(ValueError, match="Invalid time format"):
+            TimeConverter.time_to_seconds(":30")
+
+
+class TestParseMany:
+    def test_parses_mixed_rows(self):
+        seconds, errors = TimeConverter.parse_many(["1:30", "5,5", "1:30:05.5", 12, 0.25, "1e-3"])
+        assert seconds.tolist() == [90, 5.5, 5405.5, 12, 0.25, 0.001]
+        assert errors == {}
+
+    def test_reports_errors_per_row(self):
+        seconds, errors = TimeConverter.parse_many(["0:10", "abc", "5:5:5:5", ":30", "-1", "", "0:20"])
+        assert errors == {
+            1: "Invalid time format",
+            2: "Invalid time format",
+            3: "Invalid time format",
+            4: "Time cannot be negative",
+            5: "Invalid time format",
+        }
+        assert seconds[[0, 6]].tolist() == [10, 20]
+        assert all(seconds[index] != seconds[index] for index in errors)  # NaN
+
+    def test_negative_values(self):
+        seconds, errors = TimeConverter.parse_many(["-0:05", "-1.5", -2], allow_negative=True)
+        assert seconds.tolist() == [-5, -1.5, -2]
+        assert errors == {}
+
+    def test_matches_single_value_parser_exactly(self):
+        values = [f"{h}:{m:02d}:{s:02d}.{ms:03d}" for h, m, s, ms in
+                  [(0, 0, 0, 1), (1, 2, 3, 4), (2, 59, 59, 999), (10, 7, 33, 333), (0, 12, 1, 1)]]
+        values += [f"{m}:{s},{ms}" for m, s, ms in [(0, 1, 23), (59, 59, 1), (123, 4, 567)]]
+        values += [str(n / 44100) for n in range(0, 44100 * 3, 4409)]
+        seconds, errors = TimeConverter.parse_many(values)
+        assert errors == {}
+        assert seconds.tolist() == [TimeConverter.time_to_seconds(value) for value in values]
+
+    def test_empty_input(self):
+        seconds, errors = TimeConverter.parse_many([])
+        assert len(seconds) == 0
+        assert errors == {}
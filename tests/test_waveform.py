@@ -0,0 +1,100 @@
+import pytest
+import os
+import numpy as np
+from src.probe import clear_cache
+from src.waveform import PeakIndex
+from pydub import AudioSegment
+from pydub.generators import Sine
+from unittest.mock import patch
+
+class TestPeakIndex:
+    @pytest.fixture(autouse=True)
+    def probe(self):
+        clear_cache()
+        probe_result = {'streams': [{'codec_type': 'audio', 'duration': '2.0',
+                                     'sample_rate': '8000', 'channels': 1}]}
+        with patch('src.probe.mediainfo_json', return_value=probe_result):
+            yield
+        clear_cache()
+
+    @pytest.fixture
+    def segment(self):
+        # One second of silence followed by one second of a half-scale tone
+        tone = Sine(440, sample_rate=8000).to_audio_segment(duration=1000, volume=-6.0206)
+        return AudioSegment.silent(duration=1000, frame_rate=8000) + tone.set_channels(2).set_channels(1)
+
+    def test_levels_get_coarser(self, segment):
+        index = PeakIndex.from_segment(segment)
+        sizes = [len(mins) for mins, _, _ in index.levels]
+        assert sizes[0] == 16000 // PeakIndex.BLOCK_FRAMES
+        assert all(larger > smaller for larger, smaller in zip(sizes, sizes[1:]))
+        assert sizes[-1] == 1
+        assert index.duration == pytest.approx(2.0)
+
+    def test_render_whole_and_zoomed(self, segment):
+        index = PeakIndex.from_segment(segment)
+        mins, maxs, rms = index.render(0, 2, 100)
+        assert len(mins) == len(maxs) == len(rms) == 100
+        assert maxs[:49].max() == 0
+        assert maxs[60] == pytest.approx(0.5, abs=0.01)
+        assert mins[60] == pytest.approx(-0.5, abs=0.01)
+        assert rms[60] == pytest.approx(0.5 / np.sqrt(2), abs=0.02)
+
+        # Zoomed in further than one block per pixel
+        mins, maxs, rms = index.render(1.5, 1.51, 400)
+        assert len(maxs) == 400
+        assert maxs.max() <= 0.51
+
+    def test_render_picks_level_proportional_to_width(self, segment):
+        index = PeakIndex.from_segment(segment)
+        with patch.object(PeakIndex, '_reduce', wraps=PeakIndex._reduce) as mock_reduce:
+            index.render(0, 2, 10)
+        values = mock_reduce.call_args_list[0].args[1]
+        assert 10 <= len(values) <= 10 * PeakIndex.LEVEL_FACTOR
+
+    def test_chunk_boundaries_do_not_change_index(self, segment):
+        whole = PeakIndex.from_segment(segment)
+        # Chunks that split blocks, and an empty one
+        data = segment.raw_data
+        chunks = [data[:1000], b'', data[1000:12346], data[12346:]]
+        chunked = PeakIndex.from_pcm(chunks, segment.frame_rate, segment.channels, segment.sample_width)
+        for expected, actual in zip(whole.levels, chunked.levels):
+            for expected_values, actual_values in zip(expected, actual):
+                assert np.array_equal(expected_values, actual_values)
+
+    @pytest.fixture
+    def mock_iter_pcm(self, segment):
+        def iter_pcm(video_path, frame_rate, channels, chunk_frames):
+            assert (frame_rate, channels) == (8000, 1)
+            chunk_bytes = chunk_frames * 2
+            for offset in range(0, len(segment.raw_data), chunk_bytes):
+                yield segment.raw_data[offset:offset + chunk_bytes]
+
+        with patch('src.waveform.iter_pcm', side_effect=iter_pcm) as mock_iter_pcm:
+            yield mock_iter_pcm
+
+    def test_for_file_caches_next_to_source(self, segment, mock_iter_pcm, tmp_path):
+        source = tmp_path / "video.mp4"
+        source.write_bytes(b"video")
+        first = PeakIndex.for_file(str(source))
+        second = PeakIndex.for_file(str(source))
+
+        assert mock_iter_pcm.call_count == 1
+        assert os.path.exists(str(source) + PeakIndex.SIDECAR_SUFFIX)
+        assert np.array_equal(first.levels[0][1], second.levels[0][1])
+        assert np.array_equal(first.levels[0][1], PeakIndex.from_segment(segment).levels[0][1])
+
+    def test_for_file_rebuilds_when_source_changes(self, mock_iter_pcm, tmp_path):
+        source = tmp_path / "video.mp4"
+        source.write_bytes(b"video")
+        PeakIndex.for_file(str(source))
+        source.write_bytes(b"other video")
+        PeakIndex.for_file(str(source))
+        assert mock_iter_pcm.call_count == 2
+
+    def test_for_file_decode_error(self, tmp_path):
+        source = tmp_path / "video.mp4"
+        source.write_bytes(b"video")
+        with patch('src.waveform.iter_pcm', side_effect=Exception("bad data")):
+            with pytest.raises(ValueError, match="Failed to decode audio"):
+                PeakIndex.for_file(str(source))
@@ -1,30 +1,134 @@
 import pytest
+import asyncio
+import hashlib
 import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from src.youtube_downloader import YoutubeDownloader
+from src.download_cache import DownloadCache
+from src.scratch import ScratchSpace
 from unittest.mock import Mock, patch
 
+class MediaServer(ThreadingHTTPServer):
+    """Local HTTP stand-in for the YouTube media servers."""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), MediaRequestHandler)
+        self.content = os.urandom(1024 * 1024)
+        self.failures_left = 0
+        self.drops_left = 0
+        self.requests = 0
+        self.ranges = []
+
+    def url(self, name: str = "video.mp4") -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/{name}"
+
+
+class MediaRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests += 1
+        if self.server.failures_left > 0:
+            self.server.failures_left -= 1
+            self.send_error(503)
+            return
+
+        content = self.server.content
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if not match:
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+            return
+
+        start = int(match.group(1))
+        end = min(int(match.group(2) or len(content) - 1), len(content) - 1)
+        self.server.ranges.append((start, end))
+        if start >= len(content):
+            self.send_response(416)
+            self.send_header('Content-Range', f"bytes */{len(content)}")
+            self.end_headers()
+            return
+
+        body = content[start:end + 1]
+        self.send_response(206)
+        self.send_header('Content-Range', f"bytes {start}-{end}/{len(content)}")
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.server.drops_left > 0:
+            # Simulate a dropped connection halfway through the response
+            self.server.drops_left -= 1
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
 class TestYoutubeDownloader:
     @pytest.fixture
-    def downloader(self):
-        return YoutubeDownloader()
+    def scratch(self, tmp_path):
+        return ScratchSpace(str(tmp_path / "scratch"))
+
+    @pytest.fixture
+    def downloader(self, scratch):
+        return YoutubeDownloader(scratch=scratch)
+
+    def test_init_creates_temp_directory(self, downloader, scratch):
+        assert os.path.exists(downloader.temp_dir)
+        assert os.path.dirname(downloader.temp_dir) == scratch.root
 
-    def test_init_creates_temp_directory(self, downloader):
+    def test_downloaders_do_not_share_temp_directory(self, downloader, scratch):
+        other = YoutubeDownloader(scratch=scratch)
+        assert other.temp_dir != downloader.temp_dir
+
+        other.cleanup()
+        assert not os.path.exists(other.temp_dir)
         assert os.path.exists(downloader.temp_dir)
-        assert downloader.temp_dir.endswith('youtube_temp')
 
+    @pytest.fixture
+    def media_server(self):
+        server = MediaServer()
+        thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+
+    @pytest.fixture
+    def mock_youtube(self, media_server):
+        with patch('src.youtube_downloader.YouTube') as mock_youtube:
+            def resolve(url):
+                video_id = url.split('v=')[-1]
+                stream = Mock(itag=18, subtype='mp4', default_filename=f"{video_id}.mp4",
+                              url=media_server.url(f"{video_id}.mp4"))
+                yt = Mock()
+                yt.streams.filter.return_value.first.return_value = stream
+                return yt
+            mock_youtube.side_effect = resolve
+            yield mock_youtube
+
+    @patch.object(YoutubeDownloader, '_fetch')
     @patch('src.youtube_downloader.YouTube')
-    def test_download_video_success(self, mock_youtube, downloader):
+    def test_download_video_success(self, mock_youtube, mock_fetch, downloader):
         # Mock setup
-        mock_stream = Mock()
-        mock_stream.download.return_value = os.path.join(downloader.temp_dir, "video.mp4")
+        mock_fetch.side_effect = lambda url, path, on_progress, sha256: open(path, 'w').close()
+        mock_stream = Mock(itag=18, subtype='mp4', default_filename="video.mp4")
         mock_yt = Mock()
         mock_yt.streams.filter.return_value.first.return_value = mock_stream
         mock_youtube.return_value = mock_yt
 
         # Test
         result = downloader.download_video("https://youtube.com/watch?v=dQw4w9WgXcQ")
-        assert result.endswith('.mp4')
+        assert os.path.basename(result) == "dQw4w9WgXcQ_18.mp4"
         assert os.path.dirname(result) == downloader.temp_dir
+        mock_fetch.assert_called_once_with(mock_stream.url, result + '.part', None, None)
+        mock_yt.streams.filter.assert_called_once_with(progressive=True, file_extension='mp4')
 
     def test_cleanup_removes_temp_directory(self, downloader):
         # Create a dummy file in temp directory
@@ -37,4 +141,202 @@ class TestYoutubeDownloader:
 
     def test_invalid_url_raises_error(self, downloader):
         with pytest.raises(ValueError):
-            downloader.download_video("invalid_url") 
\ No newline at end of file
+            downloader.download_video("invalid_url") 
+
+    def test_download_video_uses_cache(self, mock_youtube, media_server, tmp_path):
+        cache = DownloadCache(str(tmp_path / "cache"))
+        downloader = YoutubeDownloader(cache=cache)
+
+        first = downloader.download_video("https://youtube.com/watch?v=dQw4w9WgXcQ")
+        second = downloader.download_video("https://youtu.be/dQw4w9WgXcQ")
+
+        assert first == second == os.path.join(cache.cache_dir, "dQw4w9WgXcQ_18.mp4")
+        assert mock_youtube.call_count == 1
+        assert cache.hits == 1
+        assert cache.misses == 1
+        with open(first, 'rb') as f:
+            assert f.read() == media_server.content
+
+    def test_cache_hit_respects_download_mode(self, media_server, tmp_path):
+        cache = DownloadCache(str(tmp_path / "cache"))
+        video_stream = Mock(itag=18, subtype='mp4', default_filename="video.mp4", url=media_server.url())
+        audio_stream = Mock(itag=140, subtype='m4a', default_filename="audio.m4a", bitrate=128000,
+                            url=media_server.url("audio.m4a"))
+
+        def streams(progressive=False, only_audio=False, file_extension=None):
+            if only_audio:
+                return [audio_stream]
+            filtered = Mock()
+            filtered.first.return_value = video_stream
+            return filtered
+
+        url = "https://youtube.com/watch?v=dQw4w9WgXcQ"
+        with patch('src.youtube_downloader.YouTube') as mock_youtube:
+            mock_youtube.return_value.streams.filter.side_effect = streams
+            video = YoutubeDownloader(cache=cache).download_video(url)
+            audio = YoutubeDownloader(cache=cache, audio_only=True).download_video(url)
+            # Same stream for both bitrate policies, downloaded once
+            largest = YoutubeDownloader(cache=cache, audio_only=True, audio_bitrate='largest').download_video(url)
+            again = YoutubeDownloader(cache=cache, audio_only=True, audio_bitrate='largest').download_video(url)
+
+        assert video.endswith("dQw4w9WgXcQ_18.mp4")
+        assert audio == largest == again
+        assert audio.endswith("dQw4w9WgXcQ_140.m4a")
+        assert mock_youtube.call_count == 3
+        assert media_server.requests == 2
+
+    def test_videos_sharing_a_title_get_separate_files(self, mock_youtube, media_server, scratch):
+        def resolve(url):
+            yt = Mock()
+            yt.streams.filter.return_value.first.return_value = Mock(
+                itag=18, subtype='mp4', default_filename="Same title.mp4", url=media_server.url())
+            return yt
+        mock_youtube.side_effect = resolve
+
+        downloader = YoutubeDownloader(scratch=scratch)
+        urls = ["https://youtube.com/watch?v=aaaaaaaaaaa", "https://youtube.com/watch?v=bbbbbbbbbbb"]
+        results = asyncio.run(downloader.download_many(urls))
+
+        assert results[urls[0]] != results[urls[1]]
+        assert os.path.basename(results[urls[1]]) == "bbbbbbbbbbb_18.mp4"
+        assert media_server.requests == 2
+
+    @pytest.mark.parametrize('cached', [True, False])
+    def test_concurrent_downloads_of_same_video(self, mock_youtube, media_server, scratch, tmp_path, cached):
+        cache = DownloadCache(str(tmp_path / "cache")) if cached else None
+        downloader = YoutubeDownloader(cache=cache, scratch=scratch)
+        url = "https://youtube.com/watch?v=dQw4w9WgXcQ"
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            paths = list(executor.map(downloader.download_video, [url, url]))
+
+        assert paths[0] == paths[1]
+        with open(paths[0], 'rb') as f:
+            assert f.read() == media_server.content
+        # The second download waited for the first instead of writing to the same file
+        assert media_server.requests == 1
+
+    def test_download_many_deduplicates_urls(self, mock_youtube, media_server, tmp_path):
+        downloader = YoutubeDownloader(cache=DownloadCache(str(tmp_path / "cache")))
+        urls = [
+            "https://youtube.com/watch?v=aaaaaaaaaaa",
+            "https://youtu.be/aaaaaaaaaaa",
+            "https://www.youtube.com/watch?v=bbbbbbbbbbb",
+            "invalid_url",
+        ]
+        progress = []
+        results = asyncio.run(downloader.download_many(
+            urls, max_concurrency=2, on_progress=lambda url, done, total: progress.append((url, done, total))
+        ))
+
+        assert list(results) == urls
+        assert results[urls[0]] == results[urls[1]]
+        assert results[urls[2]].endswith("bbbbbbbbbbb_18.mp4")
+        assert isinstance(results[urls[3]], ValueError)
+        assert media_server.requests == 2
+        total = len(media_server.content)
+        assert (urls[1], total, total) in progress
+
+    def test_download_many_retries_with_backoff(self, mock_youtube, media_server, tmp_path):
+        downloader = YoutubeDownloader(cache=DownloadCache(str(tmp_path / "cache")))
+        media_server.failures_left = 2
+        url = "https://youtube.com/watch?v=aaaaaaaaaaa"
+
+        results = asyncio.run(downloader.download_many([url], retries=2, backoff=0.01))
+        assert os.path.exists(results[url])
+        assert media_server.requests == 3
+
+        media_server.failures_left = 3
+        url = "https://youtube.com/watch?v=bbbbbbbbbbb"
+        results = asyncio.run(downloader.download_many([url], retries=2, backoff=0.01))
+        assert isinstance(results[url], ValueError)
+
+    def test_download_many_bounds_concurrency(self, mock_youtube, tmp_path):
+        downloader = YoutubeDownloader(cache=DownloadCache(str(tmp_path / "cache")))
+        running = 0
+        peak = 0
+        lock = threading.Lock()
+        original = downloader.download_video
+
+        def download_video(url, on_progress=None):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            try:
+                return original(url, on_progress)
+            finally:
+                with lock:
+                    running -= 1
+
+        downloader.download_video = download_video
+        urls = [f"https://youtube.com/watch?v=video{i:06d}" for i in range(8)]
+        results = asyncio.run(downloader.download_many(urls, max_concurrency=3))
+
+        assert all(isinstance(path, str) for path in results.values())
+        assert peak <= 3
+
+    def test_extract_video_id(self):
+        assert YoutubeDownloader._extract_video_id("https://youtube.com/watch?v=dQw4w9WgXcQ&t=42") == "dQw4w9WgXcQ"
+        assert YoutubeDownloader._extract_video_id("https://youtu.be/dQw4w9WgXcQ?t=42") == "dQw4w9WgXcQ"
+        assert YoutubeDownloader._extract_video_id("https://www.youtube.com/shorts/dQw4w9WgXcQ") == "dQw4w9WgXcQ"
+        assert YoutubeDownloader._extract_video_id("https://www.youtube.com/channel/abc") is None
+
+    def test_audio_only_stream_selection(self):
+        streams = [Mock(bitrate=160000), Mock(bitrate=48000), Mock(bitrate=128000), Mock(bitrate=70000)]
+        yt = Mock()
+        yt.streams.filter.return_value = streams
+
+        assert YoutubeDownloader(audio_only=True)._select_stream(yt) is streams[1]
+        assert YoutubeDownloader(audio_only=True, audio_bitrate='largest')._select_stream(yt) is streams[0]
+        assert YoutubeDownloader(audio_only=True, audio_bitrate=128)._select_stream(yt) is streams[2]
+        assert YoutubeDownloader(audio_only=True, audio_bitrate=32)._select_stream(yt) is streams[1]
+        yt.streams.filter.assert_called_with(only_audio=True)
+
+        with pytest.raises(ValueError):
+            YoutubeDownloader(audio_only=True, audio_bitrate='medium')
+
+    def test_fetch_downloads_in_ranges(self, downloader, media_server, tmp_path):
+        output_path = str(tmp_path / "video.mp4")
+        with patch.object(YoutubeDownloader, 'RANGE_SIZE', 300 * 1024):
+            downloader._fetch(media_server.url(), output_path)
+
+        with open(output_path, 'rb') as f:
+            assert f.read() == media_server.content
+        assert [start for start, _ in media_server.ranges] == [0, 300 * 1024, 600 * 1024, 900 * 1024]
+
+    def test_fetch_resumes_dropped_connection(self, downloader, media_server, tmp_path):
+        media_server.drops_left = 1
+        output_path = str(tmp_path / "video.mp4")
+        with patch.object(YoutubeDownloader, 'RETRY_DELAY_SECONDS', 0):
+            downloader._fetch(media_server.url(), output_path)
+
+        with open(output_path, 'rb') as f:
+            assert f.read() == media_server.content
+        half = len(media_server.content) // 2
+        assert media_server.ranges[1][0] == half
+
+    def test_fetch_resumes_partial_file(self, downloader, media_server, tmp_path):
+        output_path = str(tmp_path / "video.mp4")
+        with open(output_path, 'wb') as f:
+            f.write(media_server.content[:1000])
+        downloader._fetch(media_server.url(), output_path)
+
+        with open(output_path, 'rb') as f:
+            assert f.read() == media_server.content
+        assert media_server.ranges[0][0] == 1000
+
+        # An already complete file is detected from the 416 response
+        downloader._fetch(media_server.url(), output_path)
+        assert os.path.getsize(output_path) == len(media_server.content)
+
+    def test_fetch_verifies_checksum(self, downloader, media_server, tmp_path):
+        output_path = str(tmp_path / "video.mp4")
+        downloader._fetch(media_server.url(), output_path,
+                          expected_sha256=hashlib.sha256(media_server.content).hexdigest())
+        assert os.path.exists(output_path)
+
+        os.remove(output_path)
+        with pytest.raises(ValueError, match="Checksum mismatch"):
+            downloader._fetch(media_server.url(), output_path, expected_sha256="0" * 64)
+        assert not os.path.exists(output_path)